@@ -0,0 +1,102 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from services.billing import SUBSCRIPTION_TIERS, calculate_monthly_usage, check_billing_status
+from utils.config import config
+from utils.logger import logger
+
+# Seconds a verified billing status is trusted before going back to the database
+BILLING_CACHE_TTL = 60
+
+# Seconds of locally accounted agent run time allowed before re-verifying,
+# regardless of TTL. Billing is metered on run time, so this is the headroom
+# the worker may spend on a cached "can run" verdict. An account closer to its
+# limit gets only the run time it has left.
+BILLING_CACHE_MAX_UNVERIFIED_USAGE = 120
+
+
+def _subscription_price_id(subscription: Optional[Dict[str, Any]]) -> str:
+    """Price id of a subscription, read the same way check_billing_status does"""
+    if not subscription:
+        return config.STRIPE_FREE_TIER_ID
+    items = (subscription.get('items') or {}).get('data') or []
+    if items:
+        return items[0]['price']['id']
+    return subscription.get('price_id', config.STRIPE_FREE_TIER_ID)
+
+
+@dataclass
+class _BillingEntry:
+    can_run: bool
+    message: str
+    subscription: Optional[Dict[str, Any]]
+    verified_at: float
+    headroom: float
+    unverified_usage: float = 0.0
+
+
+class BillingStatusCache:
+    """In-process cache of check_billing_status results, keyed by account.
+
+    Only positive verdicts are cached; a denied account is re-checked on every
+    call so upgrades take effect immediately. Each verdict's headroom is the
+    account's remaining run time at the check, capped at max_unverified_usage.
+    Usage recorded with record_usage() is subtracted from it, and the database
+    is consulted again once the TTL expires or the headroom is used up.
+    """
+
+    def __init__(self, ttl: float = BILLING_CACHE_TTL, max_unverified_usage: float = BILLING_CACHE_MAX_UNVERIFIED_USAGE):
+        self.ttl = ttl
+        self.max_unverified_usage = max_unverified_usage
+        self._entries: Dict[str, _BillingEntry] = {}
+
+    def _is_fresh(self, entry: _BillingEntry) -> bool:
+        if time.monotonic() - entry.verified_at >= self.ttl:
+            return False
+        return entry.unverified_usage < entry.headroom
+
+    async def _remaining_run_time(self, client, account_id: str, subscription: Optional[Dict[str, Any]]) -> float:
+        """Seconds of run time left in the account's plan this month"""
+        try:
+            tier = SUBSCRIPTION_TIERS.get(_subscription_price_id(subscription))
+            if not tier or tier.get('minutes') is None:
+                # No minute limit to approach (e.g. local development mode)
+                return self.max_unverified_usage
+            used_minutes = await calculate_monthly_usage(client, account_id)
+            return max(0.0, (tier['minutes'] - used_minutes) * 60)
+        except Exception as e:
+            # Without a figure, nothing is run unverified
+            logger.warning(f"Could not compute remaining run time for account {account_id}: {e}")
+            return 0.0
+
+    async def check(self, client, account_id: str) -> Tuple[bool, str, Optional[Dict[str, Any]]]:
+        """Drop-in replacement for check_billing_status that serves fresh cached verdicts."""
+        entry = self._entries.get(account_id)
+        if entry and self._is_fresh(entry):
+            return entry.can_run, entry.message, entry.subscription
+
+        can_run, message, subscription = await check_billing_status(client, account_id)
+        if can_run:
+            headroom = min(self.max_unverified_usage, await self._remaining_run_time(client, account_id, subscription))
+            self._entries[account_id] = _BillingEntry(
+                can_run=can_run,
+                message=message,
+                subscription=subscription,
+                verified_at=time.monotonic(),
+                headroom=headroom
+            )
+        else:
+            self._entries.pop(account_id, None)
+        return can_run, message, subscription
+
+    def record_usage(self, account_id: str, seconds: float) -> None:
+        """Account run time spent since the last verification against the cached headroom."""
+        entry = self._entries.get(account_id)
+        if entry:
+            entry.unverified_usage += seconds
+            if entry.unverified_usage >= entry.headroom:
+                logger.debug(f"Billing headroom for account {account_id} used up, re-verifying on next check")
+
+
+billing_cache = BillingStatusCache()
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from utils.logger import logger
+
+# Directory holding blobs on local disk
+BLOB_STORE_DIR = os.getenv("NEXUS_BLOB_STORE_DIR", os.path.join(tempfile.gettempdir(), "nexus_blobs"))
+
+# Bytes of recently used blobs kept in memory
+BLOB_MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+# Bytes kept on disk; the least recently written blobs are pruned beyond this
+BLOB_DISK_MAX_BYTES = 1024 * 1024 * 1024
+
+# Writes between disk pruning passes
+BLOB_PRUNE_INTERVAL = 50
+
+
+class BlobStore:
+    """Content-addressed local store for binary payloads such as images.
+
+    Blobs are addressed by the sha256 of their bytes and live in a bounded
+    in-memory LRU backed by a directory on local disk, so repeated payloads
+    (such as an image compressed earlier) are reused without redoing the
+    work. The store is local to the worker process: anything another worker
+    reads, such as a message row, must carry its own copy of the payload.
+    """
+
+    def __init__(self, directory: str = BLOB_STORE_DIR, memory_bytes: int = BLOB_MEMORY_CACHE_BYTES,
+                 disk_bytes: int = BLOB_DISK_MAX_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_size = 0
+        self._writes = 0
+        self._prune_task: Optional[asyncio.Task] = None
+
+    def _path(self, blob_id: str) -> str:
+        return os.path.join(self.directory, blob_id[:2], blob_id)
+
+    def _remember(self, blob_id: str, data: bytes) -> None:
+        if blob_id in self._memory:
+            self._memory.move_to_end(blob_id)
+            return
+        self._memory[blob_id] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    async def put(self, data: bytes) -> str:
+        """Store bytes and return their blob id."""
+        blob_id = hashlib.sha256(data).hexdigest()
+        self._remember(blob_id, data)
+        try:
+            await asyncio.to_thread(self._write, blob_id, data)
+        except OSError as e:
+            # The memory copy still serves this process
+            logger.warning(f"Could not write blob {blob_id} to disk: {e}")
+
+        self._writes += 1
+        if self._writes % BLOB_PRUNE_INTERVAL == 0 and (self._prune_task is None or self._prune_task.done()):
+            self._prune_task = asyncio.create_task(asyncio.to_thread(self._prune))
+        return blob_id
+
+    def has(self, blob_id: str) -> bool:
+        """Whether a blob is still available, without reading it."""
+        return blob_id in self._memory or os.path.exists(self._path(blob_id))
+
+    async def get(self, blob_id: str) -> Optional[bytes]:
+        """Bytes of a blob, or None if it is no longer available."""
+        data = self._memory.get(blob_id)
+        if data is not None:
+            self._memory.move_to_end(blob_id)
+            return data
+        try:
+            data = await asyncio.to_thread(self._read, blob_id)
+        except OSError:
+            return None
+        self._remember(blob_id, data)
+        return data
+
+    def _write(self, blob_id: str, data: bytes) -> None:
+        path = self._path(blob_id)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name first so readers never see a partial blob
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _read(self, blob_id: str) -> bytes:
+        with open(self._path(blob_id), "rb") as f:
+            return f.read()
+
+    def _prune(self) -> None:
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+blob_store = BlobStore()
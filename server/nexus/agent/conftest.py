@@ -0,0 +1,35 @@
+import importlib
+import logging
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def import_with_stubs(monkeypatch):
+    """Import an agent module with stand-ins for server modules the tests do not exercise.
+
+    Takes the module name and {module name: {attribute: value}} for the stand-ins.
+    sys.modules is restored after the test.
+    """
+    def import_module(name, stubs):
+        for module_name, attributes in stubs.items():
+            package = module_name.rpartition(".")[0]
+            if package and package not in sys.modules:
+                monkeypatch.setitem(sys.modules, package, types.ModuleType(package))
+            module = types.ModuleType(module_name)
+            module.__dict__.update(attributes)
+            monkeypatch.setitem(sys.modules, module_name, module)
+        monkeypatch.delitem(sys.modules, name, raising=False)
+        module = importlib.import_module(name)
+        # Leave no copy bound to the stand-ins for later imports
+        monkeypatch.delitem(sys.modules, name)
+        return module
+
+    return import_module
+
+
+@pytest.fixture
+def logger_stub():
+    return {"utils.logger": {"logger": logging.getLogger("agent.tests")}}
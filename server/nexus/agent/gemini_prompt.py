@@ -80,6 +80,7 @@ You have the ability to execute operations using both Python and CLI tools:
 - You MUST use the 'see-image' tool to see image files. There is NO other way to access visual information.
   * Provide the relative path to the image in the `/workspace` directory.
   * Example: `<see-image file_path="path/to/your/image.png"></see-image>`
+  * To view several images in one call, pass a comma-separated list or a glob such as `output/*.png`; add `contact_sheet="true"` to get them as one labelled grid, which is much cheaper when skimming many charts.
   * ALWAYS use this tool when visual information from a file is necessary for your task.
   * Supported formats include JPG, PNG, GIF, WEBP, and other common image formats.
   * Maximum file size limit is 10 MB.
@@ -0,0 +1,201 @@
+import asyncio
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from PIL import Image, ImageDraw
+
+# Image work for see_image, run in worker processes so decoding large photos never blocks the
+# event loop. This module only depends on Pillow, so workers start without importing the agent.
+
+# Compression settings
+DEFAULT_MAX_WIDTH = 1920
+DEFAULT_MAX_HEIGHT = 1080
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+
+# Worker processes for image compression
+COMPRESSION_WORKERS = 2
+
+# Contact sheet canvas; about 1,600 image tokens at the usual width * height / 750 estimate
+CONTACT_SHEET_MAX_WIDTH = 1536
+CONTACT_SHEET_MAX_HEIGHT = 768
+CONTACT_SHEET_MAX_BYTES = 5 * 1024 * 1024
+CONTACT_SHEET_LABEL_HEIGHT = 14
+CONTACT_SHEET_PADDING = 4
+
+# Width / height the grid aims for in each cell, matching typical chart output
+CONTACT_SHEET_CELL_ASPECT = 1.5
+
+# JPEG qualities tried in turn until the contact sheet fits its byte budget
+CONTACT_SHEET_QUALITIES = (85, 70, 55, 40)
+
+_compression_pool: Optional[ProcessPoolExecutor] = None
+
+def get_compression_pool() -> ProcessPoolExecutor:
+    global _compression_pool
+    if _compression_pool is None:
+        # Forkserver workers start from a clean process instead of a fork of the server,
+        # which already runs the sandbox SDK's thread pool
+        _compression_pool = ProcessPoolExecutor(max_workers=COMPRESSION_WORKERS,
+                                                mp_context=multiprocessing.get_context("forkserver"))
+    return _compression_pool
+
+async def run_compression(func, *args):
+    """Run func(*args) in the compression pool.
+    
+    A worker that dies (out of memory on a huge decode, a crash in a codec) breaks
+    the whole pool; it is replaced and the call retried once.
+    """
+    global _compression_pool
+    loop = asyncio.get_running_loop()
+    for attempt in range(2):
+        pool = get_compression_pool()
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            if _compression_pool is pool:
+                _compression_pool = None
+                pool.shutdown(wait=False)
+            if attempt:
+                raise
+            print("[SeeImage] Compression worker died, restarting the pool")
+
+def compress_image(image_bytes: bytes, mime_type: str, file_path: str,
+                   max_width: int = DEFAULT_MAX_WIDTH, max_height: int = DEFAULT_MAX_HEIGHT) -> Tuple[bytes, str, Optional[Tuple[int, int]]]:
+    """Compress an image to reduce its size while maintaining reasonable quality.
+    
+    Runs in a compression worker process.
+    
+    Args:
+        image_bytes: Original image bytes
+        mime_type: MIME type of the image
+        file_path: Path to the image file (for logging)
+        max_width: Maximum output width
+        max_height: Maximum output height
+        
+    Returns:
+        Tuple of (compressed_bytes, new_mime_type, (width, height)); the size is None
+        when the image could not be decoded and the original bytes are returned
+    """
+    try:
+        # Open image from bytes
+        img = Image.open(BytesIO(image_bytes))
+        width, height = img.size
+        
+        # JPEG can decode at 1/2, 1/4 or 1/8 scale, which is far cheaper than a full decode plus resize
+        if img.format == 'JPEG' and (width > max_width or height > max_height):
+            img.draft('RGB', (max_width, max_height))
+        
+        # Convert RGBA to RGB if necessary (for JPEG)
+        if img.mode in ('RGBA', 'LA', 'P'):
+            # Create a white background
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+            img = background
+        
+        # Calculate new dimensions while maintaining aspect ratio
+        decoded_width, decoded_height = img.size
+        if decoded_width > max_width or decoded_height > max_height:
+            ratio = min(max_width / decoded_width, max_height / decoded_height)
+            new_width = int(decoded_width * ratio)
+            new_height = int(decoded_height * ratio)
+            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            print(f"[SeeImage] Resized image from {width}x{height} to {new_width}x{new_height}")
+        
+        # Save to bytes with compression
+        output = BytesIO()
+        
+        # Determine output format based on original mime type
+        if mime_type == 'image/gif':
+            # Keep GIFs as GIFs to preserve animation
+            img.save(output, format='GIF', optimize=True)
+            output_mime = 'image/gif'
+        elif mime_type == 'image/png':
+            # Compress PNG
+            img.save(output, format='PNG', optimize=True, compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
+            output_mime = 'image/png'
+        else:
+            # Convert everything else to JPEG for better compression
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.save(output, format='JPEG', quality=DEFAULT_JPEG_QUALITY, optimize=True)
+            output_mime = 'image/jpeg'
+        
+        compressed_bytes = output.getvalue()
+        
+        # Log compression results
+        original_size = len(image_bytes)
+        compressed_size = len(compressed_bytes)
+        compression_ratio = (1 - compressed_size / original_size) * 100
+        print(f"[SeeImage] Compressed '{file_path}' from {original_size / 1024:.1f}KB to {compressed_size / 1024:.1f}KB ({compression_ratio:.1f}% reduction)")
+        
+        return compressed_bytes, output_mime, img.size
+        
+    except Exception as e:
+        print(f"[SeeImage] Failed to compress image: {str(e)}. Using original.")
+        return image_bytes, mime_type, None
+
+def build_contact_sheet(images: List[Tuple[bytes, str]], max_width: int = CONTACT_SHEET_MAX_WIDTH,
+                        max_height: int = CONTACT_SHEET_MAX_HEIGHT, max_bytes: int = CONTACT_SHEET_MAX_BYTES) -> bytes:
+    """Tile images into one labelled JPEG grid.
+    
+    Runs in a compression worker process.
+    
+    Args:
+        images: (image bytes, label) pairs, in display order
+        max_width: Width of the sheet
+        max_height: Height of the sheet
+        max_bytes: Size the encoded sheet should stay within
+        
+    Returns:
+        JPEG bytes of the contact sheet
+    """
+    columns = math.ceil(math.sqrt(len(images) * (max_width / max_height) / CONTACT_SHEET_CELL_ASPECT))
+    columns = max(1, min(columns, len(images)))
+    rows = math.ceil(len(images) / columns)
+    cell_width = max_width // columns
+    cell_height = max_height // rows
+    thumb_size = (cell_width - 2 * CONTACT_SHEET_PADDING,
+                  cell_height - CONTACT_SHEET_LABEL_HEIGHT - 2 * CONTACT_SHEET_PADDING)
+    # The default bitmap font is about 6px per character
+    max_label_chars = max(8, thumb_size[0] // 6)
+
+    sheet = Image.new('RGB', (cell_width * columns, cell_height * rows), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet)
+    for i, (image_bytes, label) in enumerate(images):
+        x = (i % columns) * cell_width
+        y = (i // columns) * cell_height
+        label = f"{i + 1}. {label}"
+        if len(label) > max_label_chars:
+            label = "..." + label[-(max_label_chars - 3):]
+        draw.text((x + CONTACT_SHEET_PADDING, y + CONTACT_SHEET_PADDING), label, fill=(0, 0, 0))
+        try:
+            img = Image.open(BytesIO(image_bytes))
+            if img.format == 'JPEG':
+                img.draft('RGB', thumb_size)
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.split()[-1])
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+            img.thumbnail(thumb_size, Image.Resampling.LANCZOS)
+        except Exception as e:
+            print(f"[SeeImage] Could not add '{label}' to the contact sheet: {str(e)}")
+            continue
+        sheet.paste(img, (x + (cell_width - img.width) // 2,
+                          y + CONTACT_SHEET_LABEL_HEIGHT + CONTACT_SHEET_PADDING + (thumb_size[1] - img.height) // 2))
+
+    for quality in CONTACT_SHEET_QUALITIES:
+        output = BytesIO()
+        sheet.save(output, format='JPEG', quality=quality, optimize=True)
+        if output.tell() <= max_bytes:
+            break
+    return output.getvalue()
@@ -0,0 +1,55 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from agent.billing_cache import billing_cache
+
+
+@dataclass
+class IterationContext:
+    """Everything run_agent needs from the database before an LLM call."""
+    can_run: bool
+    billing_message: str
+    subscription: Optional[Dict[str, Any]]
+    latest_message_type: Optional[str] = None
+    browser_state_message: Optional[Dict[str, Any]] = None
+    image_context_message: Optional[Dict[str, Any]] = None
+
+
+async def _latest_message(client, thread_id: str, *types: str) -> Optional[Dict[str, Any]]:
+    """Fetch the most recent message of the given type(s) for a thread."""
+    query = client.table('messages').select('*').eq('thread_id', thread_id)
+    query = query.eq('type', types[0]) if len(types) == 1 else query.in_('type', list(types))
+    result = await query.order('created_at', desc=True).limit(1).execute()
+    if result.data and len(result.data) > 0:
+        return result.data[0]
+    return None
+
+
+async def load_iteration_context(client, thread_id: str, account_id: str) -> IterationContext:
+    """Load billing status and the latest thread messages in one concurrent pass.
+
+    The billing check and the three message lookups are independent, so they are
+    issued together instead of one round trip after another.
+    """
+    billing, latest_message, browser_state_message, image_context_message = await asyncio.gather(
+        billing_cache.check(client, account_id),
+        _latest_message(client, thread_id, 'assistant', 'tool', 'user'),
+        _latest_message(client, thread_id, 'browser_state'),
+        _latest_message(client, thread_id, 'image_context'),
+    )
+    can_run, message, subscription = billing
+
+    return IterationContext(
+        can_run=can_run,
+        billing_message=message,
+        subscription=subscription,
+        latest_message_type=latest_message.get('type') if latest_message else None,
+        browser_state_message=browser_state_message,
+        image_context_message=image_context_message,
+    )
+
+
+async def delete_message(client, message_id: str) -> None:
+    """Delete a consumed temporary message (e.g. image_context) from the thread."""
+    await client.table('messages').delete().eq('message_id', message_id).execute()
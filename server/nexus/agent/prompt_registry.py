@@ -0,0 +1,67 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from agent.prompt import get_system_prompt
+from agent.gemini_prompt import get_gemini_system_prompt
+from utils.logger import logger
+
+SAMPLE_RESPONSE_PATH = os.path.join(os.path.dirname(__file__), 'sample_responses/1.txt')
+
+
+@dataclass(frozen=True)
+class PromptVariant:
+    """A fully built system prompt for one model family."""
+    family: str
+    content: str
+    hash: str
+    supports_cache_control: bool = False
+
+    def system_message(self) -> Dict[str, Any]:
+        """Build the system message, marking it as a cache breakpoint where the provider supports it."""
+        if self.supports_cache_control:
+            return {
+                "role": "system",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": self.content,
+                        "cache_control": {"type": "ephemeral"}
+                    }
+                ]
+            }
+        return {"role": "system", "content": self.content}
+
+
+def _variant(family: str, content: str, supports_cache_control: bool = False) -> PromptVariant:
+    content_hash = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    return PromptVariant(family=family, content=content, hash=content_hash, supports_cache_control=supports_cache_control)
+
+
+def _build_variants() -> Dict[str, PromptVariant]:
+    with open(SAMPLE_RESPONSE_PATH, 'r') as file:
+        sample_response = file.read()
+
+    variants = {
+        'anthropic': _variant('anthropic', get_system_prompt(), supports_cache_control=True),
+        'gemini': _variant('gemini', get_gemini_system_prompt()),  # example included
+        # Non-Anthropic models get a sample response appended to the prompt
+        'default': _variant('default', get_system_prompt() + "\n\n <sample_assistant_response>" + sample_response + "</sample_assistant_response>"),
+    }
+    for variant in variants.values():
+        logger.info(f"Built system prompt variant '{variant.family}' ({len(variant.content)} chars, hash {variant.hash})")
+    return variants
+
+
+PROMPT_VARIANTS = _build_variants()
+
+
+def get_prompt_variant(model_name: str) -> PromptVariant:
+    """Return the prebuilt system prompt variant for a model."""
+    model_name = model_name.lower()
+    if "gemini-2.5-flash" in model_name:
+        return PROMPT_VARIANTS['gemini']
+    if "anthropic" not in model_name:
+        return PROMPT_VARIANTS['default']
+    return PROMPT_VARIANTS['anthropic']
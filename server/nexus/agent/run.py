@@ -1,6 +1,8 @@
-import os
 import json
+import asyncio
+import base64
 import re
+import time
 from uuid import uuid4
 from typing import Optional
 
@@ -18,15 +20,18 @@ from agent.tools.sb_shell_tool import SandboxShellTool
 from agent.tools.sb_files_tool import SandboxFilesTool
 from agent.tools.sb_browser_tool import SandboxBrowserTool
 from agent.tools.data_providers_tool import DataProvidersTool
-from agent.prompt import get_system_prompt
+from agent.prompt_registry import get_prompt_variant
 from utils.logger import logger
 from utils.auth_utils import get_account_id_from_thread
-from services.billing import check_billing_status
+from agent.iteration_context import load_iteration_context, delete_message
+from agent.billing_cache import billing_cache
+from agent.screenshot_uploader import screenshot_uploader
+from agent.blob_store import blob_store
 from agent.tools.sb_vision_tool import SandboxVisionTool
+from sandbox.tool_base import sandbox_handles
 from services.langfuse import langfuse
 from langfuse.client import StatefulTraceClient
 from services.langfuse import langfuse
-from agent.gemini_prompt import get_gemini_system_prompt
 
 load_dotenv()
 
@@ -57,21 +62,14 @@ async def run_agent(
     if not account_id:
         raise ValueError("Could not determine account ID for thread")
 
-    # Get sandbox info from project
-    project = await client.table('projects').select('*').eq('project_id', project_id).execute()
-    if not project.data or len(project.data) == 0:
-        raise ValueError(f"Project {project_id} not found")
-
-    project_data = project.data[0]
-    sandbox_info = project_data.get('sandbox', {})
-    if not sandbox_info.get('id'):
-        raise ValueError(f"No sandbox found for project {project_id}")
+    # Resolve the project's sandbox once; the tools below share this handle
+    await sandbox_handles.get(client, project_id)
 
     # Initialize tools with project_id instead of sandbox object
     # This ensures each tool independently verifies it's operating on the correct project
     thread_manager.add_tool(SandboxShellTool, project_id=project_id, thread_manager=thread_manager)
     thread_manager.add_tool(SandboxFilesTool, project_id=project_id, thread_manager=thread_manager)
-    thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager)
+    thread_manager.add_tool(SandboxBrowserTool, project_id=project_id, thread_id=thread_id, thread_manager=thread_manager, model_name=model_name)
     thread_manager.add_tool(SandboxDeployTool, project_id=project_id, thread_manager=thread_manager)
     thread_manager.add_tool(SandboxExposeTool, project_id=project_id, thread_manager=thread_manager)
     thread_manager.add_tool(MessageTool) # we are just doing this via prompt as there is no need to call it as a tool
@@ -82,17 +80,11 @@ async def run_agent(
         thread_manager.add_tool(DataProvidersTool)
 
 
-    if "gemini-2.5-flash" in model_name.lower():
-        system_message = { "role": "system", "content": get_gemini_system_prompt() } # example included
-    elif "anthropic" not in model_name.lower():
-        # Only include sample response if the model name does not contain "anthropic"
-        sample_response_path = os.path.join(os.path.dirname(__file__), 'sample_responses/1.txt')
-        with open(sample_response_path, 'r') as file:
-            sample_response = file.read()
-        
-        system_message = { "role": "system", "content": get_system_prompt() + "\n\n <sample_assistant_response>" + sample_response + "</sample_assistant_response>" }
-    else:
-        system_message = { "role": "system", "content": get_system_prompt() }
+    # System prompts are built once per process; the hash identifies the exact variant sent
+    prompt_variant = get_prompt_variant(model_name)
+    system_message = prompt_variant.system_message()
+    logger.info(f"Using system prompt variant '{prompt_variant.family}' (hash {prompt_variant.hash})")
+    trace.update(metadata={"project_id": project_id, "system_prompt_hash": prompt_variant.hash})
 
     iteration_count = 0
     continue_execution = True
@@ -102,14 +94,32 @@ async def run_agent(
         data = json.loads(latest_user_message.data[0]['content'])
         trace.update(input=data['content'])
 
+    # Deletion of the consumed image_context row runs alongside the LLM call and
+    # is awaited before the next context load so the row is never read twice.
+    pending_cleanup: Optional[asyncio.Task] = None
+    # Run time of each iteration is charged against the cached billing headroom
+    iteration_started_at: Optional[float] = None
+
     while continue_execution and iteration_count < max_iterations:
         iteration_count += 1
         logger.info(f"🔄 Running iteration {iteration_count} of {max_iterations}...")
 
-        # Billing check on each iteration - still needed within the iterations
-        can_run, message, subscription = await check_billing_status(client, account_id)
-        if not can_run:
-            error_msg = f"Billing limit reached: {message}"
+        if pending_cleanup:
+            try:
+                await pending_cleanup
+            except Exception as e:
+                logger.error(f"Error deleting consumed image context: {e}")
+            pending_cleanup = None
+
+        if iteration_started_at is not None:
+            billing_cache.record_usage(account_id, time.monotonic() - iteration_started_at)
+        iteration_started_at = time.monotonic()
+
+        # Billing check and latest-message lookups for this iteration, fetched in one pass
+        iteration_context = await load_iteration_context(client, thread_id, account_id)
+
+        if not iteration_context.can_run:
+            error_msg = f"Billing limit reached: {iteration_context.billing_message}"
             trace.event(name="billing_limit_reached", level="ERROR", status_message=(f"{error_msg}"))
             # Yield a special message to indicate billing limit reached
             yield {
@@ -118,32 +128,39 @@ async def run_agent(
                 "message": error_msg
             }
             break
-        # Check if last message is from assistant using direct Supabase query
-        latest_message = await client.table('messages').select('*').eq('thread_id', thread_id).in_('type', ['assistant', 'tool', 'user']).order('created_at', desc=True).limit(1).execute()
-        if latest_message.data and len(latest_message.data) > 0:
-            message_type = latest_message.data[0].get('type')
-            if message_type == 'assistant':
-                logger.info(f"Last message was from assistant, stopping execution")
-                trace.event(name="last_message_from_assistant", level="DEFAULT", status_message=(f"Last message was from assistant, stopping execution"))
-                continue_execution = False
-                break
+        # Check if last message is from assistant
+        if iteration_context.latest_message_type == 'assistant':
+            logger.info(f"Last message was from assistant, stopping execution")
+            trace.event(name="last_message_from_assistant", level="DEFAULT", status_message=(f"Last message was from assistant, stopping execution"))
+            continue_execution = False
+            break
 
         # ---- Temporary Message Handling (Browser State & Image Context) ----
         temporary_message = None
         temp_message_content_list = [] # List to hold text/image blocks
 
-        # Get the latest browser_state message
-        latest_browser_state_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'browser_state').order('created_at', desc=True).limit(1).execute()
-        if latest_browser_state_msg.data and len(latest_browser_state_msg.data) > 0:
+        # Latest browser_state message
+        latest_browser_state_msg = iteration_context.browser_state_message
+        if latest_browser_state_msg:
             try:
-                browser_content = json.loads(latest_browser_state_msg.data[0]["content"])
+                browser_content = json.loads(latest_browser_state_msg["content"])
                 screenshot_base64 = browser_content.get("screenshot_base64")
-                screenshot_url = browser_content.get("screenshot_url")
+                # The browser tool stores the uploaded screenshot as image_url
+                screenshot_url = browser_content.get("screenshot_url") or browser_content.get("image_url")
                 
                 # Create a copy of the browser state without screenshot data
                 browser_state_text = browser_content.copy()
                 browser_state_text.pop('screenshot_base64', None)
                 browser_state_text.pop('screenshot_url', None)
+                browser_state_text.pop('image_url', None)
+                browser_state_text.pop('screenshot_hash', None)
+                browser_state_text.pop('screenshot_mime', None)
+                # The browser tool keeps the current element list here, rebuilt from the
+                # service's diffs; this message is temporary, so only the latest list is sent
+                browser_state_text.pop('interactive_elements', None)
+                dom_diff = browser_state_text.pop('dom_diff', None)
+                if dom_diff:
+                    browser_state_text['element_changes'] = dom_diff.get('summary')
 
                 if browser_state_text:
                     temp_message_content_list.append({
@@ -151,12 +168,15 @@ async def run_agent(
                         "text": f"The following is the current state of the browser:\n{json.dumps(browser_state_text, indent=2)}"
                     })
                     
+                # The temporary message is not kept in the thread, so the screenshot is attached on
+                # every call; an identical one only skips the re-upload (see the browser tool)
                 # Prioritize screenshot_url if available
                 if screenshot_url:
+                    # The upload runs in the background; wait for it now that the URL is needed
                     temp_message_content_list.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": screenshot_url,
+                            "url": await screenshot_uploader.resolve(screenshot_url),
                         }
                     })
                 elif screenshot_base64:
@@ -164,7 +184,7 @@ async def run_agent(
                     temp_message_content_list.append({
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{screenshot_base64}",
+                            "url": f"data:{browser_content.get('screenshot_mime') or 'image/jpeg'};base64,{screenshot_base64}",
                         }
                     })
                 else:
@@ -174,30 +194,43 @@ async def run_agent(
                 logger.error(f"Error parsing browser state: {e}")
                 trace.event(name="error_parsing_browser_state", level="ERROR", status_message=(f"{e}"))
 
-        # Get the latest image_context message (NEW)
-        latest_image_context_msg = await client.table('messages').select('*').eq('thread_id', thread_id).eq('type', 'image_context').order('created_at', desc=True).limit(1).execute()
-        if latest_image_context_msg.data and len(latest_image_context_msg.data) > 0:
+        # Latest image_context message
+        latest_image_context_msg = iteration_context.image_context_message
+        if latest_image_context_msg:
             try:
-                image_context_content = json.loads(latest_image_context_msg.data[0]["content"])
-                base64_image = image_context_content.get("base64")
-                mime_type = image_context_content.get("mime_type")
-                file_path = image_context_content.get("file_path", "unknown file")
-
-                if base64_image and mime_type:
-                    temp_message_content_list.append({
-                        "type": "text",
-                        "text": f"Here is the image you requested to see: '{file_path}'"
-                    })
-                    temp_message_content_list.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_image}",
-                        }
-                    })
-                else:
-                    logger.warning(f"Image context found for '{file_path}' but missing base64 or mime_type.")
-
-                await client.table('messages').delete().eq('message_id', latest_image_context_msg.data[0]["message_id"]).execute()
+                image_context_content = json.loads(latest_image_context_msg["content"])
+                # see_image with several paths lists them under 'images'; a single image is the message itself
+                image_entries = image_context_content.get("images") or [image_context_content]
+                description = image_context_content.get("description")
+                for image_entry in image_entries:
+                    # Rows carry the bytes inline; rows that only reference a blob are read from this worker's blob store
+                    base64_image = image_entry.get("base64")
+                    blob_id = image_entry.get("blob_id")
+                    if not base64_image and blob_id:
+                        image_bytes = await blob_store.get(blob_id)
+                        if image_bytes is not None:
+                            base64_image = base64.b64encode(image_bytes).decode('utf-8')
+                        else:
+                            logger.warning(f"Image blob {blob_id} is not stored on this worker and the message has no inline copy")
+                            trace.event(name="image_blob_missing", level="WARNING", status_message=(f"{blob_id}"))
+                    mime_type = image_entry.get("mime_type")
+                    file_path = image_entry.get("file_path", "unknown file")
+
+                    if base64_image and mime_type:
+                        temp_message_content_list.append({
+                            "type": "text",
+                            "text": description or f"Here is the image you requested to see: '{file_path}'"
+                        })
+                        temp_message_content_list.append({
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{base64_image}",
+                            }
+                        })
+                    else:
+                        logger.warning(f"Image context found for '{file_path}' but missing image data or mime_type.")
+
+                pending_cleanup = asyncio.create_task(delete_message(client, latest_image_context_msg["message_id"]))
             except Exception as e:
                 logger.error(f"Error parsing image context: {e}")
                 trace.event(name="error_parsing_image_context", level="ERROR", status_message=(f"{e}"))
@@ -343,6 +376,15 @@ async def run_agent(
             break
         generation.end(output=full_response)
 
+    if iteration_started_at is not None:
+        billing_cache.record_usage(account_id, time.monotonic() - iteration_started_at)
+
+    if pending_cleanup:
+        try:
+            await pending_cleanup
+        except Exception as e:
+            logger.error(f"Error deleting consumed image context: {e}")
+
     langfuse.flush() # Flush Langfuse events at the end of the run
   
 
@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.supabase import DBConnection
+from utils.config import config
+from utils.logger import logger
+
+# Storage bucket for browser screenshots (public, same bucket as upload_base64_image)
+SCREENSHOT_BUCKET = "browser-screenshots"
+
+# Screenshots waiting for upload; submit() waits for space when the queue is full
+SCREENSHOT_UPLOAD_QUEUE_SIZE = 64
+
+# Concurrent uploads
+SCREENSHOT_UPLOAD_WORKERS = 4
+
+# Attempts per screenshot before it is given up on
+SCREENSHOT_UPLOAD_ATTEMPTS = 3
+
+# Seconds resolve() waits for a pending upload before falling back to a data URL
+SCREENSHOT_RESOLVE_TIMEOUT = 10
+
+# Failed screenshots kept in memory so resolve() can still return them as data URLs
+SCREENSHOT_FAILED_CACHE_SIZE = 16
+
+MIME_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+
+
+class _PendingUpload:
+    __slots__ = ("path", "data", "mime_type", "done")
+
+    def __init__(self, path: str, data: bytes, mime_type: str):
+        self.path = path
+        self.data = data
+        self.mime_type = mime_type
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class ScreenshotUploader:
+    """Uploads browser screenshots off the tool's critical path.
+
+    Screenshots are stored under their sha256, so the public URL is known
+    before the upload finishes and identical screenshots are uploaded once.
+    submit() returns that URL immediately and a pool of workers drains a
+    bounded queue. Callers that are about to hand the URL to a model call
+    resolve() first, which waits for the upload and falls back to a data URL
+    if it failed.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._pending: Dict[str, _PendingUpload] = {}
+        self._uploaded: "OrderedDict[str, None]" = OrderedDict()
+        self._failed: "OrderedDict[str, _PendingUpload]" = OrderedDict()
+
+    def public_url(self, path: str) -> str:
+        return f"{config.SUPABASE_URL.rstrip('/')}/storage/v1/object/public/{SCREENSHOT_BUCKET}/{path}"
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        # Workers belong to one event loop; a worker process may run agents on a fresh loop
+        self._loop = loop
+        self._pending.clear()
+        self._queue = asyncio.Queue(maxsize=SCREENSHOT_UPLOAD_QUEUE_SIZE)
+        self._workers = [loop.create_task(self._worker()) for _ in range(SCREENSHOT_UPLOAD_WORKERS)]
+
+    async def submit(self, data: bytes, mime_type: str = "image/jpeg") -> str:
+        """Queue a screenshot for upload and return its public URL."""
+        extension = MIME_EXTENSIONS.get(mime_type, "jpg")
+        path = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+        url = self.public_url(path)
+        self._start()
+        if url in self._pending or url in self._uploaded:
+            return url
+
+        self._failed.pop(url, None)
+        upload = _PendingUpload(path, data, mime_type)
+        self._pending[url] = upload
+        await self._queue.put(upload)
+        return url
+
+    async def resolve(self, url: str, timeout: float = SCREENSHOT_RESOLVE_TIMEOUT) -> Optional[str]:
+        """URL to give the model for a submitted screenshot.
+
+        Waits for a pending upload. Returns the URL once uploaded, a data URL if
+        the upload failed or timed out, and the URL unchanged if this process did
+        not submit it.
+        """
+        upload = self._pending.get(url)
+        if upload is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(upload.done), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Screenshot upload still pending after {timeout}s, sending it inline")
+                return self._data_url(upload)
+
+        failed = self._failed.get(url)
+        if failed is not None:
+            return self._data_url(failed)
+        return url
+
+    def _data_url(self, upload: _PendingUpload) -> str:
+        return f"data:{upload.mime_type};base64,{base64.b64encode(upload.data).decode('utf-8')}"
+
+    async def _worker(self) -> None:
+        while True:
+            upload = await self._queue.get()
+            try:
+                await self._upload(upload)
+            finally:
+                self._queue.task_done()
+
+    async def _upload(self, upload: _PendingUpload) -> None:
+        url = self.public_url(upload.path)
+        error = None
+        for attempt in range(SCREENSHOT_UPLOAD_ATTEMPTS):
+            try:
+                client = await DBConnection().client
+                await client.storage.from_(SCREENSHOT_BUCKET).upload(
+                    upload.path,
+                    upload.data,
+                    {"content-type": upload.mime_type, "upsert": "true"}
+                )
+                error = None
+                break
+            except Exception as e:
+                error = e
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+        self._pending.pop(url, None)
+        if error is None:
+            self._uploaded[url] = None
+            while len(self._uploaded) > SCREENSHOT_UPLOAD_QUEUE_SIZE * 4:
+                self._uploaded.popitem(last=False)
+        else:
+            logger.error(f"Failed to upload screenshot {upload.path}: {error}")
+            self._failed[url] = upload
+            while len(self._failed) > SCREENSHOT_FAILED_CACHE_SIZE:
+                self._failed.popitem(last=False)
+        if not upload.done.done():
+            upload.done.set_result(error is None)
+
+
+screenshot_uploader = ScreenshotUploader()
@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def BlobStore(import_with_stubs, logger_stub):
+    return import_with_stubs("agent.blob_store", logger_stub).BlobStore
+
+
+def test_put_returns_content_address_and_get_reads_it_back(BlobStore, tmp_path):
+    store = BlobStore(directory=str(tmp_path))
+
+    async def scenario():
+        blob_id = await store.put(b"image bytes")
+        return blob_id, await store.get(blob_id)
+
+    blob_id, data = asyncio.run(scenario())
+
+    assert blob_id == hashlib.sha256(b"image bytes").hexdigest()
+    assert data == b"image bytes"
+    assert store.has(blob_id)
+    assert os.path.exists(os.path.join(tmp_path, blob_id[:2], blob_id))
+
+
+def test_evicted_blobs_are_read_from_disk(BlobStore, tmp_path):
+    store = BlobStore(directory=str(tmp_path), memory_bytes=10)
+
+    async def scenario():
+        first = await store.put(b"a" * 8)
+        await store.put(b"b" * 8)
+        assert first not in store._memory
+        return first, await store.get(first)
+
+    first, data = asyncio.run(scenario())
+
+    assert data == b"a" * 8
+    assert list(store._memory) == [first]
+
+
+def test_missing_blob(BlobStore, tmp_path):
+    store = BlobStore(directory=str(tmp_path))
+
+    assert not store.has("0" * 64)
+    assert asyncio.run(store.get("0" * 64)) is None
+
+
+def test_prune_removes_least_recently_written_blobs(BlobStore, tmp_path):
+    store = BlobStore(directory=str(tmp_path), memory_bytes=0, disk_bytes=20)
+
+    async def scenario():
+        blob_ids = []
+        for i in range(3):
+            blob_ids.append(await store.put(bytes([i]) * 10))
+            path = store._path(blob_ids[-1])
+            os.utime(path, (i, i))
+        return blob_ids
+
+    blob_ids = asyncio.run(scenario())
+    store._memory.clear()
+    store._prune()
+
+    assert [store.has(blob_id) for blob_id in blob_ids] == [False, True, True]
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from io import BytesIO
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from agent import image_compression
+from agent.image_compression import build_contact_sheet, compress_image, run_compression
+
+
+def encode(image, format):
+    output = BytesIO()
+    image.save(output, format=format)
+    return output.getvalue()
+
+
+def crash_worker():
+    os._exit(1)
+
+
+def test_compress_image_downscales_large_jpeg():
+    original = encode(Image.new("RGB", (4000, 3000), (200, 30, 30)), "JPEG")
+
+    compressed, mime_type, size = compress_image(original, "image/jpeg", "photo.jpg")
+
+    assert mime_type == "image/jpeg"
+    assert size == Image.open(BytesIO(compressed)).size
+    with Image.open(BytesIO(compressed)) as img:
+        assert img.width <= image_compression.DEFAULT_MAX_WIDTH
+        assert img.height <= image_compression.DEFAULT_MAX_HEIGHT
+
+
+def test_compress_image_keeps_png():
+    original = encode(Image.new("RGBA", (64, 64), (0, 0, 255, 128)), "PNG")
+
+    compressed, mime_type, _ = compress_image(original, "image/png", "chart.png")
+
+    assert mime_type == "image/png"
+    assert Image.open(BytesIO(compressed)).format == "PNG"
+
+
+def test_contact_sheet_fits_canvas():
+    charts = [(encode(Image.new("RGB", (800, 600), (i * 20, 100, 100)), "PNG"), f"chart_{i}.png") for i in range(12)]
+
+    sheet = build_contact_sheet(charts)
+
+    with Image.open(BytesIO(sheet)) as img:
+        assert img.format == "JPEG"
+        assert img.width <= image_compression.CONTACT_SHEET_MAX_WIDTH
+        assert img.height <= image_compression.CONTACT_SHEET_MAX_HEIGHT
+
+
+def test_run_compression_replaces_a_broken_pool():
+    async def scenario():
+        with pytest.raises(Exception):
+            # Kills a worker, which breaks the pool for every later call
+            await run_compression(crash_worker)
+        return await run_compression(compress_image, encode(Image.new("RGB", (10, 10)), "PNG"), "image/png", "x.png")
+
+    try:
+        compressed, mime_type, _ = asyncio.run(scenario())
+    finally:
+        if image_compression._compression_pool is not None:
+            image_compression._compression_pool.shutdown()
+            image_compression._compression_pool = None
+    assert mime_type == "image/png"
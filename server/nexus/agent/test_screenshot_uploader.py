@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import types
+
+import pytest
+
+
+class FakeBucket:
+    def __init__(self, storage):
+        self.storage = storage
+
+    async def upload(self, path, data, options):
+        self.storage.calls.append(path)
+        if self.storage.gate is not None:
+            await self.storage.gate.wait()
+        if self.storage.fail:
+            raise RuntimeError("storage unavailable")
+
+
+class FakeStorage:
+    def __init__(self, fail=False, gate=None):
+        self.fail = fail
+        self.gate = gate
+        self.calls = []
+        self.buckets = []
+
+    def from_(self, bucket):
+        self.buckets.append(bucket)
+        return FakeBucket(self)
+
+
+@pytest.fixture
+def storage():
+    return FakeStorage()
+
+
+@pytest.fixture
+def uploader_module(import_with_stubs, logger_stub, storage, monkeypatch):
+    client = types.SimpleNamespace(storage=storage)
+
+    class FakeDBConnection:
+        @property
+        async def client(self):
+            return client
+
+    module = import_with_stubs("agent.screenshot_uploader", {
+        **logger_stub,
+        "services.supabase": {"DBConnection": FakeDBConnection},
+        "utils.config": {"config": types.SimpleNamespace(SUPABASE_URL="https://supabase.test/")},
+    })
+    monkeypatch.setattr(module, "SCREENSHOT_UPLOAD_ATTEMPTS", 1)
+    return module
+
+
+def test_submit_returns_content_addressed_url_and_uploads_once(uploader_module, storage):
+    uploader = uploader_module.ScreenshotUploader()
+
+    async def scenario():
+        first = await uploader.submit(b"screenshot")
+        second = await uploader.submit(b"screenshot")
+        return first, second, await uploader.resolve(first)
+
+    first, second, resolved = asyncio.run(scenario())
+
+    path = f"{hashlib.sha256(b'screenshot').hexdigest()[:32]}.jpg"
+    assert first == second == resolved
+    assert first == f"https://supabase.test/storage/v1/object/public/{uploader_module.SCREENSHOT_BUCKET}/{path}"
+    assert storage.calls == [path]
+    assert storage.buckets == [uploader_module.SCREENSHOT_BUCKET]
+
+
+def test_resolve_falls_back_to_data_url_when_upload_fails(uploader_module, storage):
+    storage.fail = True
+    uploader = uploader_module.ScreenshotUploader()
+
+    async def scenario():
+        url = await uploader.submit(b"png", "image/png")
+        return await uploader.resolve(url)
+
+    assert asyncio.run(scenario()) == "data:image/png;base64,cG5n"
+
+
+def test_resolve_falls_back_to_data_url_after_timeout(uploader_module, storage):
+    uploader = uploader_module.ScreenshotUploader()
+
+    async def scenario():
+        storage.gate = asyncio.Event()
+        url = await uploader.submit(b"png", "image/png")
+        resolved = await uploader.resolve(url, timeout=0.05)
+        storage.gate.set()
+        return resolved, await uploader.resolve(url)
+
+    pending, uploaded = asyncio.run(scenario())
+
+    assert pending == "data:image/png;base64,cG5n"
+    assert uploaded.startswith("https://supabase.test/")
+
+
+def test_resolve_leaves_unknown_urls_unchanged(uploader_module, storage):
+    uploader = uploader_module.ScreenshotUploader()
+
+    assert asyncio.run(uploader.resolve("https://example.com/a.jpg")) == "https://example.com/a.jpg"
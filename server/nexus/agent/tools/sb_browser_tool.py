@@ -1,111 +1,234 @@
 import traceback
+import base64
 import json
+import re
+from typing import Any, Dict, List, Optional
 
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from agentpress.thread_manager import ThreadManager
 from sandbox.tool_base import SandboxToolsBase
+from sandbox.browser_client import BrowserApiClient
 from utils.logger import logger
-from utils.s3_upload_utils import upload_base64_image
+from agent.screenshot_uploader import screenshot_uploader
 
+# Browser context created by the sandbox's browser service at startup
+DEFAULT_BROWSER_CONTEXT = "default"
+
+# Optional parameter shared by interaction actions to skip state capture on intermediate steps
+DETAIL_PARAMETER = {
+    "type": "string",
+    "enum": ["none", "dom", "screenshot", "full"],
+    "description": "Page state to capture after the action: 'none' (url and title only), 'dom' (element list, no screenshot), 'screenshot' (no element list) or 'full' (default). Use 'none' for intermediate steps of a multi-step interaction and 'full' on the last one."
+}
+
+# Screenshot encoding sent with every action; WebP is about a third the size of the old JPEG q60
+DEFAULT_SCREENSHOT_OPTIONS = {"screenshot_format": "webp", "screenshot_quality": 60}
+
+# Per-model overrides, matched by substring of the model name
+MODEL_SCREENSHOT_OPTIONS = {
+    # Gemini tiles images at 768px, so larger screenshots cost tokens without adding detail
+    "gemini": {"screenshot_max_dim": 768},
+}
+
+def screenshot_options_for_model(model_name: Optional[str]) -> Dict[str, Any]:
+    """Screenshot encoding options for the model that will look at the screenshots"""
+    options = dict(DEFAULT_SCREENSHOT_OPTIONS)
+    for fragment, overrides in MODEL_SCREENSHOT_OPTIONS.items():
+        if model_name and fragment in model_name.lower():
+            options.update(overrides)
+            break
+    return options
+
+def screenshots_match(screenshot_hash: Optional[str], other: Optional[str]) -> bool:
+    """Whether two screenshot content hashes are known and identical"""
+    return bool(screenshot_hash) and screenshot_hash == other
+
+# Element lines in the browser service's element list start with their index, e.g. "[12]<button>"
+ELEMENT_LINE_RE = re.compile(r'\[(\d+)\]<')
+
+def apply_element_diff(lines: List[str], elements: str, dom_diff: Dict[str, Any]) -> List[str]:
+    """Element list lines after applying a diff from the browser service.
+    
+    Changed elements are replaced in place, removed ones dropped and added ones
+    inserted in index order. Free text lines between elements are kept as they were.
+    """
+    updates = {}
+    for line in elements.splitlines():
+        match = ELEMENT_LINE_RE.match(line)
+        if match:
+            updates[int(match.group(1))] = line
+    removed = set(dom_diff.get("removed") or [])
+    known = {int(match.group(1)) for match in map(ELEMENT_LINE_RE.match, lines) if match}
+    added = sorted(idx for idx in updates if idx not in known)
+
+    merged = []
+    for line in lines:
+        match = ELEMENT_LINE_RE.match(line)
+        if match:
+            idx = int(match.group(1))
+            while added and added[0] < idx:
+                merged.append(updates[added.pop(0)])
+            if idx in removed:
+                continue
+            if idx in updates:
+                merged.append(updates[idx])
+                continue
+        merged.append(line)
+    merged.extend(updates[idx] for idx in added)
+    return merged
+
+# Optional parameter choosing which resources pages load
+RESOURCE_PROFILE_PARAMETER = {
+    "type": "string",
+    "enum": ["full", "no-media", "text-only"],
+    "description": "Resources to load: 'full' (everything), 'no-media' (no images, video or fonts, no ad/analytics scripts) or 'text-only' (also no stylesheets). Use 'text-only' or 'no-media' when only reading text; pages load much faster."
+}
 
 class SandboxBrowserTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities."""
     
-    def __init__(self, project_id: str, thread_id: str, thread_manager: ThreadManager):
+    def __init__(self, project_id: str, thread_id: str, thread_manager: ThreadManager, model_name: Optional[str] = None):
         super().__init__(project_id, thread_manager)
         self.thread_id = thread_id
+        self._screenshot_options = screenshot_options_for_model(model_name)
+        self._browser_client = None
+        # Browser contexts that have sent this run a full element dump; later actions get diffs
+        self._full_dom_contexts = set()
+        # Per context: (url, element list lines) rebuilt from the last full dump and the diffs since
+        self._element_lines: Dict[str, tuple] = {}
+        # Browser context actions run in, chosen with browser_use_context
+        self._context_id = DEFAULT_BROWSER_CONTEXT
+        # Content hash and URL of the last uploaded screenshot, reused when the screenshot is identical
+        self._last_screenshot_hash = None
+        self._last_screenshot_url = None
+
+    async def _get_browser_client(self) -> BrowserApiClient:
+        await self._ensure_sandbox()
+        if self._browser_client is None:
+            self._browser_client = BrowserApiClient(self.sandbox, api_token=self._sandbox_pass)
+        return self._browser_client
+
+    def _update_elements(self, result: Dict[str, Any]) -> None:
+        """Replace a diff in the action result with the context's full current element list"""
+        dom_mode = result.get("dom_mode")
+        if dom_mode == "full":
+            self._full_dom_contexts.add(self._context_id)
+            self._element_lines[self._context_id] = (result.get("url"), (result.get("elements") or "").splitlines())
+        elif dom_mode == "diff":
+            known = self._element_lines.get(self._context_id)
+            if known is None or known[0] != result.get("url"):
+                # Diffed against a page this tool has no list for (another tab); the diff is
+                # all there is to show, and the next action asks for a full dump again
+                self._full_dom_contexts.discard(self._context_id)
+                self._element_lines.pop(self._context_id, None)
+                return
+            lines = apply_element_diff(known[1], result.get("elements") or "", result.get("dom_diff") or {})
+            self._element_lines[self._context_id] = (known[0], lines)
+            result["elements"] = "\n".join(lines)
+        # Structured element data duplicates the element list
+        result.pop("interactive_elements", None)
 
-    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST") -> ToolResult:
+    async def _execute_browser_action(self, endpoint: str, params: dict = None, method: str = "POST", detail: str = "full") -> ToolResult:
         """Execute a browser automation action through the API
         
         Args:
             endpoint (str): The API endpoint to call
             params (dict, optional): Parameters to send. Defaults to None.
             method (str, optional): HTTP method to use. Defaults to "POST".
+            detail (str, optional): State detail level to capture after the action. Defaults to "full".
             
         Returns:
             ToolResult: Result of the execution
         """
         try:
             # Ensure sandbox is initialized
-            await self._ensure_sandbox()
-            
-            # Build the curl command
-            url = f"http://localhost:8003/api/automation/{endpoint}"
-            
-            if method == "GET" and params:
-                query_params = "&".join([f"{k}={v}" for k, v in params.items()])
-                url = f"{url}?{query_params}"
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-            else:
-                curl_cmd = f"curl -s -X {method} '{url}' -H 'Content-Type: application/json'"
-                if params:
-                    json_data = json.dumps(params)
-                    curl_cmd += f" -d '{json_data}'"
-            
-            logger.debug("\033[95mExecuting curl command:\033[0m")
-            logger.debug(f"{curl_cmd}")
-            
-            response = self.sandbox.process.exec(curl_cmd, timeout=30)
+            await self._get_browser_client()
+
+            logger.debug(f"Executing browser action {method} {endpoint}")
+            options = {
+                "screenshot_mode": "ref",
+                "detail": detail,
+                "dom_mode": "diff" if self._context_id in self._full_dom_contexts else "full",
+                "context_id": self._context_id,
+                **self._screenshot_options
+            }
+            result = await self._browser_client.request(endpoint, params, method, options=options)
+            self._update_elements(result)
+
+            if not "content" in result:
+                result["content"] = ""
             
-            if response.exit_code == 0:
+            if not "role" in result:
+                result["role"] = "assistant"
+
+            logger.info("Browser automation request completed successfully")
+
+            if result.get("screenshot_id") and self._last_screenshot_url and \
+                    screenshots_match(result.get("screenshot_hash"), self._last_screenshot_hash):
+                # Identical to the last screenshot: skip the download and upload
+                result.pop("screenshot_id")
+                result["image_url"] = self._last_screenshot_url
+                result["screenshot_unchanged"] = True
+                logger.debug("Screenshot unchanged, reusing the previous upload")
+
+            screenshot_bytes = None
+            if result.get("screenshot_id"):
                 try:
-                    result = json.loads(response.result)
-
-                    if not "content" in result:
-                        result["content"] = ""
-                    
-                    if not "role" in result:
-                        result["role"] = "assistant"
-
-                    logger.info("Browser automation request completed successfully")
-
-                    if "screenshot_base64" in result:
-                        try:
-                            image_url = await upload_base64_image(result["screenshot_base64"])
-                            result["image_url"] = image_url
-                            # Remove base64 data from result to keep it clean
-                            del result["screenshot_base64"]
-                            logger.debug(f"Uploaded screenshot to {image_url}")
-                        except Exception as e:
-                            logger.error(f"Failed to upload screenshot: {e}")
-                            result["image_upload_error"] = str(e)
-
-                    added_message = await self.thread_manager.add_message(
-                        thread_id=self.thread_id,
-                        type="browser_state",
-                        content=result,
-                        is_llm_message=False
-                    )
-
-                    success_response = {
-                        "success": True,
-                        "message": result.get("message", "Browser action completed successfully")
-                    }
+                    screenshot_bytes = await self._browser_client.fetch_screenshot(result.pop("screenshot_id"))
+                except Exception as e:
+                    logger.error(f"Failed to fetch screenshot: {e}")
+                    result["image_upload_error"] = str(e)
+            elif result.get("screenshot_base64"):
+                # Inline screenshot from the exec fallback
+                screenshot_bytes = base64.b64decode(result.pop("screenshot_base64"))
+
+            if screenshot_bytes:
+                try:
+                    # Returns the content-addressed URL right away; run_agent waits for
+                    # the upload only when it attaches the screenshot
+                    image_url = await screenshot_uploader.submit(screenshot_bytes, result.get("screenshot_mime") or "image/jpeg")
+                    result["image_url"] = image_url
+                    self._last_screenshot_hash = result.get("screenshot_hash")
+                    self._last_screenshot_url = image_url
+                except Exception as e:
+                    logger.error(f"Failed to queue screenshot upload: {e}")
+                    result["image_upload_error"] = str(e)
+
+            added_message = await self.thread_manager.add_message(
+                thread_id=self.thread_id,
+                type="browser_state",
+                content=result,
+                is_llm_message=False
+            )
+
+            success_response = {
+                "success": True,
+                "message": result.get("message", "Browser action completed successfully")
+            }
+
+            if added_message and 'message_id' in added_message:
+                success_response['message_id'] = added_message['message_id']
+            if result.get("url"):
+                success_response["url"] = result["url"]
+            if result.get("title"):
+                success_response["title"] = result["title"]
+            if result.get("element_count"):
+                success_response["elements_found"] = result["element_count"]
+            if result.get("pixels_below"):
+                success_response["scrollable_content"] = result["pixels_below"] > 0
+            if result.get("ocr_text"):
+                success_response["ocr_text"] = result["ocr_text"]
+            # The tool result stays in the thread, so it only summarizes element changes; the
+            # current element list reaches the LLM through the temporary browser state message
+            if result.get("dom_diff"):
+                success_response["element_changes"] = result["dom_diff"].get("summary")
+            if result.get("image_url"):
+                success_response["image_url"] = result["image_url"]
+            if result.get("steps"):
+                success_response["success"] = result.get("success", True)
+                success_response["steps"] = result["steps"]
 
-                    if added_message and 'message_id' in added_message:
-                        success_response['message_id'] = added_message['message_id']
-                    if result.get("url"):
-                        success_response["url"] = result["url"]
-                    if result.get("title"):
-                        success_response["title"] = result["title"]
-                    if result.get("element_count"):
-                        success_response["elements_found"] = result["element_count"]
-                    if result.get("pixels_below"):
-                        success_response["scrollable_content"] = result["pixels_below"] > 0
-                    if result.get("ocr_text"):
-                        success_response["ocr_text"] = result["ocr_text"]
-                    if result.get("image_url"):
-                        success_response["image_url"] = result["image_url"]
-
-                    return self.success_response(success_response)
-
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse response JSON: {response.result} {e}")
-                    return self.fail_response(f"Failed to parse response JSON: {response.result} {e}")
-            else:
-                logger.error(f"Browser automation request failed 2: {response}")
-                return self.fail_response(f"Browser automation request failed 2: {response}")
+            return self.success_response(success_response)
 
         except Exception as e:
             logger.error(f"Error executing browser action: {e}")
@@ -124,7 +247,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "url": {
                         "type": "string",
                         "description": "The url to navigate to"
-                    }
+                    },
+                    "resource_profile": RESOURCE_PROFILE_PARAMETER
                 },
                 "required": ["url"]
             }
@@ -133,24 +257,34 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-navigate-to",
         mappings=[
-            {"param_name": "url", "node_type": "content", "path": "."}
+            {"param_name": "url", "node_type": "content", "path": "."},
+            {"param_name": "resource_profile", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-navigate-to>
         https://example.com
         </browser-navigate-to>
+
+        <!-- Reading an article: skip images, fonts and trackers -->
+        <browser-navigate-to resource_profile="no-media">
+        https://example.com/news/article
+        </browser-navigate-to>
         '''
     )
-    async def browser_navigate_to(self, url: str) -> ToolResult:
+    async def browser_navigate_to(self, url: str, resource_profile: str = None) -> ToolResult:
         """Navigate to a specific url
         
         Args:
             url (str): The url to navigate to
+            resource_profile (str, optional): Resources to load for this page (full, no-media, text-only). Defaults to the context's profile.
             
         Returns:
             dict: Result of the execution
         """
-        return await self._execute_browser_action("navigate_to", {"url": url})
+        params = {"url": url}
+        if resource_profile:
+            params["resource_profile"] = {"name": resource_profile}
+        return await self._execute_browser_action("navigate_to", params)
 
     # @openapi_schema({
     #     "type": "function",
@@ -199,25 +333,32 @@ class SandboxBrowserTool(SandboxToolsBase):
             "description": "Navigate back in browser history",
             "parameters": {
                 "type": "object",
-                "properties": {}
+                "properties": {
+                    "detail": DETAIL_PARAMETER
+                }
             }
         }
     })
     @xml_schema(
         tag_name="browser-go-back",
-        mappings=[],
+        mappings=[
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
+        ],
         example='''
         <browser-go-back></browser-go-back>
         '''
     )
-    async def browser_go_back(self) -> ToolResult:
+    async def browser_go_back(self, detail: str = "full") -> ToolResult:
         """Navigate back in browser history
         
+        Args:
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
+            
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mNavigating back in browser history\033[0m")
-        return await self._execute_browser_action("go_back", {})
+        return await self._execute_browser_action("go_back", {}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -230,7 +371,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "seconds": {
                         "type": "integer",
                         "description": "Number of seconds to wait (default: 3)"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 }
             }
         }
@@ -238,7 +380,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-wait",
         mappings=[
-            {"param_name": "seconds", "node_type": "content", "path": "."}
+            {"param_name": "seconds", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-wait>
@@ -246,17 +389,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-wait>
         '''
     )
-    async def browser_wait(self, seconds: int = 3) -> ToolResult:
+    async def browser_wait(self, seconds: int = 3, detail: str = "full") -> ToolResult:
         """Wait for the specified number of seconds
         
         Args:
             seconds (int, optional): Number of seconds to wait. Defaults to 3.
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mWaiting for {seconds} seconds\033[0m")
-        return await self._execute_browser_action("wait", {"seconds": seconds})
+        return await self._execute_browser_action("wait", {"seconds": seconds}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -269,7 +413,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "index": {
                         "type": "integer",
                         "description": "The index of the element to click"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 },
                 "required": ["index"]
             }
@@ -278,7 +423,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-click-element",
         mappings=[
-            {"param_name": "index", "node_type": "content", "path": "."}
+            {"param_name": "index", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-click-element>
@@ -286,17 +432,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-click-element>
         '''
     )
-    async def browser_click_element(self, index: int) -> ToolResult:
+    async def browser_click_element(self, index: int, detail: str = "full") -> ToolResult:
         """Click on an element by index
         
         Args:
             index (int): The index of the element to click
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mClicking element with index: {index}\033[0m")
-        return await self._execute_browser_action("click_element", {"index": index})
+        return await self._execute_browser_action("click_element", {"index": index}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -313,7 +460,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "text": {
                         "type": "string",
                         "description": "The text to input"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 },
                 "required": ["index", "text"]
             }
@@ -323,26 +471,33 @@ class SandboxBrowserTool(SandboxToolsBase):
         tag_name="browser-input-text",
         mappings=[
             {"param_name": "index", "node_type": "attribute", "path": "."},
-            {"param_name": "text", "node_type": "content", "path": "."}
+            {"param_name": "text", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-input-text index="2">
         Hello, world!
         </browser-input-text>
+
+        <!-- Skip state capture on intermediate steps of a form -->
+        <browser-input-text index="3" detail="none">
+        user@example.com
+        </browser-input-text>
         '''
     )
-    async def browser_input_text(self, index: int, text: str) -> ToolResult:
+    async def browser_input_text(self, index: int, text: str, detail: str = "full") -> ToolResult:
         """Input text into an element
         
         Args:
             index (int): The index of the element to input text into
             text (str): The text to input
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mInputting text into element {index}: {text}\033[0m")
-        return await self._execute_browser_action("input_text", {"index": index, "text": text})
+        return await self._execute_browser_action("input_text", {"index": index, "text": text}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -355,7 +510,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "keys": {
                         "type": "string",
                         "description": "The keys to send (e.g., 'Enter', 'Escape', 'Control+a')"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 },
                 "required": ["keys"]
             }
@@ -364,7 +520,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-send-keys",
         mappings=[
-            {"param_name": "keys", "node_type": "content", "path": "."}
+            {"param_name": "keys", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-send-keys>
@@ -372,17 +529,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-send-keys>
         '''
     )
-    async def browser_send_keys(self, keys: str) -> ToolResult:
+    async def browser_send_keys(self, keys: str, detail: str = "full") -> ToolResult:
         """Send keyboard keys
         
         Args:
             keys (str): The keys to send (e.g., 'Enter', 'Escape', 'Control+a')
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mSending keys: {keys}\033[0m")
-        return await self._execute_browser_action("send_keys", {"keys": keys})
+        return await self._execute_browser_action("send_keys", {"keys": keys}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -424,6 +582,70 @@ class SandboxBrowserTool(SandboxToolsBase):
         logger.debug(f"\033[95mSwitching to tab: {page_id}\033[0m")
         return await self._execute_browser_action("switch_tab", {"page_id": page_id})
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_use_context",
+            "description": "Switch subsequent browser actions to a named browser context, creating it if needed. Each context has its own tabs, cookies and history, so separate research tasks can keep separate pages. The initial context is 'default'.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "context_id": {
+                        "type": "string",
+                        "description": "Name of the browser context to use"
+                    },
+                    "resource_profile": RESOURCE_PROFILE_PARAMETER
+                },
+                "required": ["context_id"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-use-context",
+        mappings=[
+            {"param_name": "context_id", "node_type": "content", "path": "."},
+            {"param_name": "resource_profile", "node_type": "attribute", "path": ".", "required": False}
+        ],
+        example='''
+        <browser-use-context>
+        competitor-research
+        </browser-use-context>
+
+        <!-- A context for text-only reading -->
+        <browser-use-context resource_profile="text-only">
+        filings
+        </browser-use-context>
+        '''
+    )
+    async def browser_use_context(self, context_id: str, resource_profile: str = None) -> ToolResult:
+        """Switch subsequent browser actions to a named browser context
+        
+        Args:
+            context_id (str): Name of the browser context to use
+            resource_profile (str, optional): Resources pages in the context load (full, no-media, text-only). Defaults to keeping the context's profile.
+            
+        Returns:
+            dict: Result of the execution
+        """
+        try:
+            client = await self._get_browser_client()
+            params = {"context_id": context_id}
+            if resource_profile:
+                params["resource_profile"] = {"name": resource_profile}
+            result = await client.request("contexts", params)
+            if "context_id" not in result:
+                return self.fail_response(f"Could not open browser context {context_id}: {result.get('detail', result)}")
+            self._context_id = result["context_id"]
+            return self.success_response({
+                "context_id": self._context_id,
+                "created": result.get("created", False),
+                "resource_profile": result.get("resource_profile"),
+                "message": f"Browser actions now run in context '{self._context_id}'"
+            })
+        except Exception as e:
+            logger.error(f"Error switching browser context: {e}")
+            return self.fail_response(f"Error switching browser context: {e}")
+
     # @openapi_schema({
     #     "type": "function",
     #     "function": {
@@ -574,7 +796,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "amount": {
                         "type": "integer",
                         "description": "Pixel amount to scroll (if not specified, scrolls one page)"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 }
             }
         }
@@ -582,7 +805,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-scroll-down",
         mappings=[
-            {"param_name": "amount", "node_type": "content", "path": "."}
+            {"param_name": "amount", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-scroll-down>
@@ -590,11 +814,12 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-down>
         '''
     )
-    async def browser_scroll_down(self, amount: int = None) -> ToolResult:
+    async def browser_scroll_down(self, amount: int = None, detail: str = "full") -> ToolResult:
         """Scroll down the page
         
         Args:
             amount (int, optional): Pixel amount to scroll. If None, scrolls one page.
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
@@ -606,7 +831,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         else:
             logger.debug(f"\033[95mScrolling down one page\033[0m")
         
-        return await self._execute_browser_action("scroll_down", params)
+        return await self._execute_browser_action("scroll_down", params, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -619,7 +844,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "amount": {
                         "type": "integer",
                         "description": "Pixel amount to scroll (if not specified, scrolls one page)"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 }
             }
         }
@@ -627,7 +853,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-scroll-up",
         mappings=[
-            {"param_name": "amount", "node_type": "content", "path": "."}
+            {"param_name": "amount", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-scroll-up>
@@ -635,11 +862,12 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-up>
         '''
     )
-    async def browser_scroll_up(self, amount: int = None) -> ToolResult:
+    async def browser_scroll_up(self, amount: int = None, detail: str = "full") -> ToolResult:
         """Scroll up the page
         
         Args:
             amount (int, optional): Pixel amount to scroll. If None, scrolls one page.
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
@@ -651,7 +879,7 @@ class SandboxBrowserTool(SandboxToolsBase):
         else:
             logger.debug(f"\033[95mScrolling up one page\033[0m")
         
-        return await self._execute_browser_action("scroll_up", params)
+        return await self._execute_browser_action("scroll_up", params, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -664,7 +892,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "text": {
                         "type": "string",
                         "description": "The text to scroll to"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 },
                 "required": ["text"]
             }
@@ -673,7 +902,8 @@ class SandboxBrowserTool(SandboxToolsBase):
     @xml_schema(
         tag_name="browser-scroll-to-text",
         mappings=[
-            {"param_name": "text", "node_type": "content", "path": "."}
+            {"param_name": "text", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-scroll-to-text>
@@ -681,17 +911,18 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-scroll-to-text>
         '''
     )
-    async def browser_scroll_to_text(self, text: str) -> ToolResult:
+    async def browser_scroll_to_text(self, text: str, detail: str = "full") -> ToolResult:
         """Scroll to specific text on the page
         
         Args:
             text (str): The text to scroll to
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mScrolling to text: {text}\033[0m")
-        return await self._execute_browser_action("scroll_to_text", {"text": text})
+        return await self._execute_browser_action("scroll_to_text", {"text": text}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -748,7 +979,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "text": {
                         "type": "string",
                         "description": "The text of the option to select"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 },
                 "required": ["index", "text"]
             }
@@ -758,7 +990,8 @@ class SandboxBrowserTool(SandboxToolsBase):
         tag_name="browser-select-dropdown-option",
         mappings=[
             {"param_name": "index", "node_type": "attribute", "path": "."},
-            {"param_name": "text", "node_type": "content", "path": "."}
+            {"param_name": "text", "node_type": "content", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-select-dropdown-option index="2">
@@ -766,18 +999,19 @@ class SandboxBrowserTool(SandboxToolsBase):
         </browser-select-dropdown-option>
         '''
     )
-    async def browser_select_dropdown_option(self, index: int, text: str) -> ToolResult:
+    async def browser_select_dropdown_option(self, index: int, text: str, detail: str = "full") -> ToolResult:
         """Select an option from a dropdown by text
         
         Args:
             index (int): The index of the dropdown element
             text (str): The text of the option to select
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mSelecting option '{text}' from dropdown with index: {index}\033[0m")
-        return await self._execute_browser_action("select_dropdown_option", {"index": index, "text": text})
+        return await self._execute_browser_action("select_dropdown_option", {"index": index, "text": text}, detail=detail)
 
     @openapi_schema({
         "type": "function",
@@ -877,7 +1111,8 @@ class SandboxBrowserTool(SandboxToolsBase):
                     "y": {
                         "type": "integer",
                         "description": "The Y coordinate to click"
-                    }
+                    },
+                    "detail": DETAIL_PARAMETER
                 },
                 "required": ["x", "y"]
             }
@@ -887,21 +1122,102 @@ class SandboxBrowserTool(SandboxToolsBase):
         tag_name="browser-click-coordinates",
         mappings=[
             {"param_name": "x", "node_type": "attribute", "path": "."},
-            {"param_name": "y", "node_type": "attribute", "path": "."}
+            {"param_name": "y", "node_type": "attribute", "path": "."},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <browser-click-coordinates x="100" y="200"></browser-click-coordinates>
         '''
     )
-    async def browser_click_coordinates(self, x: int, y: int) -> ToolResult:
+    async def browser_click_coordinates(self, x: int, y: int, detail: str = "full") -> ToolResult:
         """Click at specific X,Y coordinates on the page
         
         Args:
             x (int): The X coordinate to click
             y (int): The Y coordinate to click
+            detail (str, optional): State to capture after the action (none, dom, screenshot, full). Defaults to "full".
             
         Returns:
             dict: Result of the execution
         """
         logger.debug(f"\033[95mClicking at coordinates: ({x}, {y})\033[0m")
-        return await self._execute_browser_action("click_coordinates", {"x": x, "y": y})
\ No newline at end of file
+        return await self._execute_browser_action("click_coordinates", {"x": x, "y": y}, detail=detail)
+
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "browser_batch_actions",
+            "description": "Run several browser actions back to back in one call and capture the page state once at the end. Use it for filling forms and other multi-step interactions whose element indices are already known. Returns the status of every step; by default the remaining steps are skipped after a failure.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "steps": {
+                        "type": "array",
+                        "description": "Actions to run in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {
+                                    "type": "string",
+                                    "enum": ["input_text", "click_element", "click_coordinates", "send_keys", "scroll_down", "scroll_up", "scroll_to_text", "select_dropdown_option"],
+                                    "description": "The action to run"
+                                },
+                                "params": {
+                                    "type": "object",
+                                    "description": "The action's parameters, e.g. {\"index\": 2, \"text\": \"Hello\"} for input_text, {\"index\": 4} for click_element, {\"keys\": \"Enter\"} for send_keys, {\"amount\": 500} for scrolling, {\"text\": \"Pricing\"} for scroll_to_text, {\"index\": 3, \"option_text\": \"Monthly\"} for select_dropdown_option"
+                                }
+                            },
+                            "required": ["action"]
+                        }
+                    },
+                    "stop_on_error": {
+                        "type": "boolean",
+                        "description": "Skip the remaining steps after the first failure. Defaults to true."
+                    },
+                    "detail": DETAIL_PARAMETER
+                },
+                "required": ["steps"]
+            }
+        }
+    })
+    @xml_schema(
+        tag_name="browser-batch-actions",
+        mappings=[
+            {"param_name": "steps", "node_type": "content", "path": "."},
+            {"param_name": "stop_on_error", "node_type": "attribute", "path": ".", "required": False},
+            {"param_name": "detail", "node_type": "attribute", "path": ".", "required": False}
+        ],
+        example='''
+        <browser-batch-actions>
+        [
+            {"action": "input_text", "params": {"index": 2, "text": "Jane Doe"}},
+            {"action": "input_text", "params": {"index": 3, "text": "jane@example.com"}},
+            {"action": "select_dropdown_option", "params": {"index": 5, "option_text": "Monthly"}},
+            {"action": "click_element", "params": {"index": 7}}
+        ]
+        </browser-batch-actions>
+        '''
+    )
+    async def browser_batch_actions(self, steps, stop_on_error: bool = True, detail: str = "full") -> ToolResult:
+        """Run several browser actions in one request
+        
+        Args:
+            steps (list | str): Actions to run in order, each {"action": ..., "params": {...}}; a JSON string is accepted
+            stop_on_error (bool, optional): Skip the remaining steps after the first failure. Defaults to True.
+            detail (str, optional): State to capture after the last step (none, dom, screenshot, full). Defaults to "full".
+            
+        Returns:
+            dict: Result of the execution
+        """
+        if isinstance(steps, str):
+            try:
+                steps = json.loads(steps)
+            except json.JSONDecodeError as e:
+                return self.fail_response(f"steps must be a JSON array of actions: {e}")
+        if isinstance(stop_on_error, str):
+            stop_on_error = stop_on_error.lower() != "false"
+        if not isinstance(steps, list) or not steps:
+            return self.fail_response("steps must be a non-empty list of actions")
+        
+        logger.debug(f"\033[95mRunning batch of {len(steps)} browser actions\033[0m")
+        return await self._execute_browser_action("batch", {"steps": steps, "stop_on_error": stop_on_error}, detail=detail)
\ No newline at end of file
@@ -1,10 +1,24 @@
 from typing import Optional, Dict, Any
-import time
+import base64
+import json
+import os
+import re
+import shlex
 from uuid import uuid4
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
 
+# Session helper baked into the sandbox image (sandbox/docker/nexus_shell.py). It creates
+# tmux sessions, sends commands, waits for completion and reads windowed output in a
+# single call and prints JSON.
+SHELL_HELPER = "nexus-shell"
+# Where the helper is uploaded when running against an image built before it existed
+SHELL_HELPER_FALLBACK_PATH = "/tmp/nexus_shell.py"
+SHELL_HELPER_SOURCE = os.path.join(os.path.dirname(__file__), '..', '..', 'sandbox', 'docker', 'nexus_shell.py')
+# Session names the helper accepts; they become tmux targets and file names in the sandbox
+SESSION_NAME_RE = re.compile(r'[A-Za-z0-9_-]+')
+
 class SandboxShellTool(SandboxToolsBase):
     """Tool for executing tasks in a Daytona sandbox with browser-use capabilities. 
     Uses sessions for maintaining state between commands and provides comprehensive process management."""
@@ -12,6 +26,8 @@ class SandboxShellTool(SandboxToolsBase):
     def __init__(self, project_id: str, thread_manager: ThreadManager):
         super().__init__(project_id, thread_manager)
         self._sessions: Dict[str, str] = {}  # Maps session names to session IDs
+        self._output_offsets: Dict[str, int] = {}  # Bytes of each tmux session's log already returned
+        self._helper = SHELL_HELPER
         self.workspace_path = "/workspace"  # Ensure we're always operating in /workspace
 
     async def _ensure_session(self, session_name: str = "default") -> str:
@@ -20,7 +36,7 @@ class SandboxShellTool(SandboxToolsBase):
             session_id = str(uuid4())
             try:
                 await self._ensure_sandbox()  # Ensure sandbox is initialized
-                self.sandbox.process.create_session(session_id)
+                await self.sandbox.process.create_session(session_id)
                 self._sessions[session_name] = session_id
             except Exception as e:
                 raise RuntimeError(f"Failed to create session: {str(e)}")
@@ -31,7 +47,7 @@ class SandboxShellTool(SandboxToolsBase):
         if session_name in self._sessions:
             try:
                 await self._ensure_sandbox()  # Ensure sandbox is initialized
-                self.sandbox.process.delete_session(self._sessions[session_name])
+                await self.sandbox.process.delete_session(self._sessions[session_name])
                 del self._sessions[session_name]
             except Exception as e:
                 print(f"Warning: Failed to cleanup session {session_name}: {str(e)}")
@@ -54,7 +70,7 @@ class SandboxShellTool(SandboxToolsBase):
                     },
                     "session_name": {
                         "type": "string",
-                        "description": "Optional name of the tmux session to use. Use named sessions for related commands that need to maintain state. Defaults to a random session name.",
+                        "description": "Optional name of the tmux session to use (letters, digits, '_' and '-' only). Use named sessions for related commands that need to maintain state. Defaults to a random session name.",
                     },
                     "blocking": {
                         "type": "boolean",
@@ -125,57 +141,23 @@ class SandboxShellTool(SandboxToolsBase):
             # Generate a session name if not provided
             if not session_name:
                 session_name = f"session_{str(uuid4())[:8]}"
+            elif not SESSION_NAME_RE.fullmatch(session_name):
+                return self.fail_response(self._invalid_session_message(session_name))
             
-            # Check if tmux session already exists
-            check_session = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            session_exists = "not_exists" not in check_session.get("output", "")
-            
-            if not session_exists:
-                # Create a new tmux session
-                await self._execute_raw_command(f"tmux new-session -d -s {session_name}")
-                
-            # Ensure we're in the correct directory and send command to tmux
-            full_command = f"cd {cwd} && {command}"
-            wrapped_command = full_command.replace('"', '\\"')  # Escape double quotes
-            
-            # Send command to tmux session
-            await self._execute_raw_command(f'tmux send-keys -t {session_name} "{wrapped_command}" Enter')
-            
+            # Create-if-missing, cd, send and (for blocking commands) wait, all in one call
+            helper_args = ["run", "--session", session_name, "--cwd", cwd, "--command", base64.b64encode(command.encode()).decode()]
             if blocking:
-                # For blocking execution, wait and capture output
-                start_time = time.time()
-                while (time.time() - start_time) < timeout:
-                    # Wait a bit before checking
-                    time.sleep(2)
-                    
-                    # Check if session still exists (command might have exited)
-                    check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'")
-                    if "ended" in check_result.get("output", ""):
-                        break
-                        
-                    # Get current output and check for common completion indicators
-                    output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                    current_output = output_result.get("output", "")
-                    
-                    # Check for prompt indicators that suggest command completion
-                    last_lines = current_output.split('\n')[-3:]
-                    completion_indicators = ['$', '#', '>', 'Done', 'Completed', 'Finished', '✓']
-                    if any(indicator in line for indicator in completion_indicators for line in last_lines):
-                        break
-                
-                # Capture final output
-                output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-                final_output = output_result.get("output", "")
-                
-                # Kill the session after capture
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
-                
-                return self.success_response({
-                    "output": final_output,
-                    "session_name": session_name,
-                    "cwd": cwd,
-                    "completed": True
-                })
+                helper_args += ["--wait", timeout, "--kill-on-exit"]
+            result = await self._run_helper(*helper_args, timeout=(timeout + 10) if blocking else 30)
+            if result.pop("created", False):
+                self._output_offsets[session_name] = 0
+
+            if blocking:
+                if not result["completed"]:
+                    result["message"] = f"Command did not finish within {timeout}s and is still running in tmux session '{session_name}'. Use check_command_output to view results."
+                else:
+                    self._output_offsets.pop(session_name, None)
+                return self.success_response(result)
             else:
                 # For non-blocking, just return immediately
                 return self.success_response({
@@ -189,12 +171,46 @@ class SandboxShellTool(SandboxToolsBase):
             # Attempt to clean up session in case of error
             if session_name:
                 try:
-                    await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                    await self._kill_session(session_name)
                 except:
                     pass
             return self.fail_response(f"Error executing command: {str(e)}")
 
-    async def _execute_raw_command(self, command: str) -> Dict[str, Any]:
+    @staticmethod
+    def _invalid_session_message(session_name: str) -> str:
+        return f"Invalid session name '{session_name}': use only letters, digits, '_' and '-'."
+
+    async def _kill_session(self, session_name: str) -> bool:
+        """Kill a tmux session and drop its output log. Returns whether it existed."""
+        result = await self._run_helper("kill", "--session", session_name)
+        self._output_offsets.pop(session_name, None)
+        return result.get("exists", False)
+
+    async def _install_helper(self) -> None:
+        """Upload the session helper for sandboxes whose image does not include it."""
+        with open(SHELL_HELPER_SOURCE, 'rb') as f:
+            await self.sandbox.fs.upload_file(SHELL_HELPER_FALLBACK_PATH, f.read())
+        self._helper = f"python3 {SHELL_HELPER_FALLBACK_PATH}"
+
+    async def _run_helper(self, *args, timeout: int = 30) -> Dict[str, Any]:
+        """Run a session helper subcommand and parse its JSON output."""
+        command = " ".join([self._helper] + [shlex.quote(str(arg)) for arg in args])
+        result = await self._execute_raw_command(command, timeout=timeout)
+        if result.get("exit_code") == 127 and self._helper == SHELL_HELPER:
+            await self._install_helper()
+            command = " ".join([self._helper] + [shlex.quote(str(arg)) for arg in args])
+            result = await self._execute_raw_command(command, timeout=timeout)
+
+        output = (result.get("output") or "").strip()
+        try:
+            parsed = json.loads(output.splitlines()[-1]) if output else {}
+        except json.JSONDecodeError:
+            raise RuntimeError(f"Unexpected output from shell helper: {output[:500]}")
+        if "error" in parsed:
+            raise RuntimeError(parsed["error"])
+        return parsed
+
+    async def _execute_raw_command(self, command: str, timeout: int = 30) -> Dict[str, Any]:
         """Execute a raw command directly in the sandbox."""
         # Ensure session exists for raw commands
         session_id = await self._ensure_session("raw_commands")
@@ -207,13 +223,13 @@ class SandboxShellTool(SandboxToolsBase):
             cwd=self.workspace_path
         )
         
-        response = self.sandbox.process.execute_session_command(
+        response = await self.sandbox.process.execute_session_command(
             session_id=session_id,
             req=req,
-            timeout=30  # Short timeout for utility commands
+            timeout=timeout  # Short timeout for utility commands unless the caller waits on purpose
         )
         
-        logs = self.sandbox.process.get_session_command_logs(
+        logs = await self.sandbox.process.get_session_command_logs(
             session_id=session_id,
             command_id=response.cmd_id
         )
@@ -268,27 +284,37 @@ class SandboxShellTool(SandboxToolsBase):
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            # Check if session exists
-            check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            if "not_exists" in check_result.get("output", ""):
+            if not SESSION_NAME_RE.fullmatch(session_name):
+                return self.fail_response(self._invalid_session_message(session_name))
+
+            # Read only what the session printed since the last check (and kill it if asked) in one call
+            offset = self._output_offsets.get(session_name, 0)
+            helper_args = ["read", "--session", session_name, "--offset", offset]
+            if kill_session:
+                helper_args.append("--kill")
+            window = await self._run_helper(*helper_args)
+            if not window["exists"]:
                 return self.fail_response(f"Tmux session '{session_name}' does not exist.")
-            
-            # Get output from tmux pane
-            output_result = await self._execute_raw_command(f"tmux capture-pane -t {session_name} -p -S - -E -")
-            output = output_result.get("output", "")
-            
-            # Kill session if requested
+
             if kill_session:
-                await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+                self._output_offsets.pop(session_name, None)
                 termination_status = "Session terminated."
             else:
+                if window["total_size"] is not None:
+                    self._output_offsets[session_name] = max(window["total_size"], 0)
                 termination_status = "Session still running."
             
-            return self.success_response({
-                "output": output,
+            response = {
+                "output": window["output"],
+                "total_output_bytes": window["total_size"],
+                "omitted_bytes": window["omitted_bytes"],
                 "session_name": session_name,
                 "status": termination_status
-            })
+            }
+            # Output of blocking commands that did not finish within their timeout
+            if window.get("commands"):
+                response["commands"] = window["commands"]
+            return self.success_response(response)
                 
         except Exception as e:
             return self.fail_response(f"Error checking command output: {str(e)}")
@@ -328,13 +354,12 @@ class SandboxShellTool(SandboxToolsBase):
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            # Check if session exists
-            check_result = await self._execute_raw_command(f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
-            if "not_exists" in check_result.get("output", ""):
-                return self.fail_response(f"Tmux session '{session_name}' does not exist.")
-            
+            if not SESSION_NAME_RE.fullmatch(session_name):
+                return self.fail_response(self._invalid_session_message(session_name))
+
             # Kill the session
-            await self._execute_raw_command(f"tmux kill-session -t {session_name}")
+            if not await self._kill_session(session_name):
+                return self.fail_response(f"Tmux session '{session_name}' does not exist.")
             
             return self.success_response({
                 "message": f"Tmux session '{session_name}' terminated successfully."
@@ -368,24 +393,14 @@ class SandboxShellTool(SandboxToolsBase):
             await self._ensure_sandbox()
             
             # List all tmux sessions
-            result = await self._execute_raw_command("tmux list-sessions 2>/dev/null || echo 'No sessions'")
-            output = result.get("output", "")
+            sessions = (await self._run_helper("list")).get("sessions", [])
             
-            if "No sessions" in output or not output.strip():
+            if not sessions:
                 return self.success_response({
                     "message": "No active tmux sessions found.",
                     "sessions": []
                 })
             
-            # Parse session list
-            sessions = []
-            for line in output.split('\n'):
-                if line.strip():
-                    parts = line.split(':')
-                    if parts:
-                        session_name = parts[0].strip()
-                        sessions.append(session_name)
-            
             return self.success_response({
                 "message": f"Found {len(sessions)} active sessions.",
                 "sessions": sessions
@@ -1,13 +1,22 @@
 import os
+import math
 import base64
+import asyncio
+import fnmatch
+import hashlib
+import shlex
 import mimetypes
-from typing import Optional, Tuple
-from io import BytesIO
-from PIL import Image
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 
 from agentpress.tool import ToolResult, openapi_schema, xml_schema
 from sandbox.tool_base import SandboxToolsBase
 from agentpress.thread_manager import ThreadManager
+from agent.blob_store import blob_store
+from agent.image_compression import (
+    CONTACT_SHEET_MAX_HEIGHT, CONTACT_SHEET_MAX_WIDTH, DEFAULT_MAX_HEIGHT, DEFAULT_MAX_WIDTH,
+    build_contact_sheet, compress_image, run_compression
+)
 import json
 
 # Add common image MIME types if mimetypes module is limited
@@ -21,11 +30,31 @@ mimetypes.add_type("image/gif", ".gif")
 MAX_IMAGE_SIZE = 10 * 1024 * 1024
 MAX_COMPRESSED_SIZE = 5 * 1024 * 1024
 
-# Compression settings
-DEFAULT_MAX_WIDTH = 1920
-DEFAULT_MAX_HEIGHT = 1080
-DEFAULT_JPEG_QUALITY = 85
-DEFAULT_PNG_COMPRESS_LEVEL = 6
+# Compressed results kept, keyed by (content sha256, MIME type, max width, max height)
+COMPRESSION_CACHE_SIZE = 256
+
+# Images a single see_image call may load
+MAX_IMAGES_PER_CALL = 12
+
+# Combined compressed size of the images loaded by one see_image call
+MAX_TOTAL_COMPRESSED_SIZE = 8 * 1024 * 1024
+
+# Combined image tokens of the separate images loaded by one see_image call, at the usual
+# width * height / IMAGE_TOKEN_PIXELS estimate; about four full-HD screenshots
+MAX_TOTAL_IMAGE_TOKENS = 10000
+IMAGE_TOKEN_PIXELS = 750
+
+# Combined size of the source files packed into one contact sheet
+MAX_CONTACT_SHEET_SOURCE_SIZE = 64 * 1024 * 1024
+
+GLOB_CHARACTERS = "*?["
+
+_compression_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+def estimate_image_tokens(size: Optional[Tuple[int, int]]) -> int:
+    """Image tokens a model is likely to charge for an image of this size; unknown sizes count as the largest"""
+    width, height = size or (DEFAULT_MAX_WIDTH, DEFAULT_MAX_HEIGHT)
+    return math.ceil(width * height / IMAGE_TOKEN_PIXELS)
 
 class SandboxVisionTool(SandboxToolsBase):
     """Tool for allowing the agent to 'see' images within the sandbox."""
@@ -36,81 +65,244 @@ class SandboxVisionTool(SandboxToolsBase):
         # Make thread_manager accessible within the tool instance
         self.thread_manager = thread_manager
 
-    def compress_image(self, image_bytes: bytes, mime_type: str, file_path: str) -> Tuple[bytes, str]:
-        """Compress an image to reduce its size while maintaining reasonable quality.
-        
-        Args:
-            image_bytes: Original image bytes
-            mime_type: MIME type of the image
-            file_path: Path to the image file (for logging)
-            
-        Returns:
-            Tuple of (compressed_bytes, new_mime_type)
+    async def _remote_sha256(self, full_path: str) -> Optional[str]:
+        """Hash a file inside the sandbox, so cached compressions can skip the download"""
+        try:
+            response = await self.sandbox.process.exec(f"sha256sum {shlex.quote(full_path)}", timeout=15)
+            if response.exit_code == 0 and response.result:
+                return response.result.split()[0]
+        except Exception as e:
+            print(f"[SeeImage] Could not hash '{full_path}' in the sandbox: {e}")
+        return None
+
+    def _cached_compression(self, content_hash: Optional[str], mime_type: str) -> Optional[tuple]:
+        """(blob_id, mime_type, size, dimensions) of an earlier compression of the same content, if its blob is still stored"""
+        if not content_hash:
+            return None
+        # The output format follows the input MIME type, so it is part of the key
+        key = (content_hash, mime_type, DEFAULT_MAX_WIDTH, DEFAULT_MAX_HEIGHT)
+        cached = _compression_cache.get(key)
+        if cached is None:
+            return None
+        if not blob_store.has(cached[0]):
+            del _compression_cache[key]
+            return None
+        _compression_cache.move_to_end(key)
+        return cached
+
+    async def _add_image_context(self, images: List[dict], description: Optional[str] = None) -> None:
+        """Add a temporary message carrying the stored image blobs.
+
+        A single image keeps the original flat message shape; several images
+        are listed under 'images'. Each entry keeps its blob_id and the bytes
+        inline, because the run that reads the message may be on a worker
+        without this process's blob store.
         """
+        entries = []
+        for image in images:
+            image_bytes = await blob_store.get(image["blob_id"])
+            if image_bytes is None:
+                raise ValueError(f"Compressed image for '{image['file_path']}' is no longer stored")
+            entries.append({**image, "base64": base64.b64encode(image_bytes).decode('utf-8')})
+        images = entries
+
+        if len(images) == 1 and description is None:
+            image_context_data = dict(images[0])
+        else:
+            image_context_data = {"images": images}
+            if description:
+                image_context_data["description"] = description
+
+        # Add the temporary message using the thread_manager callback
+        # Use a distinct type like 'image_context'
+        await self.thread_manager.add_message(
+            thread_id=self.thread_id,
+            type="image_context", # Use a specific type for this
+            content=image_context_data, # Store the dict directly
+            is_llm_message=False # This is context generated by a tool
+        )
+
+    async def compress_image(self, image_bytes: bytes, mime_type: str, file_path: str) -> Tuple[bytes, str, Optional[Tuple[int, int]]]:
+        """Compress an image in the compression worker pool."""
+        return await run_compression(compress_image, image_bytes, mime_type, file_path)
+
+    async def _expand_paths(self, file_path: str) -> List[str]:
+        """Resolve a comma-separated list of paths and glob patterns to workspace-relative paths.
+
+        Patterns may only use wildcards in the file name (e.g. 'charts/*.png').
+        """
+        paths = []
+        for entry in file_path.split(','):
+            entry = entry.strip()
+            if not entry:
+                continue
+            cleaned_path = self.clean_path(entry)
+            if not any(c in cleaned_path for c in GLOB_CHARACTERS):
+                paths.append(cleaned_path)
+                continue
+
+            directory, pattern = os.path.split(cleaned_path)
+            if any(c in directory for c in GLOB_CHARACTERS):
+                raise ValueError(f"Wildcards are only supported in the file name, not in directories: '{entry}'")
+            try:
+                files = await self.sandbox.fs.list_files(f"{self.workspace_path}/{directory}" if directory else self.workspace_path)
+            except Exception:
+                raise ValueError(f"Directory not found for pattern: '{entry}'")
+            matches = sorted(f.name for f in files if not f.is_dir and fnmatch.fnmatch(f.name, pattern))
+            if not matches:
+                raise ValueError(f"No files match the pattern: '{entry}'")
+            paths.extend(f"{directory}/{name}" if directory else name for name in matches)
+
+        # Keep the first occurrence of each path
+        return list(dict.fromkeys(paths))
+
+    async def _check_image(self, cleaned_path: str) -> tuple:
+        """Validate a workspace image before reading it.
+
+        Returns (full_path, file_info, mime_type); raises ValueError with a
+        message for the agent if the image cannot be used.
+        """
+        full_path = f"{self.workspace_path}/{cleaned_path}"
+
+        # Check if file exists and get info
         try:
-            # Open image from bytes
-            img = Image.open(BytesIO(image_bytes))
-            
-            # Convert RGBA to RGB if necessary (for JPEG)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # Create a white background
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Calculate new dimensions while maintaining aspect ratio
-            width, height = img.size
-            if width > DEFAULT_MAX_WIDTH or height > DEFAULT_MAX_HEIGHT:
-                ratio = min(DEFAULT_MAX_WIDTH / width, DEFAULT_MAX_HEIGHT / height)
-                new_width = int(width * ratio)
-                new_height = int(height * ratio)
-                img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                print(f"[SeeImage] Resized image from {width}x{height} to {new_width}x{new_height}")
-            
-            # Save to bytes with compression
-            output = BytesIO()
-            
-            # Determine output format based on original mime type
-            if mime_type == 'image/gif':
-                # Keep GIFs as GIFs to preserve animation
-                img.save(output, format='GIF', optimize=True)
-                output_mime = 'image/gif'
-            elif mime_type == 'image/png':
-                # Compress PNG
-                img.save(output, format='PNG', optimize=True, compress_level=DEFAULT_PNG_COMPRESS_LEVEL)
-                output_mime = 'image/png'
+            file_info = await self.sandbox.fs.get_file_info(full_path)
+        except Exception as e:
+            raise ValueError(f"Image file not found at path: '{cleaned_path}'")
+        if file_info.is_dir:
+            raise ValueError(f"Path '{cleaned_path}' is a directory, not an image file.")
+
+        # Check file size
+        if file_info.size > MAX_IMAGE_SIZE:
+            raise ValueError(f"Image file '{cleaned_path}' is too large ({file_info.size / (1024*1024):.2f}MB). Maximum size is {MAX_IMAGE_SIZE / (1024*1024)}MB.")
+
+        # Determine MIME type
+        mime_type, _ = mimetypes.guess_type(full_path)
+        if not mime_type or not mime_type.startswith('image/'):
+            # Basic fallback based on extension if mimetypes fails
+            ext = os.path.splitext(cleaned_path)[1].lower()
+            if ext == '.jpg' or ext == '.jpeg': mime_type = 'image/jpeg'
+            elif ext == '.png': mime_type = 'image/png'
+            elif ext == '.gif': mime_type = 'image/gif'
+            elif ext == '.webp': mime_type = 'image/webp'
             else:
-                # Convert everything else to JPEG for better compression
-                img.save(output, format='JPEG', quality=DEFAULT_JPEG_QUALITY, optimize=True)
-                output_mime = 'image/jpeg'
-            
-            compressed_bytes = output.getvalue()
-            
-            # Log compression results
-            original_size = len(image_bytes)
+                raise ValueError(f"Unsupported or unknown image format for file: '{cleaned_path}'. Supported: JPG, PNG, GIF, WEBP.")
+
+        return full_path, file_info, mime_type
+
+    async def _load_image(self, cleaned_path: str) -> dict:
+        """Compress one workspace image into the blob store.
+
+        Returns the image_context entry for it; raises ValueError with a message
+        for the agent if the image cannot be used.
+        """
+        full_path, file_info, mime_type = await self._check_image(cleaned_path)
+
+        # A cached compression of the same content skips the download entirely
+        content_hash = await self._remote_sha256(full_path)
+        cached = self._cached_compression(content_hash, mime_type)
+
+        if not cached:
+            # Read image file content
+            try:
+                image_bytes = await self.sandbox.fs.download_file(full_path)
+            except Exception as e:
+                raise ValueError(f"Could not read image file: {cleaned_path}")
+
+            if content_hash is None:
+                content_hash = hashlib.sha256(image_bytes).hexdigest()
+                cached = self._cached_compression(content_hash, mime_type)
+
+        if cached:
+            blob_id, compressed_mime_type, compressed_size, dimensions = cached
+        else:
+            # Compress the image
+            compressed_bytes, compressed_mime_type, dimensions = await self.compress_image(image_bytes, mime_type, cleaned_path)
             compressed_size = len(compressed_bytes)
-            compression_ratio = (1 - compressed_size / original_size) * 100
-            print(f"[SeeImage] Compressed '{file_path}' from {original_size / 1024:.1f}KB to {compressed_size / 1024:.1f}KB ({compression_ratio:.1f}% reduction)")
-            
-            return compressed_bytes, output_mime
-            
+
+            # Check if compressed image is still too large
+            if compressed_size > MAX_COMPRESSED_SIZE:
+                raise ValueError(f"Image file '{cleaned_path}' is still too large after compression ({compressed_size / (1024*1024):.2f}MB). Maximum compressed size is {MAX_COMPRESSED_SIZE / (1024*1024)}MB.")
+
+            # Keep the bytes in the blob store; the message only references them
+            blob_id = await blob_store.put(compressed_bytes)
+            _compression_cache[(content_hash, mime_type, DEFAULT_MAX_WIDTH, DEFAULT_MAX_HEIGHT)] = (blob_id, compressed_mime_type, compressed_size, dimensions)
+            while len(_compression_cache) > COMPRESSION_CACHE_SIZE:
+                _compression_cache.popitem(last=False)
+
+        return {
+            "mime_type": compressed_mime_type,
+            "blob_id": blob_id,
+            "file_path": cleaned_path, # Include path for context
+            "original_size": file_info.size,
+            "compressed_size": compressed_size,
+            "image_tokens": estimate_image_tokens(dimensions)
+        }
+
+    async def _download_image(self, cleaned_path: str) -> bytes:
+        """Raw bytes of a checked workspace image, for the contact sheet."""
+        try:
+            return await self.sandbox.fs.download_file(f"{self.workspace_path}/{cleaned_path}")
         except Exception as e:
-            print(f"[SeeImage] Failed to compress image: {str(e)}. Using original.")
-            return image_bytes, mime_type
+            raise ValueError(f"Could not read image file: {cleaned_path}")
+
+    async def _build_contact_sheet(self, paths: List[str], problems: List[str]) -> Optional[dict]:
+        """Pack workspace images into one contact sheet blob and return its image_context entry.
+
+        The downloaded files go straight into the sheet; only the sheet itself is
+        stored. Images that cannot be used are reported in problems.
+        """
+        checks = await asyncio.gather(*(self._check_image(path) for path in paths), return_exceptions=True)
+        selected, total_size = [], 0
+        for path, check in zip(paths, checks):
+            if isinstance(check, Exception):
+                problems.append(str(check) if isinstance(check, ValueError) else f"Could not load '{path}': {str(check)}")
+                continue
+            size = check[1].size
+            if total_size + size > MAX_CONTACT_SHEET_SOURCE_SIZE:
+                problems.append(f"Skipped '{path}': the files in one contact sheet are limited to {MAX_CONTACT_SHEET_SOURCE_SIZE / (1024*1024):.0f}MB in total.")
+                continue
+            selected.append(path)
+            total_size += size
+
+        downloads = await asyncio.gather(*(self._download_image(path) for path in selected), return_exceptions=True)
+        sources = []
+        for path, download in zip(selected, downloads):
+            if isinstance(download, Exception):
+                problems.append(str(download) if isinstance(download, ValueError) else f"Could not load '{path}': {str(download)}")
+            else:
+                sources.append((download, path))
+        if not sources:
+            return None
+
+        # The sheet's canvas bounds its tokens; its encoding is kept within the per-call byte budget
+        sheet_bytes = await run_compression(build_contact_sheet, sources, CONTACT_SHEET_MAX_WIDTH, CONTACT_SHEET_MAX_HEIGHT,
+                                            min(MAX_COMPRESSED_SIZE, MAX_TOTAL_COMPRESSED_SIZE))
+        return {
+            "mime_type": "image/jpeg",
+            "blob_id": await blob_store.put(sheet_bytes),
+            "file_path": ", ".join(label for _, label in sources),
+            "image_count": len(sources),
+            "original_size": sum(len(image_bytes) for image_bytes, _ in sources),
+            "compressed_size": len(sheet_bytes)
+        }
 
     @openapi_schema({
         "type": "function",
         "function": {
             "name": "see_image",
-            "description": "Allows the agent to 'see' an image file located in the /workspace directory. Provide the relative path to the image. The image will be compressed before sending to reduce token usage. The image content will be made available in the next turn's context.",
+            "description": "Allows the agent to 'see' one or more image files located in the /workspace directory. Provide the relative path to an image, a comma-separated list of paths, or a glob pattern such as 'charts/*.png'. Images are compressed before sending to reduce token usage. Set contact_sheet to true to pack several images into one labelled grid image, which costs far fewer tokens than sending them separately. The image content will be made available in the next turn's context.",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "file_path": {
                         "type": "string",
-                        "description": "The relative path to the image file within the /workspace directory (e.g., 'screenshots/image.png'). Supported formats: JPG, PNG, GIF, WEBP. Max size: 10MB."
+                        "description": f"The relative path to the image file within the /workspace directory (e.g., 'screenshots/image.png'), a comma-separated list of paths, or a glob pattern with wildcards in the file name (e.g., 'output/*.png'). At most {MAX_IMAGES_PER_CALL} images per call; images sent separately share a budget of about {MAX_TOTAL_IMAGE_TOKENS} image tokens, and ones beyond it are skipped. Supported formats: JPG, PNG, GIF, WEBP. Max size: 10MB each."
+                    },
+                    "contact_sheet": {
+                        "type": "boolean",
+                        "description": "Pack all requested images into a single labelled contact sheet. Use it to compare or skim many charts at once; request individual images when fine detail matters.",
+                        "default": False
                     }
                 },
                 "required": ["file_path"]
@@ -120,83 +312,83 @@ class SandboxVisionTool(SandboxToolsBase):
     @xml_schema(
         tag_name="see-image",
         mappings=[
-            {"param_name": "file_path", "node_type": "attribute", "path": "."}
+            {"param_name": "file_path", "node_type": "attribute", "path": "."},
+            {"param_name": "contact_sheet", "node_type": "attribute", "path": ".", "required": False}
         ],
         example='''
         <!-- Example: Request to see an image named 'diagram.png' inside the 'docs' folder -->
         <see-image file_path="docs/diagram.png"></see-image>
+
+        <!-- Example: Skim every chart in 'output' as one contact sheet -->
+        <see-image file_path="output/*.png" contact_sheet="true"></see-image>
         '''
     )
-    async def see_image(self, file_path: str) -> ToolResult:
-        """Reads an image file, compresses it, converts it to base64, and adds it as a temporary message."""
+    async def see_image(self, file_path: str, contact_sheet: bool = False) -> ToolResult:
+        """Reads image files, compresses them, stores them as blobs, and adds a temporary message referencing them."""
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
 
-            # Clean and construct full path
-            cleaned_path = self.clean_path(file_path)
-            full_path = f"{self.workspace_path}/{cleaned_path}"
+            if isinstance(contact_sheet, str):
+                contact_sheet = contact_sheet.strip().lower() == "true"
 
-            # Check if file exists and get info
             try:
-                file_info = self.sandbox.fs.get_file_info(full_path)
-                if file_info.is_dir:
-                    return self.fail_response(f"Path '{cleaned_path}' is a directory, not an image file.")
-            except Exception as e:
-                return self.fail_response(f"Image file not found at path: '{cleaned_path}'")
+                paths = await self._expand_paths(file_path)
+            except ValueError as e:
+                return self.fail_response(str(e))
+            if not paths:
+                return self.fail_response("No image path provided.")
+            if len(paths) > MAX_IMAGES_PER_CALL:
+                return self.fail_response(f"{len(paths)} images requested; at most {MAX_IMAGES_PER_CALL} can be loaded per call. Narrow the pattern or split the request.")
 
-            # Check file size
-            if file_info.size > MAX_IMAGE_SIZE:
-                return self.fail_response(f"Image file '{cleaned_path}' is too large ({file_info.size / (1024*1024):.2f}MB). Maximum size is {MAX_IMAGE_SIZE / (1024*1024)}MB.")
+            # A single image keeps the original behaviour and error messages
+            if len(paths) == 1 and not contact_sheet:
+                try:
+                    image = await self._load_image(paths[0])
+                except ValueError as e:
+                    return self.fail_response(str(e))
+                await self._add_image_context([image])
 
-            # Read image file content
-            try:
-                image_bytes = self.sandbox.fs.download_file(full_path)
-            except Exception as e:
-                return self.fail_response(f"Could not read image file: {cleaned_path}")
-
-            # Determine MIME type
-            mime_type, _ = mimetypes.guess_type(full_path)
-            if not mime_type or not mime_type.startswith('image/'):
-                # Basic fallback based on extension if mimetypes fails
-                ext = os.path.splitext(cleaned_path)[1].lower()
-                if ext == '.jpg' or ext == '.jpeg': mime_type = 'image/jpeg'
-                elif ext == '.png': mime_type = 'image/png'
-                elif ext == '.gif': mime_type = 'image/gif'
-                elif ext == '.webp': mime_type = 'image/webp'
-                else:
-                    return self.fail_response(f"Unsupported or unknown image format for file: '{cleaned_path}'. Supported: JPG, PNG, GIF, WEBP.")
+                # Inform the agent the image will be available next turn
+                return self.success_response(f"Successfully loaded and compressed the image '{image['file_path']}' (reduced from {image['original_size'] / 1024:.1f}KB to {image['compressed_size'] / 1024:.1f}KB).")
 
-            # Compress the image
-            compressed_bytes, compressed_mime_type = self.compress_image(image_bytes, mime_type, cleaned_path)
-            
-            # Check if compressed image is still too large
-            if len(compressed_bytes) > MAX_COMPRESSED_SIZE:
-                return self.fail_response(f"Image file '{cleaned_path}' is still too large after compression ({len(compressed_bytes) / (1024*1024):.2f}MB). Maximum compressed size is {MAX_COMPRESSED_SIZE / (1024*1024)}MB.")
-
-            # Convert to base64
-            base64_image = base64.b64encode(compressed_bytes).decode('utf-8')
-
-            # Prepare the temporary message content
-            image_context_data = {
-                "mime_type": compressed_mime_type,
-                "base64": base64_image,
-                "file_path": cleaned_path, # Include path for context
-                "original_size": file_info.size,
-                "compressed_size": len(compressed_bytes)
-            }
+            problems = []
+            if contact_sheet:
+                sheet = await self._build_contact_sheet(paths, problems)
+                if sheet is None:
+                    return self.fail_response("Could not load any of the requested images:\n" + "\n".join(problems))
+                await self._add_image_context([sheet], description=f"Here is a contact sheet of the {sheet['image_count']} images you requested, numbered in this order: {sheet['file_path']}")
+                message = f"Packed {sheet['image_count']} images into one contact sheet ({sheet['compressed_size'] / 1024:.1f}KB)."
+            else:
+                # Downloads run concurrently; compression is spread over the worker pool
+                results = await asyncio.gather(*(self._load_image(path) for path in paths), return_exceptions=True)
+
+                # Separate images are kept within the combined byte and token budgets, in request order
+                images, total_size, total_tokens = [], 0, 0
+                for path, result in zip(paths, results):
+                    if isinstance(result, ValueError):
+                        problems.append(str(result))
+                    elif isinstance(result, Exception):
+                        problems.append(f"Could not load '{path}': {str(result)}")
+                    elif total_size + result["compressed_size"] > MAX_TOTAL_COMPRESSED_SIZE:
+                        problems.append(f"Skipped '{path}': the images in one call are limited to {MAX_TOTAL_COMPRESSED_SIZE / (1024*1024):.0f}MB in total.")
+                    elif total_tokens + result["image_tokens"] > MAX_TOTAL_IMAGE_TOKENS:
+                        problems.append(f"Skipped '{path}': the images in one call are limited to about {MAX_TOTAL_IMAGE_TOKENS} image tokens; use contact_sheet to see more at once.")
+                    else:
+                        images.append(result)
+                        total_size += result["compressed_size"]
+                        total_tokens += result["image_tokens"]
+
+                if not images:
+                    return self.fail_response("Could not load any of the requested images:\n" + "\n".join(problems))
 
-            # Add the temporary message using the thread_manager callback
-            # Use a distinct type like 'image_context'
-            await self.thread_manager.add_message(
-                thread_id=self.thread_id,
-                type="image_context", # Use a specific type for this
-                content=image_context_data, # Store the dict directly
-                is_llm_message=False # This is context generated by a tool
-            )
+                await self._add_image_context(images)
+                loaded = ", ".join(f"'{image['file_path']}' ({image['compressed_size'] / 1024:.1f}KB)" for image in images)
+                message = f"Successfully loaded and compressed {len(images)} images: {loaded}."
 
-            # Inform the agent the image will be available next turn
-            return self.success_response(f"Successfully loaded and compressed the image '{cleaned_path}' (reduced from {file_info.size / 1024:.1f}KB to {len(compressed_bytes) / 1024:.1f}KB).")
+            if problems:
+                message += "\nNot loaded:\n" + "\n".join(problems)
+            return self.success_response(message)
 
         except Exception as e:
-            return self.fail_response(f"An unexpected error occurred while trying to see the image: {str(e)}") 
\ No newline at end of file
+            return self.fail_response(f"An unexpected error occurred while trying to see the image: {str(e)}")
@@ -0,0 +1,173 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from daytona_sdk import Sandbox, SessionExecuteRequest
+from utils.logger import logger
+
+# Threads shared by every blocking Daytona SDK call in this process
+SANDBOX_EXECUTOR_WORKERS = 32
+
+# Maximum number of SDK calls in flight against a single sandbox
+SANDBOX_MAX_CONCURRENCY = 8
+
+# Default seconds to wait for a single SDK call
+SANDBOX_CALL_TIMEOUT = 60
+
+# Extra seconds allowed on top of a command's own timeout for the HTTP round trip
+SANDBOX_EXEC_GRACE = 15
+
+# SDK calls that only read state, so repeating them on a sandbox that was started again is safe.
+# Commands and writes are never repeated: a failure does not prove they did not run.
+SANDBOX_RETRYABLE_CALLS = (
+    "fs.download_file",
+    "fs.list_files",
+    "fs.get_file_info",
+    "process.get_session_command_logs",
+    "get_preview_link",
+)
+
+_executor = ThreadPoolExecutor(max_workers=SANDBOX_EXECUTOR_WORKERS, thread_name_prefix="sandbox-io")
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+async def run_blocking(func: Callable, *args, call_timeout: Optional[float] = SANDBOX_CALL_TIMEOUT, sandbox_id: Optional[str] = None, **kwargs) -> Any:
+    """Run a synchronous SDK call on the sandbox executor without blocking the event loop.
+
+    Other keyword arguments (including an SDK-level `timeout`) are passed to func.
+
+    When sandbox_id is given the call also counts against that sandbox's
+    concurrency limit. The slot is held until the worker thread actually
+    finishes, so a timed-out call still occupies it. Cancelling before the call
+    starts removes it from the queue; a call already running in a thread cannot
+    be interrupted and its result is discarded.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = None
+    if sandbox_id:
+        semaphore = _semaphores.get(sandbox_id)
+        if semaphore is None:
+            semaphore = _semaphores[sandbox_id] = asyncio.Semaphore(SANDBOX_MAX_CONCURRENCY)
+        await semaphore.acquire()
+
+    try:
+        future = _executor.submit(functools.partial(func, *args, **kwargs))
+    except Exception:
+        if semaphore:
+            semaphore.release()
+        raise
+    if semaphore:
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(semaphore.release))
+
+    name = getattr(func, '__name__', repr(func))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), call_timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Sandbox call {name} timed out after {call_timeout}s")
+        raise TimeoutError(f"Sandbox call {name} timed out after {call_timeout}s")
+
+
+class AsyncFileSystem:
+    """Async counterpart of sandbox.fs."""
+
+    def __init__(self, owner: 'AsyncSandbox'):
+        self._owner = owner
+
+    async def upload_file(self, path: str, content: bytes, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> None:
+        return await self._owner.call("fs.upload_file", path, content, call_timeout=timeout)
+
+    async def download_file(self, path: str, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> bytes:
+        return await self._owner.call("fs.download_file", path, call_timeout=timeout)
+
+    async def list_files(self, path: str, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> List[Any]:
+        return await self._owner.call("fs.list_files", path, call_timeout=timeout)
+
+    async def get_file_info(self, path: str, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> Any:
+        return await self._owner.call("fs.get_file_info", path, call_timeout=timeout)
+
+    async def create_folder(self, path: str, mode: str, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> None:
+        return await self._owner.call("fs.create_folder", path, mode, call_timeout=timeout)
+
+    async def delete_file(self, path: str, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> None:
+        return await self._owner.call("fs.delete_file", path, call_timeout=timeout)
+
+    async def set_file_permissions(self, path: str, mode: str, timeout: Optional[float] = SANDBOX_CALL_TIMEOUT) -> None:
+        return await self._owner.call("fs.set_file_permissions", path, mode, call_timeout=timeout)
+
+
+class AsyncProcess:
+    """Async counterpart of sandbox.process."""
+
+    def __init__(self, owner: 'AsyncSandbox'):
+        self._owner = owner
+
+    async def exec(self, command: str, cwd: Optional[str] = None, timeout: Optional[int] = None) -> Any:
+        """Execute a command; the call is abandoned shortly after the command's own timeout."""
+        call_timeout = (timeout + SANDBOX_EXEC_GRACE) if timeout else SANDBOX_CALL_TIMEOUT
+        return await self._owner.call("process.exec", command, cwd=cwd, timeout=timeout, call_timeout=call_timeout)
+
+    async def create_session(self, session_id: str) -> None:
+        return await self._owner.call("process.create_session", session_id)
+
+    async def delete_session(self, session_id: str) -> None:
+        return await self._owner.call("process.delete_session", session_id)
+
+    async def execute_session_command(self, session_id: str, req: SessionExecuteRequest, timeout: Optional[int] = None) -> Any:
+        call_timeout = (timeout + SANDBOX_EXEC_GRACE) if timeout else SANDBOX_CALL_TIMEOUT
+        return await self._owner.call("process.execute_session_command", session_id, req, timeout=timeout, call_timeout=call_timeout)
+
+    async def get_session_command_logs(self, session_id: str, command_id: str) -> Any:
+        return await self._owner.call("process.get_session_command_logs", session_id, command_id)
+
+
+class AsyncSandbox:
+    """Async facade over a Daytona Sandbox.
+
+    Every fs/process call runs on the shared sandbox executor, bounded per
+    sandbox and by a timeout, so tools and API handlers never block the event loop.
+
+    With a recover callback, a failed call asks it whether the sandbox is no
+    longer running. If so the callback returns a fresh sandbox (starting it
+    again); read-only calls are then retried once and other calls fail
+    without being repeated. The callback returns None while the sandbox is
+    running, and the original error is raised.
+    """
+
+    def __init__(self, sandbox: Sandbox, recover: Optional[Callable[[Sandbox], Awaitable[Optional[Sandbox]]]] = None):
+        self.sandbox = sandbox
+        self.id = sandbox.id
+        self._recover = recover
+        self.fs = AsyncFileSystem(self)
+        self.process = AsyncProcess(self)
+
+    async def run(self, func: Callable, *args, call_timeout: Optional[float] = SANDBOX_CALL_TIMEOUT, **kwargs) -> Any:
+        """Run an arbitrary blocking call against this sandbox; other keyword arguments go to func."""
+        return await run_blocking(func, *args, call_timeout=call_timeout, sandbox_id=self.id, **kwargs)
+
+    def _method(self, name: str) -> Callable:
+        target = self.sandbox
+        for part in name.split('.'):
+            target = getattr(target, part)
+        return target
+
+    async def call(self, name: str, *args, call_timeout: Optional[float] = SANDBOX_CALL_TIMEOUT, **kwargs) -> Any:
+        """Run an SDK method given by attribute path (e.g. "fs.upload_file"), recovering a sandbox that stopped."""
+        try:
+            return await self.run(self._method(name), *args, call_timeout=call_timeout, **kwargs)
+        except Exception as e:
+            if self._recover is None:
+                raise
+            recovered = await self._recover(self.sandbox)
+            if recovered is None:
+                # The sandbox is running, so the error belongs to the call itself
+                raise
+            self.sandbox = recovered
+            if name not in SANDBOX_RETRYABLE_CALLS:
+                raise RuntimeError(f"Sandbox {self.id} was not running during {name}; it has been started again "
+                                   f"but the call was not repeated: {e}") from e
+            logger.warning(f"Sandbox {self.id} was not running during {name} ({e}), retrying on the restarted sandbox")
+        return await self.run(self._method(name), *args, call_timeout=call_timeout, **kwargs)
+
+    async def get_preview_link(self, port: int) -> Any:
+        return await self.call("get_preview_link", port)
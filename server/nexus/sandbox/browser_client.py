@@ -0,0 +1,153 @@
+import json
+import shlex
+from urllib.parse import urlencode
+from typing import Any, Dict, Optional
+
+import httpx
+
+from sandbox.async_sandbox import AsyncSandbox
+from utils.logger import logger
+
+# Port of the browser automation API (sandbox/docker/browser_api.py) inside the sandbox
+BROWSER_API_PORT = 8003
+
+# Header carrying the shared secret the browser API checks (NEXUS_BROWSER_API_TOKEN in the sandbox)
+BROWSER_API_TOKEN_HEADER = "X-Nexus-Browser-Token"
+
+# Header Daytona expects on preview links of private sandboxes
+PREVIEW_TOKEN_HEADER = "x-daytona-preview-token"
+
+BROWSER_API_TIMEOUT = 60
+
+# Requests safe to send again over exec when the preview link fails mid-request
+IDEMPOTENT_METHODS = ("GET", "HEAD")
+
+# Preview proxy statuses meaning it could not connect to the service, so the request never reached it
+UNREACHABLE_STATUSES = (502, 503)
+
+# Preview proxy statuses after which only idempotent requests are sent again (504: the service may still be running it)
+GATEWAY_STATUSES = (502, 503, 504)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Process-wide keep-alive client shared by every sandbox's browser API."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(BROWSER_API_TIMEOUT, connect=10),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+        )
+    return _http_client
+
+
+def error_message(endpoint: str, status_code: int, body: str) -> str:
+    """Failure message for an error response, using the service's detail when it sent one."""
+    try:
+        detail = json.loads(body).get("detail", body)
+    except (ValueError, AttributeError):
+        detail = body
+    return f"Browser API {endpoint} failed with status {status_code}: {detail}"
+
+
+class BrowserApiClient:
+    """Client for the browser automation API running inside a sandbox.
+
+    Requests go over pooled HTTP connections to the API's preview link. With
+    screenshot_mode="ref" the service keeps the screenshot and returns an id,
+    which fetch_screenshot() downloads as binary. If the preview link cannot be
+    reached, requests fall back to curl through process.exec with the screenshot
+    inline. Actions are only sent again over exec when they cannot have reached
+    the service. Error responses raise RuntimeError with the service's detail.
+    """
+
+    def __init__(self, sandbox: AsyncSandbox, api_token: Optional[str] = None):
+        self.sandbox = sandbox
+        self.api_token = api_token
+        self._base_url: Optional[str] = None
+        self._headers: Dict[str, str] = {}
+
+    async def _resolve(self) -> None:
+        if self._base_url is not None:
+            return
+        preview_link = await self.sandbox.get_preview_link(BROWSER_API_PORT)
+        url = preview_link.url if hasattr(preview_link, 'url') else str(preview_link).split("url='")[1].split("'")[0]
+        self._base_url = f"{url.rstrip('/')}/api/automation"
+        if self.api_token:
+            self._headers[BROWSER_API_TOKEN_HEADER] = self.api_token
+        if getattr(preview_link, 'token', None):
+            self._headers[PREVIEW_TOKEN_HEADER] = preview_link.token
+
+    async def request(self, endpoint: str, params: Optional[Dict[str, Any]] = None, method: str = "POST",
+                      options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Call an automation endpoint and return its decoded JSON result.
+
+        Args:
+            endpoint: Endpoint under /api/automation
+            params: JSON body for POST, query parameters for GET
+            method: HTTP method
+            options: Per-request options sent as query parameters (e.g. screenshot_mode)
+        """
+        try:
+            await self._resolve()
+            query = dict(options or {})
+            if method == "GET" and params:
+                query.update(params)
+            response = await get_http_client().request(
+                method,
+                f"{self._base_url}/{endpoint}",
+                params=query,
+                json=params if method != "GET" else None,
+                headers=self._headers
+            )
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # No connection was made, so the service never saw the request
+            logger.warning(f"Browser API preview link unreachable, falling back to exec: {e}")
+            return await self._request_via_exec(endpoint, params, method, options)
+        except httpx.TransportError as e:
+            if method in IDEMPOTENT_METHODS:
+                logger.warning(f"Browser API request failed, retrying over exec: {e}")
+                return await self._request_via_exec(endpoint, params, method, options)
+            # The service may already have run the action; sending it again could repeat it
+            raise RuntimeError(f"Browser API did not answer {endpoint}; the action may or may not have run: {e!r}")
+
+        if response.status_code in UNREACHABLE_STATUSES or (
+                method in IDEMPOTENT_METHODS and response.status_code in GATEWAY_STATUSES):
+            # The preview proxy could not reach the service; the service may still answer locally
+            logger.warning(f"Browser API preview link returned {response.status_code}, falling back to exec")
+            return await self._request_via_exec(endpoint, params, method, options)
+        if not response.is_success:
+            raise RuntimeError(error_message(endpoint, response.status_code, response.text))
+        return response.json()
+
+    async def fetch_screenshot(self, screenshot_id: str) -> bytes:
+        """Download a screenshot the service kept by reference."""
+        await self._resolve()
+        response = await get_http_client().get(f"{self._base_url}/screenshot/{screenshot_id}", headers=self._headers)
+        response.raise_for_status()
+        return response.content
+
+    async def _request_via_exec(self, endpoint: str, params: Optional[Dict[str, Any]], method: str,
+                                options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # The screenshot can only come back inline over exec
+        query = {**(options or {}), "screenshot_mode": "inline"}
+        url = f"http://localhost:{BROWSER_API_PORT}/api/automation/{endpoint}?{urlencode(query)}"
+        # The status code is written on a line of its own after the body
+        curl_cmd = f"curl -s -w '\\n%{{http_code}}' -X {method} -H 'Content-Type: application/json'"
+        if self.api_token:
+            curl_cmd += f" -H {shlex.quote(f'{BROWSER_API_TOKEN_HEADER}: {self.api_token}')}"
+        if method == "GET" and params:
+            curl_cmd += " -G" + "".join(f" --data-urlencode {shlex.quote(f'{k}={v}')}" for k, v in params.items())
+        elif params:
+            curl_cmd += f" -d {shlex.quote(json.dumps(params))}"
+        curl_cmd += f" {shlex.quote(url)}"
+
+        response = await self.sandbox.process.exec(curl_cmd, timeout=30)
+        if response.exit_code != 0:
+            raise RuntimeError(f"Browser automation request failed: {response}")
+        body, _, status = response.result.rpartition("\n")
+        status_code = int(status) if status.strip().isdigit() else 0
+        if not 200 <= status_code < 300:
+            raise RuntimeError(error_message(endpoint, status_code, body))
+        return json.loads(body)
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Body
-from playwright.async_api import async_playwright, Browser, Page
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Depends, Header, Query, Response
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import asyncio
@@ -10,11 +10,441 @@ from dataclasses import dataclass, field
 from datetime import datetime
 import os
 import random
-from functools import cached_property
 import traceback
+import re
+import weakref
 import pytesseract
 from PIL import Image
 import io
+import hashlib
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+#######################################################
+# Request options and authentication
+#######################################################
+
+# When set, every automation request must carry this value in the X-Nexus-Browser-Token header
+BROWSER_API_TOKEN = os.getenv("NEXUS_BROWSER_API_TOKEN")
+
+# Number of recent screenshots kept for retrieval by id
+SCREENSHOT_CACHE_SIZE = 32
+
+# Number of OCR results kept, keyed by screenshot content hash
+OCR_CACHE_SIZE = 64
+
+# How much page state an action returns: "none" (url and title only), "dom" (elements,
+# no screenshot), "screenshot" (screenshot, no element scan) or "full" (everything)
+DETAIL_LEVELS = ("none", "dom", "screenshot", "full")
+
+# "full" returns every element; "diff" returns only what changed since the page's
+# previous element scan, falling back to full on navigation or large changes
+DOM_MODES = ("full", "diff")
+
+# A diff touching more than this share of the page's elements is sent as a full dump
+DOM_DIFF_MAX_RATIO = 0.5
+
+# How interactive elements are found: "js" runs getComputedStyle/getBoundingClientRect
+# per candidate in the page, "cdp" reads layout, styles and bounds for the whole page
+# from one DOMSnapshot.captureSnapshot call
+DOM_EXTRACTORS = ("js", "cdp")
+
+# Extractor used when a request does not pick one
+DEFAULT_DOM_EXTRACTOR = os.getenv("NEXUS_DOM_EXTRACTOR", "js")
+
+# Screenshot encodings and their MIME types; Playwright captures jpeg and png, webp is re-encoded with PIL
+SCREENSHOT_FORMATS = {"jpeg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+# Browser context used by requests that do not name one; created at startup
+DEFAULT_CONTEXT_ID = "default"
+
+# Upper bound on open browser contexts, each with its own pages and cookies
+MAX_BROWSER_CONTEXTS = int(os.getenv("NEXUS_MAX_BROWSER_CONTEXTS", "4"))
+
+# Viewport of pages created by the service
+BROWSER_VIEWPORT = {'width': 1024, 'height': 768}
+
+class ActionOptions(BaseModel):
+    """Per-request options, sent as query parameters on any automation endpoint"""
+    # "inline" returns screenshot_base64 in the result, "ref" returns a screenshot_id
+    # to fetch from /automation/screenshot/{screenshot_id} as binary
+    screenshot_mode: str = "inline"
+    # Run OCR on the screenshot and return ocr_text
+    ocr: bool = False
+    # One of DETAIL_LEVELS
+    detail: str = "full"
+    # One of DOM_MODES
+    dom_mode: str = "full"
+    # One of DOM_EXTRACTORS, DEFAULT_DOM_EXTRACTOR when not set
+    extractor: Optional[str] = None
+    # Browser context the action runs in
+    context_id: str = DEFAULT_CONTEXT_ID
+    # Screenshot encoding: one of SCREENSHOT_FORMATS, quality for jpeg/webp
+    screenshot_format: str = "jpeg"
+    screenshot_quality: int = 60
+    screenshot_grayscale: bool = False
+    # Downscale so neither side exceeds this many pixels
+    screenshot_max_dim: Optional[int] = None
+    # Crop to a viewport region "x,y,width,height", or to the element with this index
+    screenshot_clip: Optional[str] = None
+    screenshot_element: Optional[int] = None
+
+_action_options: ContextVar[ActionOptions] = ContextVar("action_options", default=ActionOptions())
+
+def current_options() -> ActionOptions:
+    """Options of the request currently being handled"""
+    return _action_options.get()
+
+async def set_action_options(screenshot_mode: str = Query("inline"), ocr: bool = Query(False),
+                             detail: str = Query("full"), dom_mode: str = Query("full"),
+                             extractor: Optional[str] = Query(None), context_id: str = Query(DEFAULT_CONTEXT_ID),
+                             screenshot_format: str = Query("jpeg"), screenshot_quality: int = Query(60, ge=1, le=100),
+                             screenshot_grayscale: bool = Query(False), screenshot_max_dim: Optional[int] = Query(None, ge=16),
+                             screenshot_clip: Optional[str] = Query(None), screenshot_element: Optional[int] = Query(None)):
+    if detail not in DETAIL_LEVELS:
+        raise HTTPException(status_code=422, detail=f"detail must be one of {', '.join(DETAIL_LEVELS)}")
+    if dom_mode not in DOM_MODES:
+        raise HTTPException(status_code=422, detail=f"dom_mode must be one of {', '.join(DOM_MODES)}")
+    if extractor is not None and extractor not in DOM_EXTRACTORS:
+        raise HTTPException(status_code=422, detail=f"extractor must be one of {', '.join(DOM_EXTRACTORS)}")
+    if screenshot_format not in SCREENSHOT_FORMATS:
+        raise HTTPException(status_code=422, detail=f"screenshot_format must be one of {', '.join(SCREENSHOT_FORMATS)}")
+    if screenshot_clip is not None and parse_clip(screenshot_clip) is None:
+        raise HTTPException(status_code=422, detail="screenshot_clip must be x,y,width,height")
+    _action_options.set(ActionOptions(screenshot_mode=screenshot_mode, ocr=ocr, detail=detail,
+                                      dom_mode=dom_mode, extractor=extractor, context_id=context_id,
+                                      screenshot_format=screenshot_format, screenshot_quality=screenshot_quality,
+                                      screenshot_grayscale=screenshot_grayscale, screenshot_max_dim=screenshot_max_dim,
+                                      screenshot_clip=screenshot_clip, screenshot_element=screenshot_element))
+
+def parse_clip(clip: str) -> Optional[Dict[str, float]]:
+    """Parse "x,y,width,height" into a Playwright clip, None if malformed"""
+    try:
+        x, y, width, height = (float(part) for part in clip.split(","))
+    except ValueError:
+        return None
+    if width <= 0 or height <= 0:
+        return None
+    return {"x": x, "y": y, "width": width, "height": height}
+
+async def verify_token(x_nexus_browser_token: Optional[str] = Header(None)):
+    if BROWSER_API_TOKEN and x_nexus_browser_token != BROWSER_API_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid browser API token")
+
+#######################################################
+# OCR
+#######################################################
+
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """Single worker process for OCR so tesseract never runs on the event loop"""
+    global _ocr_pool
+    if _ocr_pool is None:
+        _ocr_pool = ProcessPoolExecutor(max_workers=1)
+    return _ocr_pool
+
+def ocr_image_bytes(image_bytes: bytes) -> str:
+    """Run tesseract on an encoded image (executed in the OCR worker process)"""
+    image = Image.open(io.BytesIO(image_bytes))
+    return pytesseract.image_to_string(image).strip()
+
+#######################################################
+# Screenshot encoding
+#######################################################
+
+def encode_screenshot(image_bytes: bytes, image_format: str, quality: int, grayscale: bool,
+                      max_dim: Optional[int]) -> bytes:
+    """Re-encode a PNG capture: optional grayscale and downscale, then jpeg/png/webp"""
+    image = Image.open(io.BytesIO(image_bytes))
+    image = image.convert("L") if grayscale else image.convert("RGB")
+    if max_dim and max(image.size) > max_dim:
+        image.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    
+    output = io.BytesIO()
+    if image_format == "png":
+        image.save(output, format="PNG", optimize=True)
+    elif image_format == "webp":
+        image.save(output, format="WEBP", quality=quality, method=4)
+    else:
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+#######################################################
+# CDP element extraction
+#######################################################
+
+# Elements matched by the interactive-element selector, as tag names and roles
+INTERACTIVE_TAGS = {"a", "button", "input", "select", "textarea"}
+INTERACTIVE_ROLES = {"button", "link", "checkbox", "radio"}
+
+# Computed styles requested from the snapshot, in this order
+SNAPSHOT_STYLES = ["display", "visibility", "opacity"]
+
+# Tags the snapshot's elements by their position among the selector's matches, so
+# both extractors leave the same data-nexus-idx handles behind
+CDP_TAG_JS = """
+(ordinals) => {
+    document.querySelectorAll('[data-nexus-idx]').forEach(el => el.removeAttribute('data-nexus-idx'));
+    const candidates = document.querySelectorAll(
+        'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
+    );
+    const tags = ordinals.map((ordinal, i) => {
+        const el = candidates[ordinal];
+        if (!el) return null;
+        el.setAttribute('data-nexus-idx', String(i + 1));
+        return el.tagName.toLowerCase();
+    });
+    return {tags: tags, width: window.innerWidth, height: window.innerHeight};
+}
+"""
+
+def is_interactive_candidate(tag_name: str, attributes: Dict[str, str]) -> bool:
+    """Python version of the interactive-element selector used by the JS extractor"""
+    if tag_name in INTERACTIVE_TAGS or attributes.get("role") in INTERACTIVE_ROLES:
+        return True
+    return "tabindex" in attributes and attributes["tabindex"] != "-1"
+
+def elements_from_snapshot(snapshot: dict) -> tuple:
+    """Find visible interactive elements in a DOMSnapshot.captureSnapshot result.
+    
+    Only the main document outside shadow roots is read, which is what
+    document.querySelectorAll sees. Returns a tuple of (elements, ordinals):
+    elements in the JS extractor's format without viewport flags, and each
+    element's position among all selector matches, for tagging.
+    """
+    strings = snapshot["strings"]
+    document = snapshot["documents"][0]
+    nodes = document["nodes"]
+    layout = document["layout"]
+    
+    parents = nodes["parentIndex"]
+    node_types = nodes["nodeType"]
+    node_names = nodes["nodeName"]
+    node_values = nodes["nodeValue"]
+    node_attributes = nodes["attributes"]
+    input_value = nodes.get("inputValue", {})
+    input_values = dict(zip(input_value.get("index", []), input_value.get("value", [])))
+    scroll_x = document.get("scrollOffsetX", 0)
+    scroll_y = document.get("scrollOffsetY", 0)
+    
+    # Layout index per node; nodes without a layout object are not rendered
+    layout_of = {node_index: i for i, node_index in enumerate(layout["nodeIndex"])}
+    
+    # Nodes come in document order, so a parent is always seen before its children
+    in_shadow = [False] * len(parents)
+    candidates = {}
+    for i, parent in enumerate(parents):
+        if parent >= 0:
+            in_shadow[i] = in_shadow[parent] or node_types[parent] == 11
+        if node_types[i] != 1 or in_shadow[i]:
+            continue
+        raw = node_attributes[i]
+        attributes = {strings[raw[j]]: strings[raw[j + 1]] for j in range(0, len(raw), 2)}
+        if is_interactive_candidate(strings[node_names[i]].lower(), attributes):
+            candidates[i] = (len(candidates), attributes)
+    
+    # Rendered text of each candidate, like innerText: every rendered text node below it
+    texts = {i: [] for i in candidates}
+    for i in range(len(parents)):
+        if node_types[i] != 3 or i not in layout_of or node_values[i] < 0:
+            continue
+        text = strings[node_values[i]].strip()
+        ancestor = parents[i]
+        while text and ancestor >= 0:
+            if ancestor in texts:
+                texts[ancestor].append(text)
+            ancestor = parents[ancestor]
+    
+    elements = []
+    ordinals = []
+    for i, (ordinal, attributes) in candidates.items():
+        layout_index = layout_of.get(i)
+        if layout_index is None:
+            continue
+        display, visibility, opacity = (strings[k] if k >= 0 else "" for k in layout["styles"][layout_index])
+        x, y, width, height = layout["bounds"][layout_index]
+        if display == "none" or visibility == "hidden" or opacity == "0" or width <= 0 or height <= 0:
+            continue
+        
+        text = " ".join(texts[i])
+        if not text and i in input_values and input_values[i] >= 0:
+            text = strings[input_values[i]]
+        elements.append({
+            "index": len(elements) + 1,
+            "tagName": strings[node_names[i]].lower(),
+            "text": text,
+            "attributes": attributes,
+            "isVisible": True,
+            "isInteractive": True,
+            "pageCoordinates": {"x": x, "y": y, "width": width, "height": height},
+            "viewportCoordinates": {"x": x - scroll_x, "y": y - scroll_y, "width": width, "height": height}
+        })
+        ordinals.append(ordinal)
+    return elements, ordinals
+
+#######################################################
+# Resource blocking
+#######################################################
+
+# Request types each built-in profile blocks; "custom" blocks only what the request lists
+RESOURCE_PROFILES = {
+    "full": set(),
+    "no-media": {"image", "media", "font"},
+    "text-only": {"image", "media", "font", "stylesheet", "texttrack", "manifest"},
+    "custom": set(),
+}
+
+# Ad and analytics hosts blocked (with their subdomains) by every profile except "full"
+TRACKER_DOMAINS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "googletagservices.com", "adservice.google.com", "facebook.net",
+    "connect.facebook.net", "hotjar.com", "segment.io", "segment.com", "mixpanel.com",
+    "amplitude.com", "scorecardresearch.com", "quantserve.com", "taboola.com", "outbrain.com",
+    "criteo.com", "adnxs.com", "amazon-adsystem.com", "newrelic.com", "nr-data.net", "fullstory.com",
+)
+
+# Profile of new browser contexts when none is given
+DEFAULT_RESOURCE_PROFILE = os.getenv("NEXUS_BROWSER_RESOURCE_PROFILE", "full")
+
+class ResourceProfileSpec(BaseModel):
+    """Resource profile as sent in requests"""
+    name: str = "full"  # One of RESOURCE_PROFILES
+    blocked_resource_types: List[str] = []  # Extra Playwright resource types to block, e.g. "image"
+    blocked_url_patterns: List[str] = []  # Extra substrings; requests whose URL contains one are blocked
+
+@dataclass
+class ResourceProfile:
+    name: str
+    blocked_types: set
+    blocked_patterns: List[str]
+    block_trackers: bool
+    
+    @classmethod
+    def from_spec(cls, spec: ResourceProfileSpec) -> 'ResourceProfile':
+        if spec.name not in RESOURCE_PROFILES:
+            raise HTTPException(status_code=422, detail=f"resource profile must be one of {', '.join(RESOURCE_PROFILES)}")
+        return cls(
+            name=spec.name,
+            blocked_types=RESOURCE_PROFILES[spec.name] | set(spec.blocked_resource_types),
+            blocked_patterns=list(spec.blocked_url_patterns),
+            block_trackers=spec.name != "full"
+        )
+    
+    @property
+    def blocks_anything(self) -> bool:
+        return bool(self.blocked_types or self.blocked_patterns or self.block_trackers)
+    
+    def blocks(self, resource_type: str, url: str) -> bool:
+        # The page's own document is always loaded
+        if resource_type == "document":
+            return False
+        if resource_type in self.blocked_types:
+            return True
+        if self.block_trackers:
+            host = urlparse(url).hostname or ""
+            if any(host == domain or host.endswith("." + domain) for domain in TRACKER_DOMAINS):
+                return True
+        return any(pattern in url for pattern in self.blocked_patterns)
+
+#######################################################
+# Page settling
+#######################################################
+
+# DOM must be free of mutations for this long to count as settled
+SETTLE_QUIET_MS = 300
+# Overall settle deadline for one action
+SETTLE_DEADLINE_MS = 5000
+# Bounds of the per-domain budget derived from learned settle times
+SETTLE_MIN_BUDGET_MS = 1000
+# Budget for domains that have failed to settle before (long-polling, animations)
+SETTLE_NOISY_BUDGET_MS = 1500
+# Weight of the newest observation in the per-domain moving average
+SETTLE_EMA_ALPHA = 0.3
+
+SETTLE_JS = """
+({quietMs, timeoutMs}) => new Promise(resolve => {
+    const start = performance.now();
+    let lastMutation = start;
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    const check = () => {
+        const now = performance.now();
+        if (document.readyState !== 'loading' && now - lastMutation >= quietMs) {
+            observer.disconnect();
+            resolve({settled: true, elapsed: now - start});
+        } else if (now - start >= timeoutMs) {
+            observer.disconnect();
+            resolve({settled: false, elapsed: now - start});
+        } else {
+            setTimeout(check, 50);
+        }
+    };
+    setTimeout(check, 50);
+})
+"""
+
+class PageSettler:
+    """Waits until a page's DOM has been quiet for SETTLE_QUIET_MS.
+
+    Unlike networkidle this is not held up by long-polling or analytics
+    beacons. Each call has one deadline, derived from a moving average of how
+    long the domain took to settle before; domains that never go quiet get a
+    short fixed budget. A navigation that destroys the execution context
+    mid-wait is followed to the new document within the same deadline.
+    """
+
+    def __init__(self):
+        self.settle_ms: Dict[str, float] = {}
+        self.noisy_domains: set = set()
+
+    def budget_ms(self, domain: str) -> float:
+        if domain in self.noisy_domains:
+            return SETTLE_NOISY_BUDGET_MS
+        learned = self.settle_ms.get(domain)
+        if learned is None:
+            return SETTLE_DEADLINE_MS
+        return min(max(2 * learned + SETTLE_QUIET_MS, SETTLE_MIN_BUDGET_MS), SETTLE_DEADLINE_MS)
+
+    def record(self, domain: str, settled: bool, elapsed_ms: float):
+        if not settled:
+            self.noisy_domains.add(domain)
+            return
+        self.noisy_domains.discard(domain)
+        previous = self.settle_ms.get(domain)
+        self.settle_ms[domain] = elapsed_ms if previous is None else (
+            SETTLE_EMA_ALPHA * elapsed_ms + (1 - SETTLE_EMA_ALPHA) * previous
+        )
+
+    async def settle(self, page: Page) -> dict:
+        """Wait for the page to settle within its domain's budget"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + self.budget_ms(urlparse(page.url).netloc) / 1000
+        result = {"settled": False}
+        while True:
+            remaining_ms = (deadline - loop.time()) * 1000
+            if remaining_ms <= 0:
+                break
+            try:
+                result = await page.evaluate(SETTLE_JS, {"quietMs": SETTLE_QUIET_MS, "timeoutMs": remaining_ms})
+                break
+            except Exception as e:
+                if "context was destroyed" not in str(e) and "navigat" not in str(e).lower():
+                    print(f"Error waiting for page to settle: {e}")
+                    break
+                # A navigation replaced the document; wait for the new one and settle that
+                try:
+                    await page.wait_for_load_state("domcontentloaded", timeout=max((deadline - loop.time()) * 1000, 1))
+                except Exception:
+                    pass
+        
+        elapsed_ms = (loop.time() - started) * 1000
+        self.record(urlparse(page.url).netloc, result.get("settled", False), elapsed_ms)
+        return {"settled": result.get("settled", False), "elapsed_ms": elapsed_ms}
 
 #######################################################
 # Action model definitions
@@ -33,6 +463,7 @@ class ClickCoordinatesAction(BaseModel):
 
 class GoToUrlAction(BaseModel):
     url: str
+    resource_profile: Optional[ResourceProfileSpec] = None  # Overrides the context's profile for this page
 
 class InputTextAction(BaseModel):
     index: int
@@ -46,16 +477,42 @@ class SendKeysAction(BaseModel):
 
 class SearchGoogleAction(BaseModel):
     query: str
+    resource_profile: Optional[ResourceProfileSpec] = None
 
 class SwitchTabAction(BaseModel):
     page_id: int
 
 class OpenTabAction(BaseModel):
     url: str
+    resource_profile: Optional[ResourceProfileSpec] = None
 
 class CloseTabAction(BaseModel):
     page_id: int
 
+class BatchStep(BaseModel):
+    action: str  # One of BATCH_STEP_ACTIONS
+    params: Dict[str, Any] = {}  # The action's usual request body
+
+class BatchAction(BaseModel):
+    steps: List[BatchStep]
+    stop_on_error: bool = True  # Skip the remaining steps after the first failure
+
+# Actions a batch can contain, with the request model of each (None: plain body fields)
+BATCH_STEP_ACTIONS = {
+    "input_text": InputTextAction,
+    "click_element": ClickElementAction,
+    "click_coordinates": ClickCoordinatesAction,
+    "send_keys": SendKeysAction,
+    "scroll_down": ScrollAction,
+    "scroll_up": ScrollAction,
+    "scroll_to_text": None,
+    "select_dropdown_option": None,
+}
+
+class CreateContextAction(BaseModel):
+    context_id: Optional[str] = None  # Generated when not given
+    resource_profile: Optional[ResourceProfileSpec] = None  # DEFAULT_RESOURCE_PROFILE when not given
+
 class NoParamsAction(BaseModel):
     pass
 
@@ -79,33 +536,37 @@ class DoneAction(BaseModel):
 # DOM Structure Models
 #######################################################
 
-@dataclass
+# The DOM models are slotted: pages can produce tens of thousands of nodes, and
+# slots drop the per-instance __dict__. Nodes compare by identity (eq=False), so
+# comparing two nodes never walks their parents and children.
+
+@dataclass(slots=True)
 class CoordinateSet:
     x: int = 0
     y: int = 0
     width: int = 0
     height: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class ViewportInfo:
     width: int = 0
     height: int = 0
     scroll_x: int = 0
     scroll_y: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class HashedDomElement:
     tag_name: str
     attributes: Dict[str, str]
     is_visible: bool
     page_coordinates: Optional[CoordinateSet] = None
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DOMBaseNode:
     is_visible: bool
     parent: Optional['DOMElementNode'] = None
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DOMTextNode(DOMBaseNode):
     text: str = field(default="")
     type: str = 'TEXT_NODE'
@@ -118,7 +579,7 @@ class DOMTextNode(DOMBaseNode):
             current = current.parent
         return False
 
-@dataclass
+@dataclass(slots=True, eq=False)
 class DOMElementNode(DOMBaseNode):
     tag_name: str = field(default="")
     xpath: str = field(default="")
@@ -153,7 +614,7 @@ class DOMElementNode(DOMBaseNode):
             
         return tag_str
     
-    @cached_property
+    @property
     def hash(self) -> HashedDomElement:
         return HashedDomElement(
             tag_name=self.tag_name,
@@ -164,76 +625,91 @@ class DOMElementNode(DOMBaseNode):
     
     def get_all_text_till_next_clickable_element(self, max_depth: int = -1) -> str:
         text_parts = []
-        
-        def collect_text(node: DOMBaseNode, current_depth: int) -> None:
-            if max_depth != -1 and current_depth > max_depth:
-                return
-                
-            if isinstance(node, DOMElementNode) and node != self and node.highlight_index is not None:
-                return
-                
-            if isinstance(node, DOMTextNode):
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if max_depth != -1 and depth > max_depth:
+                continue
+            if type(node) is DOMTextNode:
                 text_parts.append(node.text)
-            elif isinstance(node, DOMElementNode):
-                for child in node.children:
-                    collect_text(child, current_depth + 1)
-                    
-        collect_text(self, 0)
+            elif node is self or node.highlight_index is None:
+                # Reversed so children are visited in document order
+                stack.extend((child, depth + 1) for child in reversed(node.children))
         return '\n'.join(text_parts).strip()
     
     def clickable_elements_to_string(self, include_attributes: list[str] | None = None) -> str:
-        """Convert the processed DOM content to HTML."""
+        """Convert the processed DOM content to HTML.
+        
+        Single pass over the tree: each text node is attributed to its nearest
+        highlighted ancestor as the walk goes down, so neither the ancestor check
+        nor the per-element text collection revisits nodes.
+        """
+        # Entries are plain strings (free text) or (element, text_parts) filled in during the walk
+        entries = []
+        owner_text = None
+        if self.highlight_index is None:
+            parent = self.parent
+            while parent is not None and parent.highlight_index is None:
+                parent = parent.parent
+            if parent is not None:
+                # Text below this subtree belongs to a highlighted element outside it
+                owner_text = []
+        
+        stack = [(self, owner_text)]
+        while stack:
+            node, owner_text = stack.pop()
+            if type(node) is DOMTextNode:
+                if owner_text is not None:
+                    owner_text.append(node.text)
+                elif node.is_visible and node.text and node.text.strip():
+                    entries.append(node.text)
+                continue
+            
+            if node.highlight_index is not None:
+                owner_text = []
+                entries.append((node, owner_text))
+            stack.extend((child, owner_text) for child in reversed(node.children))
+        
         formatted_text = []
+        for entry in entries:
+            if isinstance(entry, str):
+                formatted_text.append(entry)
+                continue
+            
+            node, text_parts = entry
+            text = '\n'.join(text_parts).strip()
+            
+            # Process attributes for display
+            display_attributes = []
+            if include_attributes:
+                for key, value in node.attributes.items():
+                    if key in include_attributes and value and value != node.tag_name:
+                        if text and value in text:
+                            continue  # Skip if attribute value is already in the text
+                        display_attributes.append(str(value))
+            
+            attributes_str = ';'.join(display_attributes)
+            
+            # Build the element string
+            line = f'[{node.highlight_index}]<{node.tag_name}'
+            
+            # Add important attributes for identification
+            for attr_name in ['id', 'href', 'name', 'value', 'type']:
+                if attr_name in node.attributes and node.attributes[attr_name]:
+                    line += f' {attr_name}="{node.attributes[attr_name]}"'
+            
+            # Add the text content if available
+            if text:
+                line += f'> {text}'
+            elif attributes_str:
+                line += f'> {attributes_str}'
+            else:
+                # If no text and no attributes, use the tag name
+                line += f'> {node.tag_name.upper()}'
+            
+            line += ' </>'
+            formatted_text.append(line)
         
-        def process_node(node: DOMBaseNode, depth: int) -> None:
-            if isinstance(node, DOMElementNode):
-                # Add element with highlight_index
-                if node.highlight_index is not None:
-                    attributes_str = ''
-                    text = node.get_all_text_till_next_clickable_element()
-                    
-                    # Process attributes for display
-                    display_attributes = []
-                    if include_attributes:
-                        for key, value in node.attributes.items():
-                            if key in include_attributes and value and value != node.tag_name:
-                                if text and value in text:
-                                    continue  # Skip if attribute value is already in the text
-                                display_attributes.append(str(value))
-                    
-                    attributes_str = ';'.join(display_attributes)
-                    
-                    # Build the element string
-                    line = f'[{node.highlight_index}]<{node.tag_name}'
-                    
-                    # Add important attributes for identification
-                    for attr_name in ['id', 'href', 'name', 'value', 'type']:
-                        if attr_name in node.attributes and node.attributes[attr_name]:
-                            line += f' {attr_name}="{node.attributes[attr_name]}"'
-                    
-                    # Add the text content if available
-                    if text:
-                        line += f'> {text}'
-                    elif attributes_str:
-                        line += f'> {attributes_str}'
-                    else:
-                        # If no text and no attributes, use the tag name
-                        line += f'> {node.tag_name.upper()}'
-                    
-                    line += ' </>'
-                    formatted_text.append(line)
-                
-                # Process children regardless
-                for child in node.children:
-                    process_node(child, depth + 1)
-                    
-            elif isinstance(node, DOMTextNode):
-                # Add text only if it doesn't have a highlighted parent
-                if not node.has_parent_with_highlight_index() and node.is_visible:
-                    if node.text and node.text.strip():
-                        formatted_text.append(node.text)
-                    
-        process_node(self, 0)
         result = '\n'.join(formatted_text)
         return result if result.strip() else "No interactive elements found"
 
@@ -260,10 +736,17 @@ class BrowserActionResult(BaseModel):
     title: Optional[str] = None
     elements: Optional[str] = None  # Formatted string of clickable elements
     screenshot_base64: Optional[str] = None
+    screenshot_id: Optional[str] = None  # Set instead of screenshot_base64 in "ref" screenshot mode
+    screenshot_mime: Optional[str] = None  # Encoding of the screenshot
+    screenshot_hash: Optional[str] = None  # sha256 of the encoded screenshot, for change detection
     pixels_above: int = 0
     pixels_below: int = 0
     content: Optional[str] = None
     ocr_text: Optional[str] = None  # Added field for OCR text
+    detail: str = "full"  # State detail level this result was captured at
+    dom_mode: Optional[str] = None  # "full" or "diff" when elements were scanned
+    dom_diff: Optional[Dict[str, Any]] = None  # Added/removed/changed indices and a summary in "diff" mode
+    steps: Optional[List[Dict[str, Any]]] = None  # Per-step status of a batch
     
     # Additional metadata
     element_count: int = 0  # Number of interactive elements found
@@ -278,53 +761,125 @@ class BrowserActionResult(BaseModel):
 # Browser Automation Implementation 
 #######################################################
 
+class BrowserSession:
+    """One named browser context: its own pages, cookies and current tab.
+    
+    Actions within a session run one at a time under its lock; different
+    sessions run concurrently.
+    """
+    
+    def __init__(self, context_id: str, context: BrowserContext, profile: ResourceProfile):
+        self.context_id = context_id
+        self.context = context
+        self.pages: List[Page] = []
+        self.current_page_index: int = 0
+        self.lock = asyncio.Lock()
+        self.created_at = datetime.now()
+        self.profile = profile
+        # Profiles set by a navigation for one page, replacing the context's profile there
+        self.page_profiles: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.routing = False
+    
+    def profile_for(self, page: Optional[Page]) -> ResourceProfile:
+        if page is not None and page in self.page_profiles:
+            return self.page_profiles[page]
+        return self.profile
+    
+    async def handle_route(self, route):
+        request = route.request
+        try:
+            page = request.frame.page
+        except Exception:
+            # Service worker and other requests without a frame
+            page = None
+        if self.profile_for(page).blocks(request.resource_type, request.url):
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+    
+    async def apply_profile(self, profile: Optional[ResourceProfile], page: Optional[Page] = None):
+        """Use a profile for the whole context, or for one page's next loads"""
+        if page is None:
+            self.profile = profile
+        elif profile is None:
+            self.page_profiles.pop(page, None)
+        else:
+            self.page_profiles[page] = profile
+        
+        # Requests only go through Python once some profile actually blocks something
+        if not self.routing and profile is not None and profile.blocks_anything:
+            await self.context.route("**/*", self.handle_route)
+            self.routing = True
+
 class BrowserAutomation:
     def __init__(self):
-        self.router = APIRouter()
+        self.router = APIRouter(dependencies=[Depends(verify_token), Depends(set_action_options)])
         self.browser: Browser = None
-        self.pages: List[Page] = []
-        self.current_page_index: int = 0
+        self.sessions: Dict[str, BrowserSession] = {}
         self.logger = logging.getLogger("browser_automation")
         self.include_attributes = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
         self.screenshot_dir = os.path.join(os.getcwd(), "screenshots")
         os.makedirs(self.screenshot_dir, exist_ok=True)
+        # Screenshot id -> (image bytes, MIME type)
+        self.screenshots: OrderedDict[str, tuple] = OrderedDict()
+        self.ocr_cache: OrderedDict[str, str] = OrderedDict()
+        self.settler = PageSettler()
+        # Per page: selector map of the last element scan; pages belong to one context, so
+        # scans in concurrently running contexts never replace each other's maps
+        self.selector_maps: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        # Per page: (url, {index: element_info}) of the last element scan, for DOM diffs
+        self.element_snapshots: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        # CDP session per page for the "cdp" element extractor
+        self.cdp_sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
         
         # Register routes
         self.router.on_startup.append(self.startup)
         self.router.on_shutdown.append(self.shutdown)
         
         # Basic navigation
-        self.router.post("/automation/navigate_to")(self.navigate_to)
-        self.router.post("/automation/search_google")(self.search_google)
-        self.router.post("/automation/go_back")(self.go_back)
-        self.router.post("/automation/wait")(self.wait)
+        self.action_route("/automation/navigate_to")(self.navigate_to)
+        self.action_route("/automation/search_google")(self.search_google)
+        self.action_route("/automation/go_back")(self.go_back)
+        self.action_route("/automation/wait")(self.wait)
         
         # Element interaction
-        self.router.post("/automation/click_element")(self.click_element)
-        self.router.post("/automation/click_coordinates")(self.click_coordinates)
-        self.router.post("/automation/input_text")(self.input_text)
-        self.router.post("/automation/send_keys")(self.send_keys)
+        self.action_route("/automation/click_element")(self.click_element)
+        self.action_route("/automation/click_coordinates")(self.click_coordinates)
+        self.action_route("/automation/input_text")(self.input_text)
+        self.action_route("/automation/send_keys")(self.send_keys)
         
         # Tab management
-        self.router.post("/automation/switch_tab")(self.switch_tab)
-        self.router.post("/automation/open_tab")(self.open_tab)
-        self.router.post("/automation/close_tab")(self.close_tab)
+        self.action_route("/automation/switch_tab")(self.switch_tab)
+        self.action_route("/automation/open_tab")(self.open_tab)
+        self.action_route("/automation/close_tab")(self.close_tab)
         
         # Content actions
-        self.router.post("/automation/extract_content")(self.extract_content)
-        self.router.post("/automation/save_pdf")(self.save_pdf)
+        self.action_route("/automation/extract_content")(self.extract_content)
+        self.action_route("/automation/save_pdf")(self.save_pdf)
         
         # Scroll actions
-        self.router.post("/automation/scroll_down")(self.scroll_down)
-        self.router.post("/automation/scroll_up")(self.scroll_up)
-        self.router.post("/automation/scroll_to_text")(self.scroll_to_text)
+        self.action_route("/automation/scroll_down")(self.scroll_down)
+        self.action_route("/automation/scroll_up")(self.scroll_up)
+        self.action_route("/automation/scroll_to_text")(self.scroll_to_text)
         
         # Dropdown actions
-        self.router.post("/automation/get_dropdown_options")(self.get_dropdown_options)
-        self.router.post("/automation/select_dropdown_option")(self.select_dropdown_option)
+        self.action_route("/automation/get_dropdown_options")(self.get_dropdown_options)
+        self.action_route("/automation/select_dropdown_option")(self.select_dropdown_option)
         
         # Drag and drop
-        self.router.post("/automation/drag_drop")(self.drag_drop)
+        self.action_route("/automation/drag_drop")(self.drag_drop)
+        
+        # Several actions, one state capture
+        self.action_route("/automation/batch")(self.batch)
+        
+        # Screenshots returned by reference
+        self.router.get("/automation/screenshot/{screenshot_id}")(self.get_screenshot)
+        
+        # Browser contexts
+        self.router.post("/automation/contexts")(self.create_context)
+        self.router.get("/automation/contexts")(self.list_contexts)
+        # Not {context_id}: that name is the query parameter every route takes via set_action_options
+        self.router.delete("/automation/contexts/{name}")(self.delete_context)
 
     async def startup(self):
         """Initialize the browser instance on startup"""
@@ -350,21 +905,12 @@ class BrowserAutomation:
                 self.browser = await playwright.chromium.launch(**launch_options)
                 print("Browser launched with minimal options")
 
-            try:
-                await self.get_current_page()
-                print("Found existing page, using it")
-                self.current_page_index = 0
-            except Exception as page_error:
-                print(f"Error finding existing page, creating new one. ( {page_error})")
-                page = await self.browser.new_page(viewport={'width': 1024, 'height': 768})
-                print("New page created successfully")
-                self.pages.append(page)
-                self.current_page_index = 0
-                # Navigate directly to google.com instead of about:blank
-                await page.goto("https://www.google.com", wait_until="domcontentloaded", timeout=30000)
-                print("Navigated to google.com")
-                
-                print("Browser initialization completed successfully")
+            session = await self.open_session(DEFAULT_CONTEXT_ID)
+            # Navigate directly to google.com instead of about:blank
+            await session.pages[0].goto("https://www.google.com", wait_until="domcontentloaded", timeout=30000)
+            print("Navigated to google.com")
+            
+            print("Browser initialization completed successfully")
         except Exception as e:
             print(f"Browser startup error: {str(e)}")
             traceback.print_exc()
@@ -374,6 +920,97 @@ class BrowserAutomation:
         """Clean up browser instance on shutdown"""
         if self.browser:
             await self.browser.close()
+        if _ocr_pool is not None:
+            _ocr_pool.shutdown(wait=False)
+    
+    async def open_session(self, context_id: str, profile: Optional[ResourceProfile] = None) -> BrowserSession:
+        """Create a browser context with one blank page"""
+        context = await self.browser.new_context(viewport=BROWSER_VIEWPORT)
+        profile = profile or ResourceProfile.from_spec(ResourceProfileSpec(name=DEFAULT_RESOURCE_PROFILE))
+        session = BrowserSession(context_id, context, profile)
+        await session.apply_profile(profile)
+        session.pages.append(await context.new_page())
+        self.sessions[context_id] = session
+        print(f"Opened browser context {context_id}")
+        return session
+    
+    def action_route(self, path: str):
+        """Register a browser action; actions in the same context run one at a time"""
+        return self.router.post(path, dependencies=[Depends(self.lock_session)])
+    
+    async def lock_session(self, _: None = Depends(set_action_options)):
+        """Run the request's action under its context's lock"""
+        session = self.session
+        async with session.lock:
+            yield
+    
+    @property
+    def session(self) -> BrowserSession:
+        """Browser context of the request currently being handled"""
+        context_id = current_options().context_id
+        session = self.sessions.get(context_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Browser context {context_id} not found")
+        return session
+    
+    @property
+    def pages(self) -> List[Page]:
+        return self.session.pages
+    
+    @property
+    def current_page_index(self) -> int:
+        return self.session.current_page_index
+    
+    @current_page_index.setter
+    def current_page_index(self, index: int):
+        self.session.current_page_index = index
+    
+    async def create_context(self, action: CreateContextAction = Body(CreateContextAction())):
+        """Create a named browser context, or return the existing one with that name.
+        
+        A resource profile given for an existing context replaces its profile.
+        """
+        context_id = action.context_id or uuid.uuid4().hex[:8]
+        profile = ResourceProfile.from_spec(action.resource_profile) if action.resource_profile else None
+        session = self.sessions.get(context_id)
+        if session is not None:
+            if profile is not None:
+                await session.apply_profile(profile)
+            return {"context_id": context_id, "created": False, "resource_profile": session.profile.name}
+        if len(self.sessions) >= MAX_BROWSER_CONTEXTS:
+            raise HTTPException(status_code=429, detail=f"At most {MAX_BROWSER_CONTEXTS} browser contexts can be open")
+        session = await self.open_session(context_id, profile)
+        return {"context_id": context_id, "created": True, "resource_profile": session.profile.name}
+    
+    async def list_contexts(self):
+        """List open browser contexts with their tabs"""
+        return {"contexts": [
+            {
+                "context_id": session.context_id,
+                "current_page_index": session.current_page_index,
+                "urls": [page.url for page in session.pages],
+                "resource_profile": session.profile.name,
+                "created_at": session.created_at.isoformat()
+            }
+            for session in self.sessions.values()
+        ]}
+    
+    async def delete_context(self, name: str):
+        """Close a browser context and all of its pages; actions still running in it fail"""
+        context_id = name
+        if context_id == DEFAULT_CONTEXT_ID:
+            raise HTTPException(status_code=400, detail="The default browser context cannot be deleted")
+        session = self.sessions.get(context_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Browser context {context_id} not found")
+        self.sessions.pop(context_id, None)
+        await session.context.close()
+        return {"context_id": context_id, "deleted": True}
+    
+    async def apply_navigation_profile(self, page: Page, spec: Optional[ResourceProfileSpec]):
+        """Use a navigation's resource profile for the page, or go back to the context's profile"""
+        profile = ResourceProfile.from_spec(spec) if spec else None
+        await self.session.apply_profile(profile, page)
     
     async def get_current_page(self) -> Page:
         """Get the current active page"""
@@ -401,6 +1038,9 @@ class BrowserAutomation:
                     return attributes;
                 }
                 
+                // Drop the tags left by the previous scan
+                document.querySelectorAll('[data-nexus-idx]').forEach(el => el.removeAttribute('data-nexus-idx'));
+                
                 // Find all potentially interactive elements
                 const interactiveElements = Array.from(document.querySelectorAll(
                     'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
@@ -424,12 +1064,16 @@ class BrowserAutomation:
                                       rect.left >= 0 && 
                                       rect.bottom <= window.innerHeight &&
                                       rect.right <= window.innerWidth;
+                    const attributes = getAttributes(el);
+                    
+                    // Tag the element so actions can find it again with one querySelector
+                    el.setAttribute('data-nexus-idx', String(index + 1));
                     
                     return {
                         index: index + 1,
                         tagName: el.tagName.toLowerCase(),
                         text: el.innerText || el.value || '',
-                        attributes: getAttributes(el),
+                        attributes: attributes,
                         isVisible: true,
                         isInteractive: true,
                         pageCoordinates: {
@@ -450,7 +1094,14 @@ class BrowserAutomation:
             })();
             """
             
-            elements = await page.evaluate(elements_js)
+            elements = None
+            if (current_options().extractor or DEFAULT_DOM_EXTRACTOR) == "cdp":
+                try:
+                    elements = await self.extract_elements_via_cdp(page)
+                except Exception as cdp_error:
+                    print(f"CDP element extraction failed, falling back to JS: {cdp_error}")
+            if elements is None:
+                elements = await page.evaluate(elements_js)
             print(f"Found {len(elements)} interactive elements in selector map")
             
             # Create a root element for the tree
@@ -523,8 +1174,59 @@ class BrowserAutomation:
             dummy.children.append(dummy_text)
             selector_map[1] = dummy
         
+        self.selector_maps[page] = selector_map
         return selector_map
     
+    async def extract_elements_via_cdp(self, page: Page) -> List[Dict[str, Any]]:
+        """Find interactive elements from one DOMSnapshot instead of per-element style and layout reads.
+        
+        Returns elements in the same format as the JS extractor, tagged with
+        data-nexus-idx. Raises if the tagged elements do not line up with the
+        snapshot, so the caller can fall back to the JS extractor.
+        """
+        session = self.cdp_sessions.get(page)
+        if session is None:
+            session = self.cdp_sessions[page] = await page.context.new_cdp_session(page)
+        
+        snapshot = await session.send("DOMSnapshot.captureSnapshot", {"computedStyles": SNAPSHOT_STYLES})
+        elements, ordinals = elements_from_snapshot(snapshot)
+        
+        tagged = await page.evaluate(CDP_TAG_JS, ordinals)
+        if tagged["tags"] != [el["tagName"] for el in elements]:
+            raise RuntimeError("page changed between the snapshot and tagging")
+        
+        for el in elements:
+            rect = el["viewportCoordinates"]
+            el["isInViewport"] = (rect["y"] >= 0 and rect["x"] >= 0 and
+                                  rect["y"] + rect["height"] <= tagged["height"] and
+                                  rect["x"] + rect["width"] <= tagged["width"])
+        return elements
+    
+    async def get_element(self, index: int) -> tuple:
+        """Resolve an element index from the last scan to a live handle.
+        
+        Elements are found through the data-nexus-idx attribute set during the
+        scan. The page is rescanned only when the index is unknown or its tag
+        has disappeared (navigation or re-render since the last scan).
+        
+        Returns a tuple of (element_handle, element_node); both are None if the
+        index does not exist on the current page.
+        """
+        page = await self.get_current_page()
+        selector = f'[data-nexus-idx="{index}"]'
+        
+        # Taken before awaiting, so a rescan meanwhile cannot change which element is returned
+        node = self.selector_maps.get(page, {}).get(index)
+        if node is not None:
+            handle = await page.query_selector(selector)
+            if handle is not None:
+                return handle, node
+        
+        selector_map = await self.get_selector_map()
+        if index not in selector_map:
+            return None, None
+        return await page.query_selector(selector), selector_map[index]
+    
     async def get_current_dom_state(self) -> DOMState:
         """Get the current DOM state including element tree and selector map"""
         try:
@@ -615,28 +1317,48 @@ class BrowserAutomation:
             )
     
     async def take_screenshot(self) -> str:
-        """Take a screenshot and return as base64 encoded string"""
+        """Take a screenshot and return as base64 encoded string
+        
+        The encoding, downscale and crop follow the request's screenshot options;
+        the MIME type is SCREENSHOT_FORMATS[options.screenshot_format].
+        """
         try:
             page = await self.get_current_page()
+            options = current_options()
             
-            # Wait for network to be idle and DOM to be stable
-            try:
-                await page.wait_for_load_state("networkidle", timeout=60000)  # Increased timeout to 60s
-            except Exception as e:
-                print(f"Warning: Network idle timeout, proceeding anyway: {e}")
+            # The page has already been settled by get_updated_browser_state
             
-            # Wait for any animations to complete
-            # await page.wait_for_timeout(1000)  # Wait 1 second for animations
+            clip = parse_clip(options.screenshot_clip) if options.screenshot_clip else None
+            if options.screenshot_element is not None:
+                handle, _ = await self.get_element(options.screenshot_element)
+                box = await handle.bounding_box() if handle else None
+                if box and box["width"] > 0 and box["height"] > 0:
+                    clip = box
+                else:
+                    print(f"Element {options.screenshot_element} has no box, capturing the viewport")
+            
+            # Playwright encodes jpeg and png itself; anything else starts from a lossless capture
+            reencode = (options.screenshot_format == "webp" or options.screenshot_grayscale
+                        or options.screenshot_max_dim is not None)
+            capture_options = {"type": "png"} if reencode or options.screenshot_format == "png" else {
+                "type": "jpeg", "quality": options.screenshot_quality
+            }
             
             # Take screenshot with increased timeout and better options
             screenshot_bytes = await page.screenshot(
-                type='jpeg',
-                quality=60,
+                **capture_options,
+                clip=clip,
                 full_page=False,
                 timeout=60000,  # Increased timeout to 60s
                 scale='device'  # Use device scale factor
             )
             
+            if reencode:
+                screenshot_bytes = await asyncio.to_thread(
+                    encode_screenshot, screenshot_bytes, options.screenshot_format, options.screenshot_quality,
+                    options.screenshot_grayscale, options.screenshot_max_dim
+                )
+            
             return base64.b64encode(screenshot_bytes).decode('utf-8')
         except Exception as e:
             print(f"Error taking screenshot: {e}")
@@ -660,38 +1382,124 @@ class BrowserAutomation:
             return ""
     
     async def extract_ocr_text_from_screenshot(self, screenshot_base64: str) -> str:
-        """Extract text from screenshot using OCR"""
+        """Extract text from screenshot using OCR in the worker process, cached by content hash"""
         if not screenshot_base64:
             return ""
             
         try:
-            # Decode base64 to image
             image_bytes = base64.b64decode(screenshot_base64)
-            image = Image.open(io.BytesIO(image_bytes))
-            
-            # Extract text using pytesseract
-            ocr_text = pytesseract.image_to_string(image)
+            digest = hashlib.sha256(image_bytes).hexdigest()
+            if digest in self.ocr_cache:
+                self.ocr_cache.move_to_end(digest)
+                return self.ocr_cache[digest]
             
-            # Clean up the text
-            ocr_text = ocr_text.strip()
+            loop = asyncio.get_running_loop()
+            ocr_text = await loop.run_in_executor(get_ocr_pool(), ocr_image_bytes, image_bytes)
             
+            self.ocr_cache[digest] = ocr_text
+            while len(self.ocr_cache) > OCR_CACHE_SIZE:
+                self.ocr_cache.popitem(last=False)
             return ocr_text
         except Exception as e:
             print(f"Error performing OCR: {e}")
             traceback.print_exc()
             return ""
     
+    async def get_light_dom_state(self) -> DOMState:
+        """Page url and title without scanning elements, for the cheaper detail levels"""
+        page = await self.get_current_page()
+        try:
+            title = await page.title()
+        except Exception:
+            title = ""
+        return DOMState(
+            element_tree=DOMElementNode(
+                is_visible=True,
+                tag_name="body",
+                is_interactive=False,
+                is_top_element=True
+            ),
+            selector_map={},
+            url=page.url,
+            title=title
+        )
+
+    def diff_elements(self, page: Page, url: str, elements: str, interactive_elements: List[Dict[str, Any]]) -> Optional[tuple]:
+        """Diff a fresh element scan against the page's previous one.
+        
+        The new scan always becomes the page's snapshot. Returns a tuple of
+        (elements, interactive_elements, dom_diff) restricted to what changed, or
+        None when a full dump should be sent instead: no previous snapshot, the
+        page navigated, or the change is too large to be worth diffing.
+        """
+        current = {info['index']: info for info in interactive_elements}
+        previous = self.element_snapshots.get(page)
+        self.element_snapshots[page] = (url, current)
+        if previous is None or previous[0] != url:
+            return None
+        
+        # Viewport membership changes on every scroll; the screenshot already shows it
+        def comparable(info):
+            return {k: v for k, v in info.items() if k != 'is_in_viewport'}
+        
+        previous_elements = previous[1]
+        added = sorted(idx for idx in current if idx not in previous_elements)
+        removed = sorted(idx for idx in previous_elements if idx not in current)
+        changed = sorted(
+            idx for idx in current
+            if idx in previous_elements and comparable(current[idx]) != comparable(previous_elements[idx])
+        )
+        if len(added) + len(removed) + len(changed) > DOM_DIFF_MAX_RATIO * max(len(current), 1):
+            return None
+        
+        touched = set(added) | set(changed)
+        lines = []
+        for line in elements.splitlines():
+            match = re.match(r'\[(\d+)\]<', line)
+            if match and int(match.group(1)) in touched:
+                lines.append(line)
+        
+        if touched or removed:
+            summary = (f"{len(current)} elements; {len(added)} added, {len(removed)} removed, "
+                       f"{len(changed)} changed since the previous action")
+        else:
+            summary = f"{len(current)} elements; no changes since the previous action"
+        dom_diff = {'added': added, 'removed': removed, 'changed': changed, 'summary': summary}
+        return '\n'.join(lines), [current[idx] for idx in sorted(touched)], dom_diff
+
     async def get_updated_browser_state(self, action_name: str) -> tuple:
         """Helper method to get updated browser state after any action
         Returns a tuple of (dom_state, screenshot, elements, metadata)
+        
+        Only the state the request's detail level asks for is captured.
         """
         try:
-            # Wait a moment for any potential async processes to settle
-            await asyncio.sleep(0.5)
+            detail = current_options().detail
+            scan_dom = detail in ("dom", "full")
+            capture_screenshot = detail in ("screenshot", "full")
+            metadata = {'detail': detail}
+            
+            # Wait for the DOM to go quiet instead of a fixed sleep or networkidle
+            metadata['settle'] = await self.settler.settle(await self.get_current_page())
+            
+            if detail == "none":
+                dom_state = await self.get_light_dom_state()
+                print(f"Got url-only state after {action_name}")
+                return dom_state, "", "", metadata
             
             # Get updated state
-            dom_state = await self.get_current_dom_state()
-            screenshot = await self.take_screenshot()
+            dom_state = await self.get_current_dom_state() if scan_dom else await self.get_light_dom_state()
+            screenshot = await self.take_screenshot() if capture_screenshot else ""
+            if screenshot:
+                # Exact, not perceptual: typed text or a ticked checkbox must count as a change
+                metadata['screenshot_hash'] = hashlib.sha256(base64.b64decode(screenshot)).hexdigest()
+            
+            if not scan_dom:
+                # Extract OCR text from screenshot only when the request asks for it
+                if screenshot and current_options().ocr:
+                    metadata['ocr_text'] = await self.extract_ocr_text_from_screenshot(screenshot)
+                print(f"Got screenshot-only state after {action_name}")
+                return dom_state, screenshot, "", metadata
             
             # Format elements for output
             elements = dom_state.element_tree.clickable_elements_to_string(
@@ -700,7 +1508,6 @@ class BrowserAutomation:
             
             # Collect additional metadata
             page = await self.get_current_page()
-            metadata = {}
             
             # Get element count
             metadata['element_count'] = len(dom_state.selector_map)
@@ -723,6 +1530,12 @@ class BrowserAutomation:
                 interactive_elements.append(element_info)
             
             metadata['interactive_elements'] = interactive_elements
+            metadata['dom_mode'] = "full"
+            
+            diff = self.diff_elements(page, dom_state.url, elements, interactive_elements)
+            if diff is not None and current_options().dom_mode == "diff":
+                elements, metadata['interactive_elements'], metadata['dom_diff'] = diff
+                metadata['dom_mode'] = "diff"
             
             # Get viewport dimensions - Fix syntax error in JavaScript
             try:
@@ -741,11 +1554,9 @@ class BrowserAutomation:
                 metadata['viewport_width'] = 0
                 metadata['viewport_height'] = 0
             
-            # Extract OCR text from screenshot if available
-            ocr_text = ""
-            if screenshot:
-                ocr_text = await self.extract_ocr_text_from_screenshot(screenshot)
-                metadata['ocr_text'] = ocr_text
+            # Extract OCR text from screenshot only when the request asks for it
+            if screenshot and current_options().ocr:
+                metadata['ocr_text'] = await self.extract_ocr_text_from_screenshot(screenshot)
             
             print(f"Got updated state after {action_name}: {len(dom_state.selector_map)} elements")
             return dom_state, screenshot, elements, metadata
@@ -755,6 +1566,24 @@ class BrowserAutomation:
             # Return empty values in case of error
             return None, "", "", {}
 
+    def store_screenshot(self, screenshot: str, mime_type: str) -> str:
+        """Keep a base64 screenshot for binary retrieval and return its content-addressed id"""
+        image_bytes = base64.b64decode(screenshot)
+        screenshot_id = hashlib.sha256(image_bytes).hexdigest()[:16]
+        self.screenshots[screenshot_id] = (image_bytes, mime_type)
+        self.screenshots.move_to_end(screenshot_id)
+        while len(self.screenshots) > SCREENSHOT_CACHE_SIZE:
+            self.screenshots.popitem(last=False)
+        return screenshot_id
+
+    async def get_screenshot(self, screenshot_id: str):
+        """Return a stored screenshot as binary"""
+        stored = self.screenshots.get(screenshot_id)
+        if stored is None:
+            raise HTTPException(status_code=404, detail="Screenshot not found")
+        image_bytes, mime_type = stored
+        return Response(content=image_bytes, media_type=mime_type)
+
     def build_action_result(self, success: bool, message: str, dom_state, screenshot: str, 
                               elements: str, metadata: dict, error: str = "", content: str = None,
                               fallback_url: str = None) -> BrowserActionResult:
@@ -762,6 +1591,12 @@ class BrowserAutomation:
         # Ensure elements is never None to avoid display issues
         if elements is None:
             elements = ""
+        
+        screenshot_id = None
+        screenshot_mime = SCREENSHOT_FORMATS[current_options().screenshot_format] if screenshot else None
+        if screenshot and current_options().screenshot_mode == "ref":
+            screenshot_id = self.store_screenshot(screenshot, screenshot_mime)
+            screenshot = None
             
         return BrowserActionResult(
             success=success,
@@ -771,10 +1606,16 @@ class BrowserAutomation:
             title=dom_state.title if dom_state else "",
             elements=elements,
             screenshot_base64=screenshot,
+            screenshot_id=screenshot_id,
+            screenshot_mime=screenshot_mime,
+            screenshot_hash=metadata.get('screenshot_hash'),
             pixels_above=dom_state.pixels_above if dom_state else 0,
             pixels_below=dom_state.pixels_below if dom_state else 0,
             content=content,
             ocr_text=metadata.get('ocr_text', ""),
+            detail=metadata.get('detail', current_options().detail),
+            dom_mode=metadata.get('dom_mode'),
+            dom_diff=metadata.get('dom_diff'),
             element_count=metadata.get('element_count', 0),
             interactive_elements=metadata.get('interactive_elements', []),
             viewport_width=metadata.get('viewport_width', 0),
@@ -787,8 +1628,8 @@ class BrowserAutomation:
         """Navigate to a specified URL"""
         try:
             page = await self.get_current_page()
+            await self.apply_navigation_profile(page, action.resource_profile)
             await page.goto(action.url, wait_until="domcontentloaded")
-            await page.wait_for_load_state("networkidle", timeout=10000)
             
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"navigate_to({action.url})")
@@ -839,8 +1680,8 @@ class BrowserAutomation:
         try:
             page = await self.get_current_page()
             search_url = f"https://www.google.com/search?q={action.query}"
-            await page.goto(search_url)
-            await page.wait_for_load_state()
+            await self.apply_navigation_profile(page, action.resource_profile)
+            await page.goto(search_url, wait_until="domcontentloaded")
             
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"search_google({action.query})")
@@ -955,9 +1796,6 @@ class BrowserAutomation:
             # Perform the click at the specified coordinates
             await page.mouse.click(action.x, action.y)
             
-            # Give time for any navigation or DOM updates to occur
-            await page.wait_for_load_state("networkidle", timeout=5000)
-            
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_coordinates({action.x}, {action.y})")
             
@@ -1005,11 +1843,9 @@ class BrowserAutomation:
         try:
             page = await self.get_current_page()
             
-            # Get the current state and selector map *before* the click
-            initial_dom_state = await self.get_current_dom_state()
-            selector_map = initial_dom_state.selector_map
+            target_element_handle, element_to_click = await self.get_element(action.index)
             
-            if action.index not in selector_map:
+            if element_to_click is None:
                 # Get updated state even if element not found initially
                 dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_element_error (index {action.index} not found)")
                 return self.build_action_result(
@@ -1022,39 +1858,12 @@ class BrowserAutomation:
                     error=f"Element with index {action.index} not found"
                 )
 
-            element_to_click = selector_map[action.index]
             print(f"Attempting to click element: {element_to_click}")
 
-            # Construct a more reliable selector using JavaScript evaluation
-            # Find the element based on its properties captured in selector_map
-            js_selector_script = """
-            (targetElementInfo) => {
-                const interactiveElements = Array.from(document.querySelectorAll(
-                    'a, button, input, select, textarea, [role="button"], [role="link"], [role="checkbox"], [role="radio"], [tabindex]:not([tabindex="-1"])'
-                ));
-                
-                const visibleElements = interactiveElements.filter(el => {
-                    const style = window.getComputedStyle(el);
-                    const rect = el.getBoundingClientRect();
-                    return style.display !== 'none' && style.visibility !== 'hidden' && style.opacity !== '0' && rect.width > 0 && rect.height > 0;
-                });
-
-                if (targetElementInfo.index > 0 && targetElementInfo.index <= visibleElements.length) {
-                    // Return the element at the specified index (1-based)
-                    return visibleElements[targetElementInfo.index - 1];
-                }
-                return null; // Element not found at the expected index
-            }
-            """
-            
-            element_info = {'index': action.index} # Pass the target index to the script
-            
-            target_element_handle = await page.evaluate_handle(js_selector_script, element_info)
-
             click_success = False
             error_message = ""
 
-            if await target_element_handle.evaluate("node => node !== null"):
+            if target_element_handle is not None:
                 try:
                     # Use Playwright's recommended way: click the handle
                     # Add timeout and wait for element to be stable
@@ -1067,17 +1876,10 @@ class BrowserAutomation:
                     # Optional: Add fallback methods here if needed
                     # e.g., target_element_handle.dispatch_event('click')
             else:
-                 error_message = f"Could not locate the target element handle for index {action.index} using JS script."
+                 error_message = f"Could not locate the target element handle for index {action.index}."
                  print(error_message)
 
 
-            # Wait for potential page changes/network activity
-            try:
-                await page.wait_for_load_state("networkidle", timeout=5000)
-            except Exception as wait_error:
-                print(f"Timeout or error waiting for network idle after click: {wait_error}")
-                await asyncio.sleep(1) # Fallback wait
-
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"click_element({action.index})")
 
@@ -1130,10 +1932,9 @@ class BrowserAutomation:
     async def input_text(self, action: InputTextAction = Body(...)):
         """Input text into an element"""
         try:
-            page = await self.get_current_page()
-            selector_map = await self.get_selector_map()
+            handle, element = await self.get_element(action.index)
             
-            if action.index not in selector_map:
+            if handle is None:
                 return self.build_action_result(
                     False,
                     f"Element with index {action.index} not found",
@@ -1144,22 +1945,7 @@ class BrowserAutomation:
                     error=f"Element with index {action.index} not found"
                 )
             
-            # In a real implementation, we would use the selector map to get the element's
-            # properties and use them to find and type into the element
-            element = selector_map[action.index]
-            
-            # Use CSS selector or XPath to locate and type into the element
-            await page.wait_for_timeout(500)  # Small delay before typing
-            
-            # Demo implementation - would use proper selectors in production
-            if element.attributes.get("id"):
-                await page.fill(f"#{element.attributes['id']}", action.text)
-            elif element.attributes.get("class"):
-                class_selector = f".{element.attributes['class'].replace(' ', '.')}"
-                await page.fill(class_selector, action.text)
-            else:
-                # Fallback to xpath
-                await page.fill(f"//{element.tag_name}[{action.index}]", action.text)
+            await handle.fill(action.text)
             
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"input_text({action.index}, '{action.text}')")
@@ -1267,12 +2053,12 @@ class BrowserAutomation:
         try:
             print(f"Attempting to open new tab with URL: {action.url}")
             # Create new page in same browser instance
-            new_page = await self.browser.new_page()
+            new_page = await self.session.context.new_page()
             print(f"New page created successfully")
             
             # Navigate to the URL
+            await self.apply_navigation_profile(new_page, action.resource_profile)
             await new_page.goto(action.url, wait_until="domcontentloaded")
-            await new_page.wait_for_load_state("networkidle", timeout=10000)
             print(f"Navigated to URL in new tab: {action.url}")
             
             # Add to page list and make it current
@@ -1458,8 +2244,6 @@ class BrowserAutomation:
                 await page.evaluate("window.scrollBy(0, window.innerHeight);")
                 amount_str = "one page"
             
-            await page.wait_for_timeout(500)  # Wait for scroll to complete
-            
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"scroll_down({amount_str})")
             
@@ -1496,8 +2280,6 @@ class BrowserAutomation:
                 await page.evaluate("window.scrollBy(0, -window.innerHeight);")
                 amount_str = "one page"
             
-            await page.wait_for_timeout(500)  # Wait for scroll to complete
-            
             # Get updated state after action
             dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"scroll_up({amount_str})")
             
@@ -1538,7 +2320,6 @@ class BrowserAutomation:
                 try:
                     if await locator.count() > 0 and await locator.first.is_visible():
                         await locator.first.scroll_into_view_if_needed()
-                        await asyncio.sleep(0.5)  # Wait for scroll to complete
                         found = True
                         break
                 except Exception:
@@ -1577,9 +2358,9 @@ class BrowserAutomation:
         """Get all options from a dropdown"""
         try:
             page = await self.get_current_page()
-            selector_map = await self.get_selector_map()
+            handle, element = await self.get_element(index)
             
-            if index not in selector_map:
+            if handle is None:
                 return self.build_action_result(
                     False,
                     f"Element with index {index} not found",
@@ -1590,26 +2371,23 @@ class BrowserAutomation:
                     error=f"Element with index {index} not found"
                 )
             
-            element = selector_map[index]
             options = []
             
             # Try to get the options - in a real implementation, we would use appropriate selectors
             try:
                 if element.tag_name.lower() == 'select':
                     # For <select> elements, get options using JavaScript
-                    options_js = f"""
-                    Array.from(document.querySelectorAll('select')[{index-1}].options)
-                        .map((option, index) => ({
-                            index: index,
-                            text: option.text,
-                            value: option.value
-                        }));
-                    """
-                    options = await page.evaluate(options_js)
+                    options = await handle.evaluate("""
+                    select => Array.from(select.options).map((option, index) => ({
+                        index: index,
+                        text: option.text,
+                        value: option.value
+                    }))
+                    """)
                 else:
                     # For other dropdown types, try to get options using a more generic approach
                     # Example for custom dropdowns - would need refinement in real implementation
-                    await page.click(f"#{element.attributes.get('id')}") if element.attributes.get('id') else None
+                    await handle.click()
                     await page.wait_for_timeout(500)
                     
                     options_js = """
@@ -1629,7 +2407,7 @@ class BrowserAutomation:
                     # Close dropdown to restore state
                     await page.keyboard.press("Escape")
             except Exception as e:
-                self.logger.error(f"Error getting dropdown options: {e}")
+                print(f"Error getting dropdown options: {e}")
                 # Fallback to dummy options if real ones cannot be retrieved
                 options = [
                     {"index": 0, "text": "Option 1", "value": "option1"},
@@ -1666,9 +2444,9 @@ class BrowserAutomation:
         """Select an option from a dropdown by text"""
         try:
             page = await self.get_current_page()
-            selector_map = await self.get_selector_map()
+            handle, element = await self.get_element(index)
             
-            if index not in selector_map:
+            if handle is None:
                 return self.build_action_result(
                     False,
                     f"Element with index {index} not found",
@@ -1679,23 +2457,14 @@ class BrowserAutomation:
                     error=f"Element with index {index} not found"
                 )
             
-            element = selector_map[index]
-            
             # Try to select the option - implementation varies by dropdown type
             if element.tag_name.lower() == 'select':
                 # For standard <select> elements
-                selector = f"select option:has-text('{option_text}')"
-                await page.select_option(
-                    f"#{element.attributes.get('id')}" if element.attributes.get('id') else f"//select[{index}]", 
-                    label=option_text
-                )
+                await handle.select_option(label=option_text)
             else:
                 # For custom dropdowns
                 # First click to open the dropdown
-                if element.attributes.get('id'):
-                    await page.click(f"#{element.attributes.get('id')}")
-                else:
-                    await page.click(f"//{element.tag_name}[{index}]")
+                await handle.click()
                 
                 await page.wait_for_timeout(500)
                 
@@ -1729,6 +2498,62 @@ class BrowserAutomation:
                 content=None
             )
     
+    # Batches
+    
+    async def batch(self, action: BatchAction = Body(...)):
+        """Run a sequence of actions back to back and return one final state.
+        
+        Steps run with detail "none", so each only settles the page. Each step's
+        success, message and error are returned in steps; with stop_on_error the
+        steps after the first failure are skipped.
+        """
+        options = current_options()
+        steps = []
+        failed = False
+        token = _action_options.set(options.model_copy(update={"detail": "none", "screenshot_mode": "inline"}))
+        try:
+            for position, step in enumerate(action.steps):
+                if failed and action.stop_on_error:
+                    steps.append({"step": position, "action": step.action, "status": "skipped"})
+                    continue
+                try:
+                    model = BATCH_STEP_ACTIONS[step.action]
+                except KeyError:
+                    result = BrowserActionResult(success=False, error=f"Unsupported batch action {step.action}; "
+                                                 f"use one of {', '.join(BATCH_STEP_ACTIONS)}")
+                else:
+                    try:
+                        handler = getattr(self, step.action)
+                        result = await (handler(model(**step.params)) if model else handler(**step.params))
+                    except Exception as e:
+                        result = BrowserActionResult(success=False, error=str(e))
+                
+                steps.append({
+                    "step": position,
+                    "action": step.action,
+                    "status": "ok" if result.success else "failed",
+                    "message": result.message,
+                    "error": result.error
+                })
+                failed = failed or not result.success
+        finally:
+            _action_options.reset(token)
+        
+        completed = sum(1 for step in steps if step["status"] == "ok")
+        dom_state, screenshot, elements, metadata = await self.get_updated_browser_state(f"batch({len(action.steps)} steps)")
+        result = self.build_action_result(
+            not failed,
+            f"Completed {completed} of {len(action.steps)} batch steps",
+            dom_state,
+            screenshot,
+            elements,
+            metadata,
+            error=next((step["error"] for step in steps if step["status"] == "failed"), ""),
+            content=None
+        )
+        result.steps = steps
+        return result
+    
     # Drag and Drop
     
     async def drag_drop(self, action: DragDropAction = Body(...)):
@@ -1836,6 +2661,9 @@ async def test_browser_api():
         await automation_service.startup()
         print("✅ Browser started successfully")
 
+        # OCR is opt-in per request; the test prints it
+        _action_options.set(ActionOptions(ocr=True))
+
         # Navigate to a test page with interactive elements
         print("\n--- Testing Navigation ---")
         result = await automation_service.navigate_to(GoToUrlAction(url="https://www.youtube.com"))
@@ -2068,6 +2896,48 @@ async def test_browser_api_2():
         await automation_service.shutdown()
         print("Browser closed")
 
+def build_synthetic_dom(element_count: int, seed: int = 0) -> DOMElementNode:
+    """Random page-like tree with element_count elements, a quarter of them highlighted"""
+    rng = random.Random(seed)
+    tags = ["div", "span", "a", "button", "input", "li", "p"]
+    root = DOMElementNode(is_visible=True, tag_name="body", is_top_element=True)
+    # Candidate parents, kept shallower than typical page nesting
+    open_elements = [(root, 0)]
+    next_index = 1
+    for i in range(element_count):
+        # Mostly attach near recent elements so siblings and subtrees form
+        parent, depth = open_elements[max(0, len(open_elements) - 1 - int(rng.expovariate(0.2)))]
+        element = DOMElementNode(
+            is_visible=True,
+            tag_name=rng.choice(tags),
+            attributes={"id": f"el-{i}", "class": "item"} if rng.random() < 0.3 else {},
+            parent=parent
+        )
+        if rng.random() < 0.25:
+            element.highlight_index = next_index
+            element.is_interactive = True
+            next_index += 1
+        text = DOMTextNode(is_visible=True, text=f"text {i}", parent=element)
+        element.children.append(text)
+        parent.children.append(element)
+        if depth + 1 < 30:
+            open_elements.append((element, depth + 1))
+    return root
+
+def bench_dom_serialization(sizes=(5000, 10000, 20000), repeat: int = 5):
+    """Time clickable_elements_to_string on synthetic pages"""
+    import time
+    include_attributes = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
+    for size in sizes:
+        root = build_synthetic_dom(size)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = root.clickable_elements_to_string(include_attributes=include_attributes)
+            timings.append(time.perf_counter() - started)
+        print(f"{size:>6} elements: best {min(timings) * 1000:.1f} ms, "
+              f"median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms, {len(output)} chars")
+
 if __name__ == '__main__':
     import uvicorn
     import sys
@@ -2075,8 +2945,12 @@ if __name__ == '__main__':
     # Check command line arguments for test mode
     test_mode_1 = "--test" in sys.argv
     test_mode_2 = "--test2" in sys.argv
+    bench_mode = "--bench" in sys.argv
     
-    if test_mode_1:
+    if bench_mode:
+        print("Benchmarking DOM serialization")
+        bench_dom_serialization()
+    elif test_mode_1:
         print("Running in test mode 1")
         asyncio.run(test_browser_api())
     elif test_mode_2:
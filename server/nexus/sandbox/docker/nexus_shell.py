@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Shell session helper used by the agent's shell tool.
+
+Every subcommand does its whole job in one invocation and prints a single JSON
+object, so the agent needs one remote call per shell operation:
+
+    nexus-shell run  --session S --cwd DIR --command BASE64 [--wait SECONDS]
+    nexus-shell read --session S [--offset BYTES] [--kill]
+    nexus-shell kill --session S
+    nexus-shell list
+
+Sessions are tmux sessions whose pane output is appended to a log file, so
+reads can resume from a byte offset instead of re-capturing the scrollback.
+Waited commands write their output to files in a per-run directory instead;
+runs that outlive their wait are reported by read until they have exited.
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import uuid
+
+RUN_DIR = "/tmp/nexus_commands"
+HEAD_BYTES = 4000
+TAIL_BYTES = 12000
+
+# tmux reads "." and ":" in a target as window/pane separators, so session names stay to these characters
+SESSION_NAME_RE = re.compile(r'[A-Za-z0-9_-]+')
+
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07]*\x07|\x1b[@-Z\\-_]')
+
+
+def tmux(*args, timeout=None):
+    return subprocess.run(["tmux", *args], capture_output=True, text=True, timeout=timeout)
+
+
+def session_name(value):
+    """Validate a session name before it is used in tmux targets and file paths"""
+    if not SESSION_NAME_RE.fullmatch(value):
+        raise ValueError(f"Invalid session name {value!r}: use letters, digits, '_' and '-'")
+    return value
+
+
+def session_exists(session):
+    return tmux("has-session", "-t", session_name(session)).returncode == 0
+
+
+def log_path(session):
+    return os.path.join(RUN_DIR, f"{session_name(session)}.log")
+
+
+def runs_dir(session):
+    """Directory holding one subdirectory per waited command of the session"""
+    return os.path.join(RUN_DIR, "runs", session_name(session))
+
+
+def ensure_session(session):
+    """Create the session with its output log if it does not exist. Returns True if created."""
+    if session_exists(session):
+        return False
+    os.makedirs(RUN_DIR, exist_ok=True)
+    tmux("new-session", "-d", "-s", session)
+    tmux("pipe-pane", "-o", "-t", session, f"cat >> {shlex.quote(log_path(session))}")
+    return True
+
+
+def kill_session(session):
+    existed = session_exists(session)
+    if existed:
+        tmux("kill-session", "-t", session)
+    try:
+        os.remove(log_path(session))
+    except OSError:
+        pass
+    shutil.rmtree(runs_dir(session), ignore_errors=True)
+    return existed
+
+
+def clean_output(text):
+    text = ANSI_ESCAPE_RE.sub('', text)
+    return text.replace('\r\n', '\n').replace('\r', '')
+
+
+def read_window(path, offset=0, head=HEAD_BYTES, tail=TAIL_BYTES):
+    """Read a file from offset, keeping only head and tail windows of large output."""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return {"output": "", "total_size": -1, "omitted_bytes": 0}
+
+    if size < offset:
+        # The file was truncated or recreated since the last read
+        offset = 0
+
+    remaining = size - offset
+    omitted = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        if remaining <= head + tail:
+            text = f.read(remaining).decode(errors='replace')
+        else:
+            head_text = f.read(head).decode(errors='replace')
+            f.seek(size - tail)
+            tail_text = f.read(tail).decode(errors='replace')
+            omitted = remaining - head - tail
+            text = f"{head_text}\n\n... [{omitted} bytes omitted] ...\n\n{tail_text}"
+
+    return {"output": clean_output(text), "total_size": size, "omitted_bytes": omitted}
+
+
+def read_exit_code(run_dir):
+    try:
+        with open(os.path.join(run_dir, "exit_code")) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def read_run(run_dir):
+    """Output and exit code of a waited command; the directory is removed once the command has exited."""
+    # Read the exit code first: if it is set, the output files are complete
+    exit_code = read_exit_code(run_dir)
+    stdout = read_window(os.path.join(run_dir, "stdout"))
+    stderr = read_window(os.path.join(run_dir, "stderr"))
+    if exit_code is not None:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return {
+        "run_id": os.path.basename(run_dir),
+        "stdout": stdout["output"],
+        "stderr": stderr["output"],
+        "stdout_bytes": stdout["total_size"],
+        "stderr_bytes": stderr["total_size"],
+        "exit_code": exit_code,
+        "completed": exit_code is not None,
+    }
+
+
+def cmd_run(args):
+    command = base64.b64decode(args.command).decode()
+    created = ensure_session(args.session)
+    result = {"session_name": args.session, "cwd": args.cwd, "created": created}
+
+    if args.wait is None:
+        tmux("send-keys", "-t", args.session, f"cd {shlex.quote(args.cwd)} && {command}", "Enter")
+        result["completed"] = False
+        return result
+
+    run_id = uuid.uuid4().hex[:8]
+    run_dir = os.path.join(runs_dir(args.session), run_id)
+    os.makedirs(run_dir, exist_ok=True)
+    channel = f"nexus_done_{run_id}"
+    exit_file = os.path.join(run_dir, "exit_code")
+
+    script = (
+        f"{{ cd {shlex.quote(args.cwd)} && {command}\n}} > {shlex.quote(os.path.join(run_dir, 'stdout'))} "
+        f"2> {shlex.quote(os.path.join(run_dir, 'stderr'))}; "
+        f"echo $? > {shlex.quote(exit_file)}; tmux wait-for -S {shlex.quote(channel)}"
+    )
+    tmux("send-keys", "-t", args.session, script, "Enter")
+
+    # tmux remembers a signal sent before anyone waits, so this cannot miss a fast command
+    if not os.path.exists(exit_file):
+        try:
+            tmux("wait-for", channel, timeout=args.wait)
+        except subprocess.TimeoutExpired:
+            pass
+
+    run = read_run(run_dir)
+    run.pop("run_id")
+    result.update(run)
+
+    # A command still running keeps its directory, so read can return its output later
+    if run["completed"] and args.kill_on_exit:
+        kill_session(args.session)
+    return result
+
+
+def cmd_read(args):
+    if not session_exists(args.session):
+        return {"session_name": args.session, "exists": False}
+
+    window = read_window(log_path(args.session), args.offset)
+    if window["total_size"] < 0:
+        # Session was not created by this helper, so it has no log; fall back to the pane
+        pane = tmux("capture-pane", "-t", args.session, "-p", "-S", f"-{TAIL_BYTES // 80}", "-E", "-")
+        window = {"output": clean_output(pane.stdout), "total_size": None, "omitted_bytes": 0}
+
+    result = {"session_name": args.session, "exists": True, **window}
+
+    # Waited commands that outlived their wait write to their run directory, not the pane
+    try:
+        run_ids = sorted(os.listdir(runs_dir(args.session)),
+                         key=lambda run_id: os.path.getmtime(os.path.join(runs_dir(args.session), run_id)))
+    except OSError:
+        run_ids = []
+    if run_ids:
+        result["commands"] = [read_run(os.path.join(runs_dir(args.session), run_id)) for run_id in run_ids]
+
+    if args.kill:
+        kill_session(args.session)
+    result["killed"] = args.kill
+    return result
+
+
+def cmd_kill(args):
+    return {"session_name": args.session, "exists": kill_session(args.session)}
+
+
+def cmd_list(args):
+    listing = tmux("list-sessions", "-F", "#{session_name}")
+    sessions = [line.strip() for line in listing.stdout.splitlines() if line.strip()] if listing.returncode == 0 else []
+    return {"sessions": sessions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tmux session helper for the agent shell tool")
+    subparsers = parser.add_subparsers(dest="subcommand", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Send a command to a session, creating it if needed")
+    run_parser.add_argument("--session", required=True)
+    run_parser.add_argument("--cwd", required=True)
+    run_parser.add_argument("--command", required=True, help="Base64-encoded command")
+    run_parser.add_argument("--wait", type=int, default=None, help="Wait up to this many seconds for the command to exit")
+    run_parser.add_argument("--kill-on-exit", action="store_true", help="Kill the session once a waited command exits")
+    run_parser.set_defaults(func=cmd_run)
+
+    read_parser = subparsers.add_parser("read", help="Read session output written since a byte offset")
+    read_parser.add_argument("--session", required=True)
+    read_parser.add_argument("--offset", type=int, default=0)
+    read_parser.add_argument("--kill", action="store_true")
+    read_parser.set_defaults(func=cmd_read)
+
+    kill_parser = subparsers.add_parser("kill", help="Kill a session and drop its log")
+    kill_parser.add_argument("--session", required=True)
+    kill_parser.set_defaults(func=cmd_kill)
+
+    list_parser = subparsers.add_parser("list", help="List tmux sessions")
+    list_parser.set_defaults(func=cmd_list)
+
+    args = parser.parse_args()
+    try:
+        result = args.func(args)
+    except Exception as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import random
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("playwright")
+
+import browser_api
+
+
+def test_app_builds_openapi_schema():
+    schema = browser_api.api_app.openapi()
+    paths = schema["paths"]
+    assert "/api/automation/navigate_to" in paths
+    assert "/api/automation/contexts/{name}" in paths
+
+
+def test_context_id_is_a_query_parameter_on_actions():
+    schema = browser_api.api_app.openapi()
+    parameters = schema["paths"]["/api/automation/click_element"]["post"]["parameters"]
+    assert {"name": "context_id", "in": "query"}.items() <= next(
+        p for p in parameters if p["name"] == "context_id").items()
+
+
+INCLUDE_ATTRIBUTES = ["id", "href", "src", "alt", "aria-label", "placeholder", "name", "role", "title", "value"]
+
+
+def reference_elements_to_string(root, include_attributes):
+    """The recursive serializer clickable_elements_to_string replaced, kept to check the output is unchanged"""
+    def text_till_next_clickable(element):
+        parts = []
+
+        def collect(node):
+            if isinstance(node, browser_api.DOMElementNode) and node is not element and node.highlight_index is not None:
+                return
+            if isinstance(node, browser_api.DOMTextNode):
+                parts.append(node.text)
+            else:
+                for child in node.children:
+                    collect(child)
+
+        collect(element)
+        return '\n'.join(parts).strip()
+
+    formatted_text = []
+
+    def process_node(node):
+        if isinstance(node, browser_api.DOMElementNode):
+            if node.highlight_index is not None:
+                text = text_till_next_clickable(node)
+                display_attributes = []
+                for key, value in node.attributes.items():
+                    if key in include_attributes and value and value != node.tag_name:
+                        if text and value in text:
+                            continue
+                        display_attributes.append(str(value))
+                attributes_str = ';'.join(display_attributes)
+
+                line = f'[{node.highlight_index}]<{node.tag_name}'
+                for attr_name in ['id', 'href', 'name', 'value', 'type']:
+                    if attr_name in node.attributes and node.attributes[attr_name]:
+                        line += f' {attr_name}="{node.attributes[attr_name]}"'
+                if text:
+                    line += f'> {text}'
+                elif attributes_str:
+                    line += f'> {attributes_str}'
+                else:
+                    line += f'> {node.tag_name.upper()}'
+                formatted_text.append(line + ' </>')
+            for child in node.children:
+                process_node(child)
+        elif not node.has_parent_with_highlight_index() and node.is_visible:
+            if node.text and node.text.strip():
+                formatted_text.append(node.text)
+
+    process_node(root)
+    result = '\n'.join(formatted_text)
+    return result if result.strip() else "No interactive elements found"
+
+
+def build_varied_dom(element_count, seed):
+    """Random tree with invisible and blank text, attributes that repeat the text, and deep highlighted nesting"""
+    rng = random.Random(seed)
+    root = browser_api.DOMElementNode(is_visible=True, tag_name="body")
+    elements = [root]
+    for i in range(element_count):
+        parent = rng.choice(elements[-20:])
+        attributes = {}
+        if rng.random() < 0.4:
+            attributes[rng.choice(["id", "title", "aria-label", "name", "href", "type", "class"])] = rng.choice(
+                [f"text {i}", "button", f"attr {i}", ""])
+        element = browser_api.DOMElementNode(is_visible=rng.random() < 0.9, tag_name=rng.choice(["div", "a", "button"]),
+                                             attributes=attributes, parent=parent)
+        if rng.random() < 0.3:
+            element.highlight_index = i + 1
+        parent.children.append(element)
+        elements.append(element)
+        for _ in range(rng.randint(0, 2)):
+            text = browser_api.DOMTextNode(is_visible=rng.random() < 0.8, text=rng.choice([f"text {i}", "  ", ""]),
+                                           parent=element)
+            element.children.append(text)
+    return root, elements
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_serializer_matches_reference_on_synthetic_pages(seed):
+    root = browser_api.build_synthetic_dom(2000, seed=seed)
+    assert root.clickable_elements_to_string(INCLUDE_ATTRIBUTES) == reference_elements_to_string(root, INCLUDE_ATTRIBUTES)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_serializer_matches_reference_on_varied_trees_and_subtrees(seed):
+    root, elements = build_varied_dom(300, seed)
+    assert root.clickable_elements_to_string(INCLUDE_ATTRIBUTES) == reference_elements_to_string(root, INCLUDE_ATTRIBUTES)
+    assert root.clickable_elements_to_string() == reference_elements_to_string(root, [])
+    # Subtrees, including ones below a highlighted ancestor
+    for element in random.Random(seed).sample(elements, 20):
+        assert element.clickable_elements_to_string(INCLUDE_ATTRIBUTES) == \
+            reference_elements_to_string(element, INCLUDE_ATTRIBUTES)
+
+
+def test_serializer_without_elements():
+    root = browser_api.DOMElementNode(is_visible=True, tag_name="body")
+    assert root.clickable_elements_to_string() == "No interactive elements found"
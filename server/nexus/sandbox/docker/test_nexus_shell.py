@@ -0,0 +1,130 @@
+import base64
+import os
+import shutil
+import time
+import uuid
+from argparse import Namespace
+
+import pytest
+
+import nexus_shell
+
+pytestmark = pytest.mark.skipif(shutil.which("tmux") is None, reason="tmux is not installed")
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(nexus_shell, "RUN_DIR", str(tmp_path))
+    name = f"test_{uuid.uuid4().hex[:8]}"
+    yield name
+    nexus_shell.kill_session(name)
+
+
+def run(session, command, cwd, wait=None, kill_on_exit=False):
+    return nexus_shell.cmd_run(Namespace(session=session, cwd=str(cwd), wait=wait, kill_on_exit=kill_on_exit,
+                                         command=base64.b64encode(command.encode()).decode()))
+
+
+def read(session, offset=0, kill=False):
+    return nexus_shell.cmd_read(Namespace(session=session, offset=offset, kill=kill))
+
+
+def test_waited_command_returns_output_and_exit_code(session, tmp_path):
+    result = run(session, "echo out; echo err >&2; sh -c 'exit 3'", tmp_path, wait=10)
+
+    assert result["completed"]
+    assert result["exit_code"] == 3
+    assert result["stdout"] == "out\n"
+    assert result["stderr"] == "err\n"
+    assert os.listdir(nexus_shell.runs_dir(session)) == []
+
+
+def test_waited_command_kills_session_on_exit(session, tmp_path):
+    result = run(session, "true", tmp_path, wait=10, kill_on_exit=True)
+
+    assert result["completed"]
+    assert not nexus_shell.session_exists(session)
+    assert not os.path.exists(nexus_shell.runs_dir(session))
+
+
+def test_timed_out_command_output_is_readable_later(session, tmp_path):
+    result = run(session, "echo started; sleep 3; echo finished", tmp_path, wait=1, kill_on_exit=True)
+    assert not result["completed"]
+    assert nexus_shell.session_exists(session)
+
+    deadline = time.monotonic() + 10
+    while True:
+        running = read(session)["commands"]
+        if running[0]["stdout"] or time.monotonic() > deadline:
+            break
+        time.sleep(0.2)
+    assert len(running) == 1
+    assert running[0]["stdout"] == "started\n"
+    assert not running[0]["completed"]
+
+    deadline = time.monotonic() + 10
+    while True:
+        commands = read(session)["commands"]
+        if commands[0]["completed"] or time.monotonic() > deadline:
+            break
+        time.sleep(0.2)
+    assert commands[0]["exit_code"] == 0
+    assert commands[0]["stdout"] == "started\nfinished\n"
+
+    # The run directory is removed once its final output has been read
+    assert "commands" not in read(session)
+
+
+def test_kill_removes_runs_of_unfinished_commands(session, tmp_path):
+    run(session, "sleep 30", tmp_path, wait=0)
+    assert os.listdir(nexus_shell.runs_dir(session))
+
+    result = read(session, kill=True)
+
+    assert result["killed"]
+    assert not nexus_shell.session_exists(session)
+    assert not os.path.exists(nexus_shell.runs_dir(session))
+
+
+def test_read_resumes_from_offset(session, tmp_path):
+    run(session, "echo first-marker", tmp_path)
+    deadline = time.monotonic() + 10
+    while "first-marker\n" not in read(session)["output"] and time.monotonic() < deadline:
+        time.sleep(0.2)
+    first = read(session)
+    assert "first-marker\n" in first["output"]
+
+    run(session, "echo second-marker", tmp_path)
+    deadline = time.monotonic() + 10
+    while "second-marker\n" not in read(session, first["total_size"])["output"] and time.monotonic() < deadline:
+        time.sleep(0.2)
+    second = read(session, first["total_size"])
+
+    assert "second-marker\n" in second["output"]
+    assert "first-marker" not in second["output"]
+
+
+def test_read_of_missing_session(session):
+    assert read(session) == {"session_name": session, "exists": False}
+
+
+@pytest.mark.parametrize("name", ["../escape", "two words", "a;rm -rf x", "win.pane", ""])
+def test_invalid_session_names_are_rejected(name, tmp_path, monkeypatch):
+    monkeypatch.setattr(nexus_shell, "RUN_DIR", str(tmp_path))
+
+    with pytest.raises(ValueError):
+        run(name, "true", tmp_path, wait=1)
+    with pytest.raises(ValueError):
+        read(name)
+    assert os.listdir(tmp_path) == []
+
+
+def test_run_directory_with_spaces(session, tmp_path, monkeypatch):
+    run_dir = tmp_path / "run dir $(touch pwned)"
+    monkeypatch.setattr(nexus_shell, "RUN_DIR", str(run_dir))
+
+    result = run(session, "echo out", tmp_path, wait=10)
+
+    assert result["completed"]
+    assert result["stdout"] == "out\n"
+    assert not (tmp_path / "pwned").exists()
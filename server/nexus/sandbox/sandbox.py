@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 from utils.logger import logger
 from utils.config import config
 from utils.config import Configuration
+from sandbox.async_sandbox import run_blocking
 
 load_dotenv()
 
@@ -32,26 +33,29 @@ else:
 daytona = Daytona(daytona_config)
 logger.debug("Daytona client initialized")
 
+# Seconds to wait for a stopped or archived sandbox to start
+SANDBOX_START_TIMEOUT = 300
+
 async def get_or_start_sandbox(sandbox_id: str):
     """Retrieve a sandbox by ID, check its state, and start it if needed."""
     
     logger.info(f"Getting or starting sandbox with ID: {sandbox_id}")
     
     try:
-        sandbox = daytona.get_current_sandbox(sandbox_id)
+        sandbox = await run_blocking(daytona.get_current_sandbox, sandbox_id)
         
         # Check if sandbox needs to be started
         if sandbox.instance.state == WorkspaceState.ARCHIVED or sandbox.instance.state == WorkspaceState.STOPPED:
             logger.info(f"Sandbox is in {sandbox.instance.state} state. Starting...")
             try:
-                daytona.start(sandbox)
+                await run_blocking(daytona.start, sandbox, call_timeout=SANDBOX_START_TIMEOUT)
                 # Wait a moment for the sandbox to initialize
                 # sleep(5)
                 # Refresh sandbox state after starting
-                sandbox = daytona.get_current_sandbox(sandbox_id)
+                sandbox = await run_blocking(daytona.get_current_sandbox, sandbox_id)
                 
                 # Start supervisord in a session when restarting
-                start_supervisord_session(sandbox)
+                await run_blocking(start_supervisord_session, sandbox)
             except Exception as e:
                 logger.error(f"Error starting sandbox: {e}")
                 raise e
@@ -63,6 +67,15 @@ async def get_or_start_sandbox(sandbox_id: str):
         logger.error(f"Error retrieving or starting sandbox: {str(e)}")
         raise e
 
+async def is_sandbox_running(sandbox_id: str) -> bool:
+    """Whether Daytona reports the sandbox as started; False if it cannot be looked up."""
+    try:
+        sandbox = await run_blocking(daytona.get_current_sandbox, sandbox_id)
+    except Exception as e:
+        logger.warning(f"Could not look up state of sandbox {sandbox_id}: {e}")
+        return False
+    return sandbox.instance.state == WorkspaceState.STARTED
+
 def start_supervisord_session(sandbox: Sandbox):
     """Start supervisord in a session."""
     session_id = "supervisord-session"
@@ -101,6 +114,7 @@ def create_sandbox(password: str, project_id: str = None):
             "RESOLUTION_WIDTH": "1024",
             "RESOLUTION_HEIGHT": "768",
             "VNC_PASSWORD": password,
+            "NEXUS_BROWSER_API_TOKEN": password,
             "ANONYMIZED_TELEMETRY": "false",
             "CHROME_PATH": "",
             "CHROME_USER_DATA": "",
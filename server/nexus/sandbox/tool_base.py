@@ -1,13 +1,90 @@
 
-from typing import Optional
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
 
 from agentpress.thread_manager import ThreadManager
 from agentpress.tool import Tool
 from daytona_sdk import Sandbox
-from sandbox.sandbox import get_or_start_sandbox
+from sandbox.sandbox import get_or_start_sandbox, is_sandbox_running
+from sandbox.async_sandbox import AsyncSandbox
 from utils.logger import logger
 from utils.files_utils import clean_path
 
+# Seconds a resolved sandbox handle is reused before the project and sandbox state are looked up again
+SANDBOX_HANDLE_TTL = 300
+
+
+@dataclass
+class SandboxHandle:
+    """A started sandbox resolved from a project row."""
+    sandbox: Sandbox
+    sandbox_id: str
+    sandbox_pass: Optional[str]
+    resolved_at: float
+
+
+class SandboxHandleProvider:
+    """Per-process, TTL-bounded cache of sandbox handles keyed by project.
+
+    Resolution is single-flight: concurrent callers for the same project await
+    one projects lookup and one get_or_start_sandbox call. Failed resolutions
+    are not cached.
+    """
+
+    def __init__(self, ttl: float = SANDBOX_HANDLE_TTL):
+        self.ttl = ttl
+        self._handles: Dict[str, SandboxHandle] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get(self, client, project_id: str) -> SandboxHandle:
+        """Return the sandbox handle for a project, resolving it at most once per TTL."""
+        handle = self._handles.get(project_id)
+        if handle and time.monotonic() - handle.resolved_at < self.ttl:
+            return handle
+
+        task = self._inflight.get(project_id)
+        if task is None:
+            task = asyncio.create_task(self._resolve(client, project_id))
+            self._inflight[project_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(project_id, None))
+
+        # Shield so a cancelled caller does not cancel the resolution other callers wait on
+        return await asyncio.shield(task)
+
+    async def _resolve(self, client, project_id: str) -> SandboxHandle:
+        project = await client.table('projects').select('*').eq('project_id', project_id).execute()
+        if not project.data or len(project.data) == 0:
+            raise ValueError(f"Project {project_id} not found")
+
+        sandbox_info = project.data[0].get('sandbox', {})
+        if not sandbox_info.get('id'):
+            raise ValueError(f"No sandbox found for project {project_id}")
+
+        sandbox = await get_or_start_sandbox(sandbox_info['id'])
+        handle = SandboxHandle(
+            sandbox=sandbox,
+            sandbox_id=sandbox_info['id'],
+            sandbox_pass=sandbox_info.get('pass'),
+            resolved_at=time.monotonic()
+        )
+        self._handles[project_id] = handle
+        return handle
+
+    def invalidate(self, project_id: str, sandbox: Optional[Sandbox] = None) -> None:
+        """Drop the cached handle for a project, e.g. after the sandbox was found stopped.
+
+        With a sandbox given, the handle is only dropped while it still holds that
+        sandbox, so callers recovering from the same failure resolve it once.
+        """
+        handle = self._handles.get(project_id)
+        if handle is not None and (sandbox is None or handle.sandbox is sandbox):
+            del self._handles[project_id]
+
+
+sandbox_handles = SandboxHandleProvider()
+
 class SandboxToolsBase(Tool):
     """Base class for all sandbox tools that provides project-based sandbox access."""
     
@@ -23,54 +100,44 @@ class SandboxToolsBase(Tool):
         self._sandbox_id = None
         self._sandbox_pass = None
 
-    async def _ensure_sandbox(self) -> Sandbox:
-        """Ensure we have a valid sandbox instance, retrieving it from the project if needed."""
+    async def _ensure_sandbox(self) -> AsyncSandbox:
+        """Ensure we have a valid sandbox instance, retrieving it from the shared provider if needed."""
         if self._sandbox is None:
             try:
                 # Get database client
                 client = await self.thread_manager.db.client
-                
-                # Get project data
-                project = await client.table('projects').select('*').eq('project_id', self.project_id).execute()
-                if not project.data or len(project.data) == 0:
-                    raise ValueError(f"Project {self.project_id} not found")
-                
-                project_data = project.data[0]
-                sandbox_info = project_data.get('sandbox', {})
-                
-                if not sandbox_info.get('id'):
-                    raise ValueError(f"No sandbox found for project {self.project_id}")
-                
+
+                handle = await sandbox_handles.get(client, self.project_id)
+
                 # Store sandbox info
-                self._sandbox_id = sandbox_info['id']
-                self._sandbox_pass = sandbox_info.get('pass')
-                
-                # Get or start the sandbox
-                self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-                
-                # # Log URLs if not already printed
-                # if not SandboxToolsBase._urls_printed:
-                #     vnc_link = self._sandbox.get_preview_link(6080)
-                #     website_link = self._sandbox.get_preview_link(8080)
-                    
-                #     vnc_url = vnc_link.url if hasattr(vnc_link, 'url') else str(vnc_link)
-                #     website_url = website_link.url if hasattr(website_link, 'url') else str(website_link)
-                    
-                #     print("\033[95m***")
-                #     print(f"VNC URL: {vnc_url}")
-                #     print(f"Website URL: {website_url}")
-                #     print("***\033[0m")
-                #     SandboxToolsBase._urls_printed = True
-                
+                self._sandbox_id = handle.sandbox_id
+                self._sandbox_pass = handle.sandbox_pass
+                # Tools only talk to the sandbox through the async facade
+                self._sandbox = AsyncSandbox(handle.sandbox, recover=self._recover_sandbox)
+
             except Exception as e:
                 logger.error(f"Error retrieving sandbox for project {self.project_id}: {str(e)}", exc_info=True)
                 raise e
-        
+
         return self._sandbox
 
+    async def _recover_sandbox(self, failed: Sandbox) -> Optional[Sandbox]:
+        """After a failed call, resolve the project's sandbox again if Daytona reports it is not running.
+
+        Returns None while the sandbox is running.
+        """
+        if await is_sandbox_running(failed.id):
+            return None
+        sandbox_handles.invalidate(self.project_id, failed)
+        client = await self.thread_manager.db.client
+        handle = await sandbox_handles.get(client, self.project_id)
+        self._sandbox_id = handle.sandbox_id
+        self._sandbox_pass = handle.sandbox_pass
+        return handle.sandbox
+
     @property
-    def sandbox(self) -> Sandbox:
-        """Get the sandbox instance, ensuring it exists."""
+    def sandbox(self) -> AsyncSandbox:
+        """Get the async sandbox facade, ensuring it exists."""
         if self._sandbox is None:
             raise RuntimeError("Sandbox not initialized. Call _ensure_sandbox() first.")
         return self._sandbox